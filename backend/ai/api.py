@@ -85,10 +85,10 @@ def evaluate_comment_quality(zip_path: str) -> PredictionResponse:
     
     # Check if the project contains Python or JavaScript files
     # Check zip file contents directly without extracting
-    import zipfile
+    from backend.common.archive import open_archive
     is_python_or_javascript_project = False
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        with open_archive(zip_path) as zip_ref:
             file_list = zip_ref.namelist()
             # Check if any files have Python or JavaScript extensions
             for file_name in file_list:
@@ -1,11 +1,12 @@
 """Utilities for unzipping project archives."""
 
 import os
-import zipfile
 import tempfile
 from pathlib import Path
 from typing import Optional
 
+from backend.common.archive import open_archive, safe_extract_all
+
 
 def unzip_project(zip_path: str, output_dir: Optional[str] = None) -> str:
     """
@@ -17,6 +18,9 @@ def unzip_project(zip_path: str, output_dir: Optional[str] = None) -> str:
         
     Returns:
         Path to the extracted directory
+
+    Raises:
+        ArchiveError: If the archive is invalid or exceeds the upload limits
     """
     if output_dir is None:
         output_dir = tempfile.mkdtemp(prefix="comment_quality_")
@@ -24,8 +28,8 @@ def unzip_project(zip_path: str, output_dir: Optional[str] = None) -> str:
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(output_path)
+    with open_archive(zip_path) as zip_ref:
+        safe_extract_all(zip_ref, str(output_path))
     
     return str(output_path)
 
@@ -1,8 +1,134 @@
 # handles AI and heuristic evaluations for code submissions
 
+import codecs
 import os
+from functools import lru_cache
 import anthropic  # Claude client
 
+# Fail fast instead of hanging a submission when the Anthropic API is slow
+ANTHROPIC_TIMEOUT_SECONDS = float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "30"))
+
+# Files that are analyzed, by language
+LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".md": "Markdown"
+}
+SUPPORTED_EXTENSIONS = tuple(LANGUAGES)
+
+
+def file_language(name: str):
+    """Language of a file from the extension its name ends with (a file named just ".py" included), or None."""
+    for extension, language in LANGUAGES.items():
+        if name.endswith(extension):
+            return language
+    return None
+
+# Characters of each file, and of the whole project, sent to Claude
+FILE_EXCERPT_CHARS = 3000
+PROMPT_EXCERPT_CHARS = 15000
+# Bytes read per step when counting lines
+READ_BLOCK_BYTES = 64 * 1024
+
+
+class ProjectStats:
+    """Statistics and a prompt excerpt gathered in a single walk of a project directory."""
+
+    def __init__(self):
+        self.files_by_language = {}
+        self.lines_by_language = {}
+        self.has_readme = False
+        self.has_tests = False
+        self.excerpt_parts = []
+        self.excerpt_chars = 0
+
+    @property
+    def file_count(self) -> int:
+        return sum(self.files_by_language.values())
+
+    @property
+    def total_lines(self) -> int:
+        return sum(self.lines_by_language.values())
+
+    @property
+    def excerpt(self) -> str:
+        return "\n\n".join(self.excerpt_parts)[:PROMPT_EXCERPT_CHARS]
+
+    def add_file(self, name: str, path: str, language: str):
+        """Count one file's lines and, while the budget lasts, add its start to the excerpt."""
+        self.files_by_language[language] = self.files_by_language.get(language, 0) + 1
+
+        lower_name = name.lower()
+        if lower_name == "readme.md":
+            self.has_readme = True
+        if "test" in lower_name or "spec" in lower_name:
+            self.has_tests = True
+
+        # Excerpt parts are joined with "\n\n" and start with a "# name\n" header
+        header = f"# {name}\n"
+        separator = 2 if self.excerpt_parts else 0
+        wanted_chars = 0
+        if self.excerpt_chars < PROMPT_EXCERPT_CHARS:
+            wanted_chars = min(FILE_EXCERPT_CHARS,
+                               PROMPT_EXCERPT_CHARS - self.excerpt_chars - separator - len(header))
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        text = ""
+        # Matches str.split("\n") on the whole file: one more line than newlines
+        newlines = 1
+
+        with open(path, "rb") as code_file:
+            while True:
+                block = code_file.read(READ_BLOCK_BYTES)
+                if not block:
+                    break
+                newlines += block.count(b"\n")
+                if len(text) < wanted_chars:
+                    text += decoder.decode(block)
+
+        self.lines_by_language[language] = self.lines_by_language.get(language, 0) + newlines
+        if self.excerpt_chars < PROMPT_EXCERPT_CHARS:
+            text = text.replace("\r\n", "\n")[:max(wanted_chars, 0)]
+            self.excerpt_parts.append(header + text)
+            self.excerpt_chars += separator + len(header) + len(text)
+
+
+def collect_project_stats(project_path: str) -> ProjectStats:
+    """
+    Walk a project directory once with os.scandir and gather its ProjectStats.
+
+    Files are visited in the same order as os.walk (a directory's files, then
+    its subdirectories). Unreadable files are skipped.
+    """
+    stats = ProjectStats()
+    pending = [project_path]
+    while pending:
+        directory = pending.pop()
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.name.endswith(SUPPORTED_EXTENSIONS):
+                        language = file_language(entry.name)
+                        try:
+                            stats.add_file(entry.name, entry.path, language)
+                        except OSError:
+                            continue
+        except OSError:
+            continue
+        pending.extend(reversed(subdirectories))
+    return stats
+
+
+@lru_cache(maxsize=None)
+def get_anthropic_client(api_key: str) -> anthropic.Anthropic:
+    """Create the Anthropic client once per process (and API key) so its connection pool is reused."""
+    return anthropic.Anthropic(api_key=api_key, timeout=ANTHROPIC_TIMEOUT_SECONDS, max_retries=0)
+
+
 def evaluate_project(project_path: str) -> dict:
     # Check if API key is configured
     api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -12,20 +138,9 @@ def evaluate_project(project_path: str) -> dict:
             "score": 0
         }
 
-    # Gather summary of files
-    files_summary = []
-    for root, _, files in os.walk(project_path):
-        for f in files:
-            if f.endswith((".py", ".js", ".html", ".css", ".md")):
-                path = os.path.join(root, f)
-                try:
-                    with open(path, "r", encoding="utf-8", errors="ignore") as code_file:
-                        content = code_file.read(3000)  # limit text size
-                        files_summary.append({"filename": f, "content": content})
-                except Exception:
-                    continue
-
-    if not files_summary:
+    stats = collect_project_stats(project_path)
+
+    if stats.file_count == 0:
         return {
             "feedback": "No supported files found in the project. Please include .py, .js, .html, .css, or .md files.",
             "score": 0
@@ -35,14 +150,12 @@ def evaluate_project(project_path: str) -> dict:
     prompt = "You are SEP-AI. Analyze the student's software project and provide:\n"
     prompt += "1. Strengths\n2. Weaknesses\n3. Suggested improvements\n4. Tentative score (0–100)\n\n"
 
-    combined_code = "\n\n".join([f"# {f['filename']}\n{f['content']}" for f in files_summary])
-
     try:
-        client = anthropic.Anthropic(api_key=api_key)
+        client = get_anthropic_client(api_key)
         response = client.messages.create(
             model="claude-3-sonnet-20240229",
             messages=[
-                {"role": "user", "content": prompt + combined_code[:15000]}
+                {"role": "user", "content": prompt + stats.excerpt}
             ],
             max_tokens=500
         )
@@ -55,7 +168,7 @@ def evaluate_project(project_path: str) -> dict:
         error_message = str(e)
         if "credit balance is too low" in error_message:
             # Use fallback evaluation when credits are low
-            return evaluate_project_fallback(project_path)
+            return evaluate_project_fallback(project_path, stats)
         elif "invalid_request_error" in error_message:
             return {
                 "feedback": "AI evaluation failed due to an API configuration issue. Please contact your instructor for assistance.",
@@ -67,36 +180,17 @@ def evaluate_project(project_path: str) -> dict:
                 "score": 0
             }
 
-def evaluate_project_fallback(project_path: str) -> dict:
+def evaluate_project_fallback(project_path: str, stats: ProjectStats = None) -> dict:
     """Fallback evaluation when AI API is unavailable"""
-    # Gather basic project statistics
-    files_summary = []
-    total_lines = 0
-    file_count = 0
-    has_readme = False
-    has_tests = False
-
-    for root, _, files in os.walk(project_path):
-        for f in files:
-            if f.endswith((".py", ".js", ".html", ".css", ".md")):
-                path = os.path.join(root, f)
-                file_count += 1
-                try:
-                    with open(path, "r", encoding="utf-8", errors="ignore") as code_file:
-                        content = code_file.read()
-                        lines = len(content.split('\n'))
-                        total_lines += lines
-
-                        if f.lower() == 'readme.md':
-                            has_readme = True
-                        if 'test' in f.lower() or 'spec' in f.lower():
-                            has_tests = True
-
-                        files_summary.append({"filename": f, "lines": lines})
-                except Exception:
-                    continue
-
-    if not files_summary:
+    # Gather basic project statistics (reuse the caller's walk when it has one)
+    if stats is None:
+        stats = collect_project_stats(project_path)
+    file_count = stats.file_count
+    total_lines = stats.total_lines
+    has_readme = stats.has_readme
+    has_tests = stats.has_tests
+
+    if file_count == 0:
         return {
             "feedback": "No supported files found in the project. Please include .py, .js, .html, .css, or .md files.",
             "score": 0
@@ -133,6 +227,11 @@ def evaluate_project_fallback(project_path: str) -> dict:
     feedback = f"Basic project evaluation (AI unavailable):\n\n"
     feedback += f"• Files analyzed: {file_count}\n"
     feedback += f"• Total lines of code: {total_lines}\n"
+    languages = ", ".join(
+        f"{language} ({count} files, {stats.lines_by_language[language]} lines)"
+        for language, count in sorted(stats.files_by_language.items())
+    )
+    feedback += f"• Languages: {languages}\n"
     feedback += f"• README present: {'Yes' if has_readme else 'No'}\n"
     feedback += f"• Test files detected: {'Yes' if has_tests else 'No'}\n\n"
 
@@ -0,0 +1,239 @@
+"""Score distributions of an assessment: averages, medians and histograms.
+
+Each score of an assessment's submissions is counted in a fixed-width bin of
+the assessment_score_bins table (migration 011), together with the running
+sum and sum of squares of the scores in that bin. A trigger on submissions
+moves a row's scores between bins on every insert, grade update, release and
+delete, so reading an assessment's analytics is one query over at most a few
+hundred bin rows, however many students submitted.
+
+Averages and standard deviations are exact (from the sums). Medians are
+interpolated within the bin holding the middle score.
+
+rebuild_assessment_analytics recomputes the bins of an assessment from its
+submissions, with NumPy. Use it to backfill the assessments that existed
+before migration 011:
+
+    python -m backend.app.analytics            # every assessment
+    python -m backend.app.analytics <id> ...   # the given assessments
+
+The database counts the score writes to an assessment while it is being
+rebuilt (migration 014), and the rebuilt bins are only stored if none landed
+after the rebuild started; otherwise the rebuild starts over, so a rebuild
+never drops a concurrent grade.
+"""
+
+import argparse
+import asyncio
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from .database import admin_client, execute, json_object
+
+# Rows fetched per request when rebuilding (PostgREST caps responses at 1000 rows)
+REBUILD_PAGE_SIZE = 500
+# Times a rebuild starts over because scores were written while it ran
+REBUILD_ATTEMPTS = 5
+
+SCORE_COLUMNS = ["ai_score", "adjusted_ai_score", "final_score"]
+HUMAN_EVALUATION_FIELDS = ["innovation_score", "collaboration_score", "presentation_score"]
+CRITERION_PREFIX = "criterion:"
+
+# Bin width and number of bins of each metric; keep in sync with score_bin() in migration 011
+METRIC_SCALES = {
+    "ai_score": (1.0, 24),
+    "adjusted_ai_score": (1.0, 24),
+    "final_score": (5.0, 20),
+}
+# Human evaluation and rubric criterion scores (0-4)
+SUBSCORE_SCALE = (0.5, 8)
+
+SUBMISSION_COLUMNS = "id, status, ai_score, adjusted_ai_score, final_score, human_evaluation, ai_evaluation_data"
+
+
+def metric_scale(metric: str) -> Tuple[float, int]:
+    """Bin width and number of bins of a metric."""
+    return METRIC_SCALES.get(metric, SUBSCORE_SCALE)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def submission_scores(submission: dict) -> Iterator[Tuple[str, float]]:
+    """The (metric, score) pairs a submission counts with, as submission_scores() in migration 011."""
+    if submission.get("status") == "no submission":
+        return
+    for column in SCORE_COLUMNS:
+        if _is_number(submission.get(column)):
+            yield column, float(submission[column])
+    human_evaluation = json_object(submission.get("human_evaluation"))
+    for field in HUMAN_EVALUATION_FIELDS:
+        if _is_number(human_evaluation.get(field)):
+            yield field, float(human_evaluation[field])
+    evaluation = json_object(json_object(submission.get("ai_evaluation_data")).get("evaluation"))
+    for criterion, score in evaluation.items():
+        if _is_number(score):
+            yield CRITERION_PREFIX + criterion, float(score)
+
+
+def compute_bins(submissions: Iterable[dict]) -> List[dict]:
+    """
+    Bin the scores of submissions, as the trigger of migration 011 would have.
+
+    Scores are gathered into one array per metric, then binned and summed
+    per bin with NumPy.
+
+    Returns:
+        List[dict]: The non-empty bins, with metric, bin, count, total and total_sq
+    """
+    scores_by_metric: Dict[str, List[float]] = defaultdict(list)
+    for submission in submissions:
+        for metric, score in submission_scores(submission):
+            scores_by_metric[metric].append(score)
+
+    bins = []
+    for metric, metric_scores in scores_by_metric.items():
+        bin_width, bin_count = metric_scale(metric)
+        scores = np.asarray(metric_scores, dtype=np.float64)
+        index = np.clip(np.floor(scores / bin_width), 0, bin_count - 1).astype(np.intp)
+        counts = np.bincount(index, minlength=bin_count)
+        totals = np.bincount(index, weights=scores, minlength=bin_count)
+        totals_sq = np.bincount(index, weights=scores * scores, minlength=bin_count)
+        for b in np.flatnonzero(counts):
+            bins.append({
+                "metric": metric,
+                "bin": int(b),
+                "count": int(counts[b]),
+                "total": float(totals[b]),
+                "total_sq": float(totals_sq[b]),
+            })
+    return bins
+
+
+def metric_summary(metric: str, bins: Dict[int, dict]) -> dict:
+    """Count, average, median, standard deviation and histogram of one metric from its bins."""
+    bin_width, bin_count = metric_scale(metric)
+    counts = [max(int(bins[b]["count"]), 0) if b in bins else 0 for b in range(bin_count)]
+    count = sum(counts)
+    histogram = [{"from": b * bin_width, "to": (b + 1) * bin_width, "count": counts[b]} for b in range(bin_count)]
+    if count == 0:
+        return {"count": 0, "average": None, "median": None, "std_dev": None, "histogram": histogram}
+
+    total = sum(row["total"] for row in bins.values() if row["count"] > 0)
+    total_sq = sum(row["total_sq"] for row in bins.values() if row["count"] > 0)
+    average = total / count
+    std_dev = math.sqrt(max(total_sq / count - average * average, 0.0))
+
+    # Interpolate the median within the bin where the cumulative count reaches half
+    below = 0
+    median = None
+    for b, in_bin in enumerate(counts):
+        if in_bin and below + in_bin >= count / 2:
+            median = (b + (count / 2 - below) / in_bin) * bin_width
+            break
+        below += in_bin
+
+    return {
+        "count": count,
+        "average": round(average, 2),
+        "median": round(median, 2),
+        "std_dev": round(std_dev, 2),
+        "histogram": histogram,
+    }
+
+
+def summarize(rows: Iterable[dict]) -> dict:
+    """Build the analytics response from an assessment's bin rows."""
+    bins_by_metric: Dict[str, Dict[int, dict]] = defaultdict(dict)
+    for row in rows:
+        bins_by_metric[row["metric"]][int(row["bin"])] = row
+
+    scores = {metric: metric_summary(metric, bins_by_metric.get(metric, {}))
+              for metric in SCORE_COLUMNS + HUMAN_EVALUATION_FIELDS}
+    criteria = {metric[len(CRITERION_PREFIX):]: metric_summary(metric, bins)
+                for metric, bins in sorted(bins_by_metric.items()) if metric.startswith(CRITERION_PREFIX)}
+    return {"scores": scores, "criteria": criteria}
+
+
+async def assessment_analytics(assessment_id: str) -> dict:
+    """
+    Score distributions of an assessment, read from its bins.
+
+    Returns:
+        dict: "scores" (AI, adjusted AI, final and human evaluation scores) and
+            "criteria" (AI rubric criteria), each metric with count, average,
+            median, std_dev and histogram
+    """
+    response = await execute(admin_client.table("assessment_score_bins").select(
+        "metric, bin, count, total, total_sq"
+    ).eq("assessment_id", assessment_id))
+    return summarize(response.data or [])
+
+
+async def read_assessment_submissions(assessment_id: str) -> List[dict]:
+    """The scored columns of all submissions of an assessment, page by page."""
+    submissions = []
+    while True:
+        response = await execute(admin_client.table("submissions").select(SUBMISSION_COLUMNS).eq(
+            "assessment_id", assessment_id).order("id").range(len(submissions), len(submissions) + REBUILD_PAGE_SIZE - 1))
+        submissions.extend(response.data)
+        if len(response.data) < REBUILD_PAGE_SIZE:
+            return submissions
+
+
+async def rebuild_assessment_analytics(assessment_id: str) -> int:
+    """
+    Recompute the bins of an assessment from all of its submissions.
+
+    Returns:
+        int: The number of submissions read
+
+    Raises:
+        RuntimeError: If scores kept being written during REBUILD_ATTEMPTS rebuilds
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        writes = (await execute(admin_client.rpc("begin_assessment_score_rebuild", {
+            "p_assessment_id": assessment_id,
+        }))).data
+        submissions = await read_assessment_submissions(assessment_id)
+        finished = (await execute(admin_client.rpc("finish_assessment_score_rebuild", {
+            "p_assessment_id": assessment_id,
+            "p_bins": compute_bins(submissions),
+            "p_writes": writes,
+        }))).data
+        if finished:
+            return len(submissions)
+        print(f"Scores of assessment {assessment_id} changed during its rebuild, starting over")
+    raise RuntimeError(f"Scores of assessment {assessment_id} kept changing during {REBUILD_ATTEMPTS} rebuilds")
+
+
+async def rebuild_all(assessment_ids: List[str]):
+    if not assessment_ids:
+        while True:
+            response = await execute(admin_client.table("assessments").select("id").order("id").range(
+                len(assessment_ids), len(assessment_ids) + REBUILD_PAGE_SIZE - 1))
+            assessment_ids.extend(row["id"] for row in response.data)
+            if len(response.data) < REBUILD_PAGE_SIZE:
+                break
+    for assessment_id in assessment_ids:
+        try:
+            count = await rebuild_assessment_analytics(assessment_id)
+        except RuntimeError as e:
+            print(f"Could not rebuild analytics of assessment {assessment_id}: {e}")
+            continue
+        print(f"Rebuilt analytics of assessment {assessment_id} from {count} submissions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the score distributions of assessments (migrations 011 and 014).")
+    parser.add_argument("assessment_ids", nargs="*", help="assessments to rebuild (default: all)")
+    args = parser.parse_args()
+    asyncio.run(rebuild_all(args.assessment_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,208 @@
+"""Bearer token authentication.
+
+Supabase access tokens are JWTs, so they are verified locally instead of
+calling Supabase Auth on every request:
+
+- HS256 tokens (legacy projects) are checked against SUPABASE_JWT_SECRET
+- asymmetric tokens (ES256/RS256 signing keys) are checked against the
+  project's JWKS, fetched off the event loop and refreshed every
+  JWKS_CACHE_SECONDS or when a token names an unknown key id
+
+Signature, expiry, audience and issuer are all checked. Verified tokens are
+kept in a small cache for AUTH_CACHE_SECONDS (never past their expiry), so
+repeated requests with the same token skip decoding as well.
+
+A token that cannot be verified locally because no key is configured for it
+is verified remotely with supabase.auth.get_user, as is every token when
+AUTH_VERIFICATION=remote. Endpoints that must see revoked sessions right
+away depend on get_current_user_revalidated, which always asks Supabase.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Optional
+
+import requests
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
-from .database import supabase
+from jose import JWTError, jwt
+
+from .database import SUPABASE_URL, run_blocking, supabase
+from .metrics import AUTH_VERIFICATIONS
 
 security = HTTPBearer()
 
+# "local" verifies JWTs in process; "remote" asks Supabase Auth on every request
+AUTH_VERIFICATION = os.getenv("AUTH_VERIFICATION", "local")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWT_ISSUER = os.getenv("SUPABASE_JWT_ISSUER") or f"{SUPABASE_URL}/auth/v1"
+JWKS_CACHE_SECONDS = float(os.getenv("JWKS_CACHE_SECONDS", "600"))
+AUTH_CACHE_SECONDS = float(os.getenv("AUTH_CACHE_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "RS256")
+
+VERIFIED_FROM_CACHE = AUTH_VERIFICATIONS.labels("cache")
+VERIFIED_LOCALLY = AUTH_VERIFICATIONS.labels("local")
+VERIFIED_REMOTELY = AUTH_VERIFICATIONS.labels("remote")
+
+
+class NoVerificationKey(Exception):
+    """Raised when no local key can verify a token (no secret configured, or JWKS unavailable)."""
+
+
+class JWKSCache:
+    """Signing keys of the Supabase project, looked up by key id."""
+
+    def __init__(self, url: str, ttl_seconds: float):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.keys = {}
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def needs_fetch(self, kid: Optional[str]) -> bool:
+        if self.fetched_at is None:
+            return True
+        age = time.monotonic() - self.fetched_at
+        # An unknown key id may be a newly rotated key; refetch for it, but at most once a minute
+        return age > self.ttl_seconds or (kid not in self.keys and age > 60)
+
+    def fetch(self):
+        with self.lock:
+            try:
+                response = requests.get(self.url, timeout=5)
+                response.raise_for_status()
+                self.keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+            except (requests.RequestException, ValueError) as e:
+                print(f"Could not fetch JWKS from {self.url}: {e}")
+            # Also set on failure, so an unreachable JWKS is not fetched on every request
+            self.fetched_at = time.monotonic()
+
+    def get(self, kid: Optional[str]) -> dict:
+        if kid not in self.keys:
+            raise NoVerificationKey(f"No signing key with id {kid}")
+        return self.keys[kid]
+
+
+jwks_cache = JWKSCache(SUPABASE_JWKS_URL, JWKS_CACHE_SECONDS)
+
+# token -> (monotonic expiry, user); ordered by insertion so the oldest entry is evicted first
+_verified_tokens: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _user_from_claims(claims: dict) -> SimpleNamespace:
+    """The fields of a Supabase user that are carried in its access token."""
+    return SimpleNamespace(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        app_metadata=claims.get("app_metadata") or {},
+        user_metadata=claims.get("user_metadata") or {},
+    )
+
+
+def verify_token_locally(token: str, header: dict) -> dict:
+    """
+    Verify a Supabase access token without a network call.
+
+    Args:
+        token: The bearer token
+        header: The token's unverified header (jwt.get_unverified_header)
+
+    Returns:
+        dict: The token's claims
+
+    Raises:
+        JWTError: If the token is malformed, forged, expired or meant for another audience or issuer
+        NoVerificationKey: If no local key is available for the token's algorithm
+    """
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise NoVerificationKey("SUPABASE_JWT_SECRET is not set")
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        key = jwks_cache.get(header.get("kid"))
+    else:
+        raise JWTError(f"Unsupported token algorithm: {algorithm}")
+    return jwt.decode(token, key, algorithms=[algorithm], audience=JWT_AUDIENCE, issuer=JWT_ISSUER)
+
+
+def _remember(token: str, user, expires_at: Optional[float]):
+    ttl = AUTH_CACHE_SECONDS if expires_at is None else min(AUTH_CACHE_SECONDS, expires_at - time.time())
+    if ttl <= 0:
+        return
+    _verified_tokens[token] = (time.monotonic() + ttl, user)
+    _verified_tokens.move_to_end(token)
+    while len(_verified_tokens) > AUTH_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+
+
+def forget_token(token: str):
+    """Drop a token from the cache of verified tokens."""
+    _verified_tokens.pop(token, None)
+
+
+async def verify_token_remotely(token: str):
+    """Ask Supabase Auth for the token's user (also catches signed-out sessions)."""
+    response = await run_blocking(supabase.auth.get_user, token)
+    if not response or not response.user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    VERIFIED_REMOTELY.inc()
+    return response.user
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+
+    cached = _verified_tokens.get(token)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            VERIFIED_FROM_CACHE.inc()
+            return cached[1]
+        forget_token(token)
+
     try:
-        response = supabase.auth.get_user(token)
-        if not response or not response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return response.user
+        if AUTH_VERIFICATION != "remote":
+            try:
+                header = jwt.get_unverified_header(token)
+                if header.get("alg") in ASYMMETRIC_ALGORITHMS and jwks_cache.needs_fetch(header.get("kid")):
+                    await run_blocking(jwks_cache.fetch)
+                claims = verify_token_locally(token, header)
+                user = _user_from_claims(claims)
+                VERIFIED_LOCALLY.inc()
+                _remember(token, user, claims.get("exp"))
+                return user
+            except NoVerificationKey as e:
+                print(f"Verifying token remotely: {e}")
+
+        user = await verify_token_remotely(token)
+        _remember(token, user, None)
+        return user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
+
+
+async def get_current_user_revalidated(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Authenticate like get_current_user, then confirm the session with Supabase Auth.
+
+    For sensitive endpoints: a token whose session was signed out or whose
+    user was deleted is rejected even though it has not expired yet.
+    """
+    await get_current_user(credentials)
+    try:
+        return await verify_token_remotely(credentials.credentials)
+    except Exception as e:
+        forget_token(credentials.credentials)
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        raise HTTPException(status_code=401, detail=detail)
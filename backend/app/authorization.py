@@ -0,0 +1,168 @@
+"""Cached ownership and enrollment checks for the routes.
+
+Most endpoints start by checking who owns a class or whether a student is
+enrolled in it. The relationships behind those checks are cached per worker:
+
+- class -> professor
+- assessment -> class
+- submission -> assessment
+- (class, student) -> enrolled
+
+A cache miss loads the whole chain in one query and caches every link of it.
+Routes that create or delete classes, assessments or enrollments update the
+cache of their own worker; other workers see the change once their entries
+expire after AUTHZ_CACHE_SECONDS. Only positive enrollments are cached, so a
+newly enrolled student is never refused because of a stale entry.
+"""
+
+import os
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+
+from .cache import TTLCache
+from .database import admin_client, execute
+
+AUTHZ_CACHE_SECONDS = float(os.getenv("AUTHZ_CACHE_SECONDS", "30"))
+AUTHZ_CACHE_SIZE = int(os.getenv("AUTHZ_CACHE_SIZE", "50000"))
+
+class_professors = TTLCache("class_professor", AUTHZ_CACHE_SECONDS, AUTHZ_CACHE_SIZE)
+assessment_classes = TTLCache("assessment_class", AUTHZ_CACHE_SECONDS, AUTHZ_CACHE_SIZE)
+submission_assessments = TTLCache("submission_assessment", AUTHZ_CACHE_SECONDS, AUTHZ_CACHE_SIZE)
+enrollments = TTLCache("enrollment", AUTHZ_CACHE_SECONDS, AUTHZ_CACHE_SIZE)
+
+
+def _remember_class(row: Optional[dict], class_id: str):
+    if row:
+        class_professors.set(class_id, row["professor_id"])
+
+
+def _remember_assessment(row: Optional[dict], assessment_id: str):
+    if row:
+        assessment_classes.set(assessment_id, row["class_id"])
+        _remember_class(row.get("classes"), row["class_id"])
+
+
+async def class_professor(class_id: str) -> Optional[str]:
+    """The professor who owns a class, or None if the class does not exist."""
+    professor_id = class_professors.get(class_id)
+    if professor_id is None:
+        response = await execute(admin_client.table("classes").select("professor_id").eq("id", class_id))
+        if not response.data:
+            return None
+        professor_id = response.data[0]["professor_id"]
+        class_professors.set(class_id, professor_id)
+    return professor_id
+
+
+async def assessment_class(assessment_id: str) -> Optional[str]:
+    """The class of an assessment, or None if the assessment does not exist."""
+    class_id = assessment_classes.get(assessment_id)
+    if class_id is None:
+        response = await execute(admin_client.table("assessments").select(
+            "class_id, classes(professor_id)"
+        ).eq("id", assessment_id))
+        if not response.data:
+            return None
+        _remember_assessment(response.data[0], assessment_id)
+        class_id = response.data[0]["class_id"]
+    return class_id
+
+
+async def submission_assessment(submission_id: str) -> Optional[str]:
+    """The assessment of a submission, or None if the submission does not exist."""
+    assessment_id = submission_assessments.get(submission_id)
+    if assessment_id is None:
+        response = await execute(admin_client.table("submissions").select(
+            "assessment_id, assessments(class_id, classes(professor_id))"
+        ).eq("id", submission_id))
+        if not response.data:
+            return None
+        row = response.data[0]
+        assessment_id = row["assessment_id"]
+        submission_assessments.set(submission_id, assessment_id)
+        _remember_assessment(row.get("assessments"), assessment_id)
+    return assessment_id
+
+
+async def is_enrolled(class_id: str, student_id: str) -> bool:
+    """Whether a student is enrolled in a class."""
+    if enrollments.get((class_id, student_id)):
+        return True
+    response = await execute(admin_client.table("class_students").select("id").eq(
+        "class_id", class_id).eq("student_id", student_id))
+    if response.data:
+        enrollments.set((class_id, student_id), True)
+    return bool(response.data)
+
+
+async def require_class_owner(class_id: str, professor_id: str, detail: str):
+    """
+    Check that a professor owns a class.
+
+    Raises:
+        HTTPException: 403 with the given detail if the class does not exist or belongs to someone else
+    """
+    if await class_professor(class_id) != professor_id:
+        raise HTTPException(status_code=403, detail=detail)
+
+
+async def require_assessment_owner(assessment_id: str, professor_id: str, detail: str) -> str:
+    """
+    Check that a professor owns the class of an assessment.
+
+    Returns:
+        str: The assessment's class_id
+
+    Raises:
+        HTTPException: 403 with the given detail if the assessment does not exist or belongs to someone else
+    """
+    class_id = await assessment_class(assessment_id)
+    if class_id is None or await class_professor(class_id) != professor_id:
+        raise HTTPException(status_code=403, detail=detail)
+    return class_id
+
+
+async def require_submission_owner(submission_id: str, professor_id: str, detail: str) -> str:
+    """
+    Check that a professor owns the class a submission was made in.
+
+    Returns:
+        str: The submission's assessment_id
+
+    Raises:
+        HTTPException: 403 with the given detail if the submission does not exist or belongs to another professor
+    """
+    assessment_id = await submission_assessment(submission_id)
+    if assessment_id is None:
+        raise HTTPException(status_code=403, detail=detail)
+    await require_assessment_owner(assessment_id, professor_id, detail)
+    return assessment_id
+
+
+def class_created(class_id: str, professor_id: str):
+    class_professors.set(class_id, professor_id)
+
+
+def assessment_created(assessment_id: str, class_id: str):
+    assessment_classes.set(assessment_id, class_id)
+
+
+def student_enrolled(class_id: str, student_id: str):
+    enrollments.set((class_id, student_id), True)
+
+
+def student_unenrolled(class_id: str, student_id: str):
+    enrollments.pop((class_id, student_id))
+
+
+def assessments_deleted(assessment_ids: Iterable[str]):
+    deleted = set(assessment_ids)
+    assessment_classes.pop_where(lambda assessment_id, _: assessment_id in deleted)
+    submission_assessments.pop_where(lambda _, assessment_id: assessment_id in deleted)
+
+
+def class_deleted(class_id: str, assessment_ids: Iterable[str]):
+    class_professors.pop(class_id)
+    assessments_deleted(assessment_ids)
+    enrollments.pop_where(lambda key, _: key[0] == class_id)
@@ -0,0 +1,67 @@
+"""Small in-process TTL cache with hit/miss counters.
+
+Each worker process keeps its own copy, so entries written by one worker are
+not seen by another: callers invalidate what they change and rely on the
+TTL to bound how long other workers can serve a stale entry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from .metrics import CACHE_LOOKUPS
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire ttl_seconds after they are written."""
+
+    def __init__(self, name: str, ttl_seconds: float, max_size: int, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty cache.
+
+        Args:
+            name: Label of the cache in sepai_cache_lookups_total
+            ttl_seconds: How long an entry is served after it was written
+            max_size: Entries kept at most; the least recently written are evicted first
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.clock = clock
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = CACHE_LOOKUPS.labels(name, "hit")
+        self.misses = CACHE_LOOKUPS.labels(name, "miss")
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.hits.inc()
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+        self.misses.inc()
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable, Any], bool]):
+        """Drop every entry for which predicate(key, value) is true."""
+        with self.lock:
+            for key in [key for key, (_, value) in self.entries.items() if predicate(key, value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
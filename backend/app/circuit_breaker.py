@@ -0,0 +1,166 @@
+"""Circuit breaker for calls to external providers (the LLM API)."""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker driven by error rate and latency.
+
+    While closed, every call outcome is kept in a sliding time window. Once the
+    window holds at least `min_calls` calls and either the failure rate or the
+    slow-call rate reaches its threshold, the circuit opens and calls are
+    rejected immediately. After `open_seconds` the circuit becomes half-open and
+    lets `half_open_probes` calls through; if they all succeed the circuit
+    closes again, and any failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        slow_call_rate_threshold: float = 0.5,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        on_state_change: Optional[Callable[[str, str], None]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name used in logs
+            window_seconds: Length of the sliding window of recorded calls
+            min_calls: Calls needed in the window before the circuit can open
+            failure_rate_threshold: Failure ratio (0-1) that opens the circuit
+            slow_call_seconds: Calls slower than this count as slow
+            slow_call_rate_threshold: Slow-call ratio (0-1) that opens the circuit
+            open_seconds: Time to stay open before probing
+            half_open_probes: Successful probes needed to close the circuit
+            on_state_change: Optional callback receiving (old_state, new_state)
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.on_state_change = on_state_change
+        self.clock = clock
+
+        self.state = CLOSED
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, **kwargs) -> "CircuitBreaker":
+        """Create a breaker configured from `<prefix>_*` environment variables."""
+        return cls(
+            name,
+            window_seconds=float(os.getenv(f"{prefix}_WINDOW_SECONDS", "60")),
+            min_calls=int(os.getenv(f"{prefix}_MIN_CALLS", "5")),
+            failure_rate_threshold=float(os.getenv(f"{prefix}_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv(f"{prefix}_SLOW_CALL_SECONDS", "30")),
+            slow_call_rate_threshold=float(os.getenv(f"{prefix}_SLOW_CALL_RATE", "0.5")),
+            open_seconds=float(os.getenv(f"{prefix}_OPEN_SECONDS", "30")),
+            half_open_probes=int(os.getenv(f"{prefix}_HALF_OPEN_PROBES", "1")),
+            **kwargs
+        )
+
+    def before_call(self):
+        """Reserve a call slot.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all probes in flight
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open and probing")
+                self._probes_in_flight += 1
+
+    def record_success(self, latency: float):
+        """Record a completed call. Slow calls count against the slow-call rate."""
+        self._record(failed=False, latency=latency)
+
+    def record_failure(self, latency: float):
+        """Record a failed call (error, timeout or server-side status)."""
+        self._record(failed=True, latency=latency)
+
+    def release(self):
+        """Give back a call slot without an outcome (the call was cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _record(self, failed: bool, latency: float):
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            now = self.clock()
+
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED)
+                return
+
+            if self.state == OPEN:
+                # A call that started before the circuit opened; nothing to decide
+                return
+
+            self._calls.append((now, failed, slow))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if (failures / total >= self.failure_rate_threshold
+                    or slow_calls / total >= self.slow_call_rate_threshold):
+                self._open(now)
+
+    def _open(self, now: float):
+        self._opened_at = now
+        self._transition(OPEN)
+
+    def _transition(self, new_state: str):
+        old_state = self.state
+        self.state = new_state
+        self._calls.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if old_state != new_state:
+            print(f"Circuit breaker '{self.name}': {old_state} -> {new_state}")
+            if self.on_state_change:
+                self.on_state_change(old_state, new_state)
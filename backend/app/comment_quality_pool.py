@@ -0,0 +1,118 @@
+"""Process pool for comment-quality scoring.
+
+evaluate_comment_quality is CPU-bound (unzip, parse, TF-IDF + classifier), so
+running it inline would block the event loop. Scoring runs in separate worker
+processes that load the model once at startup, letting a submission await the
+LLM call and the scoring at the same time.
+
+This module is imported by the pool's worker processes, so it must stay free
+of FastAPI and database imports.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+AI_DIR = str(Path(__file__).parent.parent / "ai")
+
+# 0 workers disables comment-quality scoring
+COMMENT_QUALITY_WORKERS = int(os.getenv("COMMENT_QUALITY_WORKERS", "2"))
+COMMENT_QUALITY_TIMEOUT_SECONDS = float(os.getenv("COMMENT_QUALITY_TIMEOUT_SECONDS", "60"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+# One slot per worker, held from submission until the worker finishes the task
+# (even after the caller timed out), so tasks are only submitted to a free worker
+_free_workers: Optional[threading.BoundedSemaphore] = None
+
+
+def _init_worker(ai_dir: str):
+    """Worker initializer: make the ai package importable and load the model once."""
+    if ai_dir not in sys.path:
+        sys.path.insert(0, ai_dir)
+    from api import load_model
+    load_model()
+
+
+def _warm_up() -> int:
+    """No-op task used to start a worker (and run its initializer) ahead of time."""
+    return os.getpid()
+
+
+def _score(zip_path: str) -> dict:
+    """Score comment quality in a worker. Returns only the summary to keep IPC small."""
+    from api import evaluate_comment_quality
+    return evaluate_comment_quality(zip_path).overall_score.model_dump()
+
+
+def start_pool() -> Optional[ProcessPoolExecutor]:
+    """Create the worker pool and preload the model in every worker."""
+    global _pool, _free_workers
+    if _pool is None and COMMENT_QUALITY_WORKERS > 0:
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=COMMENT_QUALITY_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(AI_DIR,)
+        )
+        _free_workers = threading.BoundedSemaphore(COMMENT_QUALITY_WORKERS)
+        for _ in range(COMMENT_QUALITY_WORKERS):
+            _pool.submit(_warm_up)
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the worker pool without waiting for running tasks."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def score_comment_quality(zip_path: str, timeout: float = COMMENT_QUALITY_TIMEOUT_SECONDS) -> Optional[dict]:
+    """
+    Score comment quality of a project ZIP in the worker pool.
+
+    Failures and timeouts are logged and return None, so callers never fail
+    because of comment-quality scoring. When every worker is busy this returns
+    None right away instead of queueing, so the timeout only covers scoring.
+
+    Args:
+        zip_path: Path to the project ZIP file (must exist until this returns)
+        timeout: Seconds to wait for the result once a worker has it
+
+    Returns:
+        The OverallScore fields as a dict, or None if scoring was unavailable
+    """
+    pool = start_pool()
+    if pool is None:
+        return None
+
+    free_workers = _free_workers
+    if not free_workers.acquire(blocking=False):
+        print("Comment quality workers are all busy, skipping scoring (non-critical)")
+        return None
+
+    try:
+        try:
+            future = pool.submit(_score, zip_path)
+        except BaseException:
+            free_workers.release()
+            raise
+        future.add_done_callback(lambda _: free_workers.release())
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        print(f"Comment quality scoring timed out after {timeout}s (non-critical)")
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); recreate the pool on the next call
+        print("Comment quality worker pool is broken, restarting (non-critical)")
+        shutdown_pool()
+    except Exception as e:
+        print(f"Comment quality scoring failed (non-critical): {str(e)}")
+    return None
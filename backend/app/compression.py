@@ -0,0 +1,165 @@
+"""Negotiated gzip/brotli compression of responses.
+
+Responses of at least COMPRESSION_MINIMUM_BYTES are compressed with brotli
+when the client accepts it and the brotli package is installed, otherwise
+with gzip when the client accepts that. Responses that already have a
+Content-Encoding, are not modified (304), or are of a type that is already
+compressed (ZIP files, images) are passed through unchanged. Streaming
+responses are compressed chunk by chunk.
+
+A compressed body is a different representation, so a strong ETag on it is
+turned into a weak one; If-None-Match still matches it (see etags.py).
+"""
+
+import asyncio
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MINIMUM_BYTES = int(os.getenv("COMPRESSION_MINIMUM_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "4"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Bodies at least this large are compressed in a thread so the event loop keeps serving
+THREAD_MINIMUM_BYTES = 256 * 1024
+
+UNCOMPRESSIBLE_TYPES = (
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/vnd.openxmlformats-officedocument",  # XLSX and other zipped Office files
+    "image/", "audio/", "video/", "font/woff",
+)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content coding for a response from the request's Accept-Encoding.
+
+    Returns:
+        Optional[str]: "br", "gzip", or None to send the body as is
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip()] = quality
+
+    def allowed(coding: str) -> bool:
+        return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+    if brotli is not None and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+class StreamCompressor:
+    """Compressor for one response body, fed chunk by chunk."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            data = self.compressor.process(chunk)
+            return data + (self.compressor.finish() if last else self.compressor.flush())
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the coding the client prefers."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    @staticmethod
+    async def compress(compressor: StreamCompressor, body: bytes, last: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_BYTES:
+            return await asyncio.to_thread(compressor.compress, body, last)
+        return compressor.compress(body, last)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or content_type.startswith(UNCOMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                if start_message is not None:
+                    # e.g. http.response.pathsend: the body never passes through here
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                # First body chunk: decide whether to compress at all
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                compressed = await self.compress(compressor, body, not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                start_message = None
+            else:
+                compressed = await self.compress(compressor, body, not more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
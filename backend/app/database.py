@@ -1,4 +1,8 @@
+import asyncio
+import functools
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -9,3 +13,41 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 admin_client: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+# The Supabase clients are synchronous; async handlers run their calls in this
+# pool so a database round trip never blocks the event loop. Its size caps the
+# number of concurrent Supabase requests per worker.
+SUPABASE_THREADS = int(os.getenv("SUPABASE_THREADS", "32"))
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_THREADS, thread_name_prefix="supabase")
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Run a blocking Supabase call (auth, storage or a sync helper) in the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(function, *args, **kwargs))
+
+
+async def execute(query):
+    """Execute a table or rpc query builder in the database thread pool."""
+    return await run_blocking(query.execute)
+
+
+def json_column(value):
+    """
+    Value of ai_evaluation_data or human_evaluation as read from the database.
+
+    The columns are jsonb since migration 008, so values arrive decoded;
+    before it they are JSON text, decoded here (None if it is not valid JSON).
+    """
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return value
+
+
+def json_object(value) -> dict:
+    """A JSON column value (see json_column) that must be an object; {} for anything else."""
+    value = json_column(value)
+    return value if isinstance(value, dict) else {}
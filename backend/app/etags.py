@@ -0,0 +1,71 @@
+"""Strong ETags and If-None-Match for the list endpoints the portals re-fetch.
+
+The ETag of a list is a hash of a change token computed in the database
+(list_change_token, see migration 007) and of the request parameters that
+shape the response. Checking it costs one small query: when the client
+already has the current version, the endpoint answers 304 Not Modified
+without loading, building or serializing the list.
+
+Responses carry Cache-Control: private, no-cache, so browsers keep the list
+but revalidate it on every use; fetch() sends If-None-Match by itself.
+"""
+
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Response
+
+from .database import admin_client, execute
+from .metrics import CONDITIONAL_GETS
+
+# Part of every ETag; bump it when the JSON of a list endpoint changes shape
+LIST_FORMAT_VERSION = "1"
+
+CACHE_CONTROL = "private, no-cache"
+
+
+async def list_etag(list_name: str, key: str, *variant) -> str:
+    """
+    Current ETag of a list.
+
+    Args:
+        list_name: A list known to list_change_token (e.g. "professor_classes")
+        key: The id the list is scoped to (professor, student or assessment)
+        variant: Request parameters that change the response (filters, page size, cursor)
+
+    Returns:
+        str: A quoted strong entity tag
+    """
+    token = (await execute(admin_client.rpc("list_change_token", {"p_list": list_name, "p_key": key}))).data
+    payload = json.dumps([LIST_FORMAT_VERSION, list_name, key, token, variant], default=str)
+    return f'"{hashlib.sha256(payload.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def check_not_modified(list_name: str, key: str, if_none_match: Optional[str],
+                             response: Response, *variant) -> Optional[Response]:
+    """
+    Answer a conditional GET of a list.
+
+    Returns:
+        Optional[Response]: A 304 response to return as is when the client's copy
+            is current; otherwise None, after setting the ETag on the response
+            the endpoint will build
+    """
+    etag = await list_etag(list_name, key, *variant)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        CONDITIONAL_GETS.labels(list_name, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    CONDITIONAL_GETS.labels(list_name, "full").inc()
+    response.headers.update(headers)
+    return None
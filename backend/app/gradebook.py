@@ -0,0 +1,186 @@
+"""Streaming gradebook exports of an assessment, as CSV or XLSX.
+
+The gradebook is read page by page with the assessment_gradebook_page keyset
+function (see migration 009) and encoded as it arrives, so memory stays flat
+whatever the class size. The header goes out before the first query, and the
+next page is fetched while the current one is encoded and sent.
+
+XLSX files are written with the standard library: a workbook with one sheet
+of inline strings, zipped as a stream (zipfile writes data descriptors when
+the output cannot seek), so no spreadsheet library is needed.
+"""
+
+import asyncio
+import csv
+import io
+import os
+import re
+import zipfile
+from typing import AsyncIterator, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from .database import admin_client, execute, json_object
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+HUMAN_EVALUATION_FIELDS = ["innovation_score", "collaboration_score", "presentation_score"]
+
+COLUMNS = [
+    "student_id", "last_name", "first_name", "email", "status", "submitted_at",
+    "ai_score", "adjusted_ai_score", *HUMAN_EVALUATION_FIELDS, "final_score",
+]
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Cells starting with these are run as formulas by spreadsheet programs
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Characters XML 1.0 does not allow, even escaped
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+async def gradebook_pages(assessment_id: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[dict]]:
+    """
+    Yield the gradebook of an assessment page by page, one row per enrolled student.
+
+    The query for the next page is started as soon as a page arrives, so it
+    runs while the caller encodes and sends the current page.
+    """
+    def fetch(after: Optional[dict]):
+        params = {"p_assessment_id": assessment_id, "p_limit": page_size}
+        if after is not None:
+            params.update({
+                "p_after_last_name": after["last_name"] or "",
+                "p_after_first_name": after["first_name"] or "",
+                "p_after_student_id": after["student_id"],
+            })
+        return asyncio.ensure_future(execute(admin_client.rpc("assessment_gradebook_page", params)))
+
+    pending = fetch(None)
+    try:
+        while pending is not None:
+            rows = (await pending).data or []
+            pending = fetch(rows[-1]) if len(rows) == page_size else None
+            if rows:
+                yield rows
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def gradebook_row(row: dict) -> list:
+    """The export columns of a gradebook row, with the human evaluation decoded into its subscores."""
+    human_evaluation = json_object(row.get("human_evaluation"))
+    return [
+        row["student_id"], row.get("last_name"), row.get("first_name"), row.get("email"),
+        row.get("status"), row.get("submitted_at"), row.get("ai_score"), row.get("adjusted_ai_score"),
+        *(human_evaluation.get(field) for field in HUMAN_EVALUATION_FIELDS), row.get("final_score"),
+    ]
+
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def csv_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    """Encode gradebook pages as CSV, one chunk per page (UTF-8 with BOM, so Excel detects the encoding)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([csv_cell(value) for value in gradebook_row(row)] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only, unseekable file that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Gradebook" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_row(values: Iterable) -> str:
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append("<c/>")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(INVALID_XML_CHARS.sub("", str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def xlsx_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    """Encode gradebook pages as an XLSX workbook, streamed one chunk per page."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        with workbook.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row(COLUMNS)
+            ).encode("utf-8"))
+            yield sink.drain()
+            async for rows in pages:
+                sheet.write("".join(xlsx_row(gradebook_row(row)) for row in rows).encode("utf-8"))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
@@ -0,0 +1,153 @@
+"""Prometheus metrics for LLM evaluation, submissions, authentication, caches, conditional GETs and the /metrics endpoint.
+
+Running uvicorn with several workers requires multiprocess mode: set
+PROMETHEUS_MULTIPROC_DIR to an empty, writable directory before the server
+starts. Each worker then writes its samples there and /metrics aggregates
+all workers, so counters and histograms add up across processes.
+"""
+
+import os
+import time
+from typing import Awaitable
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+router = APIRouter()
+
+# LLM calls take seconds to minutes, so the default sub-second buckets are too fine
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, float("inf"))
+
+LLM_PHASE_SECONDS = Histogram(
+    "sepai_llm_phase_seconds",
+    "Time spent in each phase of an LLM evaluation",
+    ["phase"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "sepai_llm_tokens_total",
+    "Tokens reported by the LLM provider",
+    ["kind"],
+)
+LLM_PROVIDER_REQUESTS = Counter(
+    "sepai_llm_provider_requests_total",
+    "Requests sent to the LLM provider by phase and outcome",
+    ["phase", "outcome"],
+)
+LLM_CORRECTIONS = Counter(
+    "sepai_llm_corrections_total",
+    "JSON correction round trips made by check_json_schema",
+)
+LLM_FALLBACKS = Counter(
+    "sepai_llm_fallbacks_total",
+    "Evaluations that fell back instead of using a validated LLM result",
+    ["kind"],
+)
+LLM_EVALUATIONS_IN_FLIGHT = Gauge(
+    "sepai_llm_evaluations_in_flight",
+    "LLM evaluations currently running",
+    multiprocess_mode="livesum",
+)
+LLM_PROVIDER_IN_FLIGHT = Gauge(
+    "sepai_llm_provider_requests_in_flight",
+    "Requests to the LLM provider currently awaiting a response",
+    multiprocess_mode="livesum",
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "sepai_llm_circuit_state",
+    "LLM provider circuit breaker state per worker (0=closed, 1=half-open, 2=open)",
+    multiprocess_mode="liveall",
+)
+LLM_CIRCUIT_TRANSITIONS = Counter(
+    "sepai_llm_circuit_transitions_total",
+    "LLM provider circuit breaker state changes by new state",
+    ["state"],
+)
+LLM_CIRCUIT_REJECTIONS = Counter(
+    "sepai_llm_circuit_rejections_total",
+    "Provider calls skipped because the circuit was open",
+)
+SUBMISSION_STAGE_SECONDS = Histogram(
+    "sepai_submission_stage_seconds",
+    "Time spent in each stage of submit_assessment (join is the wait for the concurrent stages)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+AUTH_VERIFICATIONS = Counter(
+    "sepai_auth_verifications_total",
+    "Authenticated requests by how the bearer token was verified (cache, local or remote)",
+    ["method"],
+)
+CACHE_LOOKUPS = Counter(
+    "sepai_cache_lookups_total",
+    "Lookups in the in-process caches by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+CONDITIONAL_GETS = Counter(
+    "sepai_conditional_gets_total",
+    "GETs of the ETag-enabled lists by list and result (not_modified or full)",
+    ["list", "result"],
+)
+
+# Pre-bound label children keep the hot path to a single lock-protected add
+PACKING_SECONDS = LLM_PHASE_SECONDS.labels("packing")
+PROVIDER_SECONDS = LLM_PHASE_SECONDS.labels("provider")
+VALIDATION_SECONDS = LLM_PHASE_SECONDS.labels("validation")
+CORRECTION_SECONDS = LLM_PHASE_SECONDS.labels("correction")
+PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+COMPLETION_TOKENS = LLM_TOKENS.labels("completion")
+CANNED_RESPONSE_FALLBACKS = LLM_FALLBACKS.labels("canned_response")
+BASIC_EVALUATION_FALLBACKS = LLM_FALLBACKS.labels("basic_evaluation")
+DEFERRED_EVALUATIONS = LLM_FALLBACKS.labels("deferred")
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+LLM_CIRCUIT_STATE.set(0)
+
+
+def record_token_usage(response_data: dict):
+    """Count prompt and completion tokens from an OpenRouter response body."""
+    usage = response_data.get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens")
+    completion_tokens = usage.get("completion_tokens")
+    if prompt_tokens:
+        PROMPT_TOKENS.inc(prompt_tokens)
+    if completion_tokens:
+        COMPLETION_TOKENS.inc(completion_tokens)
+
+
+def record_circuit_state(old_state: str, new_state: str):
+    """Circuit breaker callback exporting the new state."""
+    LLM_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[new_state])
+    LLM_CIRCUIT_TRANSITIONS.labels(new_state).inc()
+
+
+async def time_stage(stage: str, awaitable: Awaitable):
+    """Await a submission stage and record its duration, whether it succeeds or fails."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        SUBMISSION_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> bytes:
+    """Render all metrics, aggregating every worker in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# Plain def so FastAPI runs the file-based multiprocess collection in its threadpool
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,43 @@
+"""JSON responses for the large list and detail endpoints.
+
+FastAPI runs every returned value without a response model through
+jsonable_encoder, which walks and copies the whole structure in Python,
+before json.dumps serializes it again. Rows from Supabase are already plain
+JSON values, so the heavy endpoints return a FastJSONResponse themselves:
+the content is serialized in one pass, with orjson when it is installed and
+with the standard library otherwise.
+"""
+
+import json
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializing with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def fast_json(content: Any, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """
+    Return content from an endpoint without FastAPI's jsonable_encoder pass.
+
+    Args:
+        content: Plain JSON values (dicts, lists, strings, numbers, booleans, None)
+        headers: Headers to send, usually those set on the endpoint's injected Response,
+            which FastAPI does not copy to a response returned directly
+
+    Returns:
+        FastJSONResponse: The response to return from the endpoint
+    """
+    return FastJSONResponse(content, headers=dict(headers) if headers else None)
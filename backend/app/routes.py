@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query, Header, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from .auth import get_current_user
-from .database import admin_client, supabase
+from .auth import get_current_user, get_current_user_revalidated
+from .database import admin_client, supabase, execute, run_blocking, json_column, json_object
 from .ai_evaluator import evaluate_project
 import uuid
+import asyncio
+import base64
+import time
 from datetime import datetime, timezone, timedelta
 import os
-import zipfile
 import shutil
 import atexit
 import json
@@ -16,6 +18,16 @@ import tempfile
 import sys
 from pathlib import Path
 from .zip_extractor import extract_developer_files
+from backend.common.archive import ArchiveError, open_archive, safe_extract_all, save_upload, validate_archive
+from .metrics import BASIC_EVALUATION_FALLBACKS, DEFERRED_EVALUATIONS, SUBMISSION_STAGE_SECONDS, time_stage
+from .circuit_breaker import CircuitOpenError
+from .comment_quality_pool import score_comment_quality
+from .student_index import get_student_index
+from . import authorization
+from .etags import check_not_modified
+from .responses import fast_json
+from . import gradebook
+from . import analytics
 import requests
 from dotenv import load_dotenv
 
@@ -53,7 +65,22 @@ else:
     load_dotenv(override=True)
 
 # Import the LLM evaluation function
-from backend.app.routes_ai import llm_evaluate
+from backend.app.routes_ai import ProviderError, llm_evaluate
+
+DEFERRED_AI_FEEDBACK = "AI evaluation is temporarily unavailable. This submission will be evaluated automatically."
+REEVALUATION_FAILED_FEEDBACK = "AI evaluation could not be completed for this submission. It will be graded by your professor."
+
+# Status of the placeholder rows created for students who have not submitted yet
+NO_SUBMISSION_STATUS = "no submission"
+
+# How long a re-evaluation claim is held before another worker may take the submission over
+# (longer than the slowest evaluation, so a live worker keeps its rows)
+REEVALUATION_LEASE_SECONDS = int(os.getenv("REEVALUATION_LEASE_SECONDS", "1800"))
+# Failed re-evaluations after which a deferred submission is left to the professor
+REEVALUATION_MAX_ATTEMPTS = int(os.getenv("REEVALUATION_MAX_ATTEMPTS", "5"))
+
+# Most grades accepted by one POST /assessments/{id}/grades request
+GRADE_BATCH_LIMIT = int(os.getenv("GRADE_BATCH_LIMIT", "500"))
 
 router = APIRouter()
 
@@ -102,6 +129,12 @@ class SubmissionUpdate(BaseModel):
     adjusted_ai_score: Optional[float] = None
     human_evaluation: Optional[dict] = None
 
+class SubmissionGrade(SubmissionUpdate):
+    submission_id: int
+
+class BatchGradeUpdate(BaseModel):
+    grades: List[SubmissionGrade]
+
 class UserResponse(BaseModel):
     id: str
     first_name: str
@@ -114,71 +147,45 @@ class UserResponse(BaseModel):
 async def create_class(class_data: ClassCreate, current_user=Depends(get_current_user)):
     try:
         class_id = str(uuid.uuid4())
-        response = admin_client.table("classes").insert({
+        response = await execute(admin_client.table("classes").insert({
             "id": class_id,
             "professor_id": current_user.id,
             "name": class_data.name,
             "description": class_data.description
-        }).execute()
+        }))
+        authorization.class_created(class_id, current_user.id)
 
         return ClassResponse(**response.data[0])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/classes", response_model=List[ClassResponse])
-async def get_professor_classes(current_user=Depends(get_current_user)):
+async def get_professor_classes(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
     try:
-        response = admin_client.table("classes").select("*").eq("professor_id", current_user.id).execute()
-        return [ClassResponse(**cls) for cls in response.data]
+        not_modified = await check_not_modified("professor_classes", current_user.id, if_none_match, response)
+        if not_modified:
+            return not_modified
+
+        classes_response = await execute(admin_client.table("classes").select("*").eq("professor_id", current_user.id))
+        return [ClassResponse(**cls) for cls in classes_response.data]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/professor/dashboard-stats")
 async def get_professor_dashboard_stats(current_user=Depends(get_current_user)):
     try:
-        # Get all classes for the professor
-        classes_response = admin_client.table("classes").select("id").eq("professor_id", current_user.id).execute()
-        class_ids = [cls["id"] for cls in classes_response.data]
-        
-        if not class_ids:
-            return {
-                "total_submissions": 0,
-                "graded_submissions": 0,
-                "pending_submissions": 0,
-                "average_score": 0.0
-            }
-        
-        # Get all assessments for these classes
-        assessments_response = admin_client.table("assessments").select("id").in_("class_id", class_ids).execute()
-        assessment_ids = [a["id"] for a in assessments_response.data]
-        
-        if not assessment_ids:
-            return {
-                "total_submissions": 0,
-                "graded_submissions": 0,
-                "pending_submissions": 0,
-                "average_score": 0.0
-            }
-        
-        # Get all submissions for these assessments
-        submissions_response = admin_client.table("submissions").select("*").in_("assessment_id", assessment_ids).execute()
-        submissions = submissions_response.data
-        
-        total_submissions = len(submissions)
-        # A submission is graded if it has been reviewed (status = 'reviewed' or 'released')
-        graded_submissions = len([s for s in submissions if s.get("status") in ["reviewed", "released"]])
-        pending_submissions = len([s for s in submissions if s.get("status") not in ["reviewed", "released"]])
-        
-        # Calculate average score from graded submissions
-        graded_list = [s for s in submissions if s.get("status") in ["reviewed", "released"]]
-        scores = [s.get("final_score") for s in graded_list if s.get("final_score") is not None]
-        average_score = sum(scores) / len(scores) if scores else 0.0
-        
+        # Counts and the average are computed in the database (see migration 005)
+        stats = (await execute(admin_client.rpc("professor_dashboard_stats", {"p_professor_id": current_user.id}))).data
+
         return {
-            "total_submissions": total_submissions,
-            "graded_submissions": graded_submissions,
-            "pending_submissions": pending_submissions,
-            "average_score": round(average_score, 1)
+            "total_submissions": stats["total_submissions"],
+            "graded_submissions": stats["graded_submissions"],
+            "pending_submissions": stats["pending_submissions"],
+            "average_score": round(float(stats["average_score"] or 0.0), 1)
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -186,41 +193,24 @@ async def get_professor_dashboard_stats(current_user=Depends(get_current_user)):
 @router.get("/professor/recent-submissions")
 async def get_recent_submissions(current_user=Depends(get_current_user)):
     try:
-        # Get all classes for the professor
-        classes_response = admin_client.table("classes").select("id").eq("professor_id", current_user.id).execute()
-        class_ids = [cls["id"] for cls in classes_response.data]
-        
-        if not class_ids:
-            return []
-        
-        # Get all assessments for these classes
-        assessments_response = admin_client.table("assessments").select("id, title, classes(name)").in_("class_id", class_ids).execute()
-        assessment_ids = [a["id"] for a in assessments_response.data]
-        assessment_map = {a["id"]: a for a in assessments_response.data}
-        
-        if not assessment_ids:
-            return []
-        
-        # Get all submissions for these assessments, ordered by created_at, limit to 5
-        submissions_response = admin_client.table("submissions").select(
-            "id, student_id, assessment_id, status, ai_score, final_score, created_at, users!inner(first_name, last_name)"
-        ).in_("assessment_id", assessment_ids).order("created_at", desc=True).limit(5).execute()
-
-        submissions = submissions_response.data
+        # The 5 most recent submissions with their names, selected in the database (see migration 005)
+        submissions = (await execute(admin_client.rpc("professor_recent_submissions", {
+            "p_professor_id": current_user.id,
+            "p_limit": 5
+        }))).data
         result = []
 
         for submission in submissions:
-            assessment = assessment_map.get(submission["assessment_id"], {})
-            student_name = f"{submission['users']['first_name']} {submission['users']['last_name']}"
+            student_name = f"{submission['first_name']} {submission['last_name']}"
             # For newly added students with no actual submission, show "-" as date
-            submission_date = submission.get("created_at") or ("-" if submission.get("status") == "no submission" else "")
+            submission_date = submission.get("created_at") or ("-" if submission.get("status") == NO_SUBMISSION_STATUS else "")
 
             result.append({
                 "id": submission["id"],
                 "student_name": student_name,
-                "project": submission.get("project_name", "Project"),
-                "assessment_title": assessment.get("title", "Unknown Assessment"),
-                "class_name": assessment.get("classes", {}).get("name", "Unknown Class"),
+                "project": "Project",
+                "assessment_title": submission.get("assessment_title") or "Unknown Assessment",
+                "class_name": submission.get("class_name") or "Unknown Class",
                 "submission_date": submission_date,
                 "status": submission.get("status", "pending"),
                 "ai_score": submission.get("ai_score"),
@@ -232,29 +222,26 @@ async def get_recent_submissions(current_user=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/classes/{class_id}")
-async def delete_class(class_id: str, current_user=Depends(get_current_user)):
+async def delete_class(class_id: str, current_user=Depends(get_current_user_revalidated)):
     try:
         # Verify the professor owns this class
-        class_check = admin_client.table("classes").select("id").eq("id", class_id).eq("professor_id", current_user.id).execute()
-        if not class_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to delete this class")
+        await authorization.require_class_owner(class_id, current_user.id, "Not authorized to delete this class")
 
         # Get all assessments for this class
-        assessments_response = admin_client.table("assessments").select("id").eq("class_id", class_id).execute()
+        assessments_response = await execute(admin_client.table("assessments").select("id").eq("class_id", class_id))
+        assessment_ids = [a["id"] for a in assessments_response.data]
 
-        # Delete submissions and assessments in cascade order
-        for assessment in assessments_response.data:
-            assessment_id = assessment["id"]
-            # Delete associated submissions first
-            admin_client.table("submissions").delete().eq("assessment_id", assessment_id).execute()
-            # Delete the assessment
-            admin_client.table("assessments").delete().eq("id", assessment_id).execute()
+        # Delete submissions and assessments in cascade order, one request per table
+        if assessment_ids:
+            await execute(admin_client.table("submissions").delete().in_("assessment_id", assessment_ids))
+            await execute(admin_client.table("assessments").delete().eq("class_id", class_id))
 
         # Delete class_students
-        admin_client.table("class_students").delete().eq("class_id", class_id).execute()
+        await execute(admin_client.table("class_students").delete().eq("class_id", class_id))
 
         # Delete the class
-        admin_client.table("classes").delete().eq("id", class_id).execute()
+        await execute(admin_client.table("classes").delete().eq("id", class_id))
+        authorization.class_deleted(class_id, assessment_ids)
 
         return {"message": "Class deleted successfully"}
     except Exception as e:
@@ -264,14 +251,12 @@ async def delete_class(class_id: str, current_user=Depends(get_current_user)):
 async def get_class_students(class_id: str, current_user=Depends(get_current_user)):
     try:
         # First verify the professor owns this class
-        class_check = admin_client.table("classes").select("id").eq("id", class_id).eq("professor_id", current_user.id).execute()
-        if not class_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to view this class")
+        await authorization.require_class_owner(class_id, current_user.id, "Not authorized to view this class")
 
         # Get students in the class
-        response = admin_client.table("class_students").select(
+        response = await execute(admin_client.table("class_students").select(
             "users!inner(auth_id, first_name, last_name, email)"
-        ).eq("class_id", class_id).execute()
+        ).eq("class_id", class_id))
 
 
         students = []
@@ -291,51 +276,53 @@ async def get_class_students(class_id: str, current_user=Depends(get_current_use
 @router.post("/classes/{class_id}/students")
 async def add_student_to_class(class_id: str, student_data: AddStudentToClass, current_user=Depends(get_current_user)):
     try:
-        # Verify the professor owns this class
-        class_check = admin_client.table("classes").select("id").eq("id", class_id).eq("professor_id", current_user.id).execute()
-        if not class_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to modify this class")
+        # The ownership check, the student and enrollment lookups and the class's
+        # assessments are independent, so they are fetched concurrently
+        _, student_check, existing, assessments_response = await asyncio.gather(
+            authorization.require_class_owner(class_id, current_user.id, "Not authorized to modify this class"),
+            execute(admin_client.table("users").select("id").eq("auth_id", student_data.student_id).eq("role", "student")),
+            execute(admin_client.table("class_students").select("id").eq("class_id", class_id).eq("student_id", student_data.student_id)),
+            execute(admin_client.table("assessments").select("id").eq("class_id", class_id))
+        )
 
         # Check if student exists
-        student_check = admin_client.table("users").select("id").eq("auth_id", student_data.student_id).eq("role", "student").execute()
         if not student_check.data:
             raise HTTPException(status_code=404, detail="Student not found")
 
         # Check if student is already in the class
-        existing = admin_client.table("class_students").select("id").eq("class_id", class_id).eq("student_id", student_data.student_id).execute()
         if existing.data:
             raise HTTPException(status_code=400, detail="Student already in class")
 
         # Add student to class
-        response = admin_client.table("class_students").insert({
+        response = await execute(admin_client.table("class_students").insert({
             "id": str(uuid.uuid4()),
             "class_id": class_id,
             "student_id": student_data.student_id
-        }).execute()
+        }))
+        authorization.student_enrolled(class_id, student_data.student_id)
 
-        # Get all assessments for this class
-        assessments_response = admin_client.table("assessments").select("id").eq("class_id", class_id).execute()
         assessment_ids = [a["id"] for a in assessments_response.data]
 
-        # Create submission records for all existing assessments for this newly added student
+        # Create submission records for all existing assessments for this newly added student,
+        # in one request; ON CONFLICT DO NOTHING skips assessments the student already has a row for
         import random
-        for assessment_id in assessment_ids:
-            # Check if submission already exists (shouldn't happen but safety check)
-            existing_submission = admin_client.table("submissions").select("id").eq("assessment_id", assessment_id).eq("student_id", student_data.student_id).execute()
-            if not existing_submission.data:
-                submission_id = random.randint(1000000000, 9999999999)
-                admin_client.table("submissions").insert({
-                    "id": submission_id,
-                    "assessment_id": assessment_id,
-                    "student_id": student_data.student_id,
-                    "ai_feedback": "No submission yet.",
-                    "ai_score": None,
-                    "professor_feedback": "",
-                    "final_score": None,
-                    "zip_path": None,
-                    "status": "no submission",
-                    "created_at": datetime.utcnow().isoformat()  # Set current time for new records
-                }).execute()
+        created_at = datetime.utcnow().isoformat()  # Set current time for new records
+        placeholders = [{
+            "id": random.randint(1000000000, 9999999999),
+            "assessment_id": assessment_id,
+            "student_id": student_data.student_id,
+            "ai_feedback": "No submission yet.",
+            "ai_score": None,
+            "professor_feedback": "",
+            "final_score": None,
+            "zip_path": None,
+            "status": NO_SUBMISSION_STATUS,
+            "created_at": created_at
+        } for assessment_id in assessment_ids]
+        if placeholders:
+            await execute(admin_client.table("submissions").upsert(
+                placeholders, on_conflict="assessment_id,student_id", ignore_duplicates=True
+            ))
 
         return {"message": "Student added to class successfully"}
     except Exception as e:
@@ -345,85 +332,82 @@ async def add_student_to_class(class_id: str, student_data: AddStudentToClass, c
 async def remove_student_from_class(class_id: str, student_id: str, current_user=Depends(get_current_user)):
     try:
         # Verify the professor owns this class
-        class_check = admin_client.table("classes").select("id").eq("id", class_id).eq("professor_id", current_user.id).execute()
-        if not class_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to modify this class")
+        await authorization.require_class_owner(class_id, current_user.id, "Not authorized to modify this class")
 
         # Remove student from class
-        admin_client.table("class_students").delete().eq("class_id", class_id).eq("student_id", student_id).execute()
+        await execute(admin_client.table("class_students").delete().eq("class_id", class_id).eq("student_id", student_id))
+        authorization.student_unenrolled(class_id, student_id)
 
         return {"message": "Student removed from class successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # Students search endpoint
-@router.get("/students/search", response_model=List[StudentResponse])
-async def search_students(query: str, current_user=Depends(get_current_user)):
-    try:
-        # Search across first_name, last_name, and email fields
-        first_name_results = admin_client.table("users").select("auth_id, first_name, last_name, email").eq("role", "student").ilike("first_name", f"%{query}%").execute()
-        last_name_results = admin_client.table("users").select("auth_id, first_name, last_name, email").eq("role", "student").ilike("last_name", f"%{query}%").execute()
-        email_results = admin_client.table("users").select("auth_id, first_name, last_name, email").eq("role", "student").ilike("email", f"%{query}%").execute()
-
-        # Combine and deduplicate results
-        all_users = {}
-
-        for user in first_name_results.data:
-            all_users[user["auth_id"]] = user
-        for user in last_name_results.data:
-            all_users[user["auth_id"]] = user
-        for user in email_results.data:
-            all_users[user["auth_id"]] = user
-
-        students = [StudentResponse(
-            id=user["auth_id"],
-            first_name=user["first_name"],
-            last_name=user["last_name"],
-            email=user["email"]
-        ) for user in all_users.values()]
+def parse_cursor(cursor: Optional[str]) -> int:
+    """Decode a list cursor (the offset of the next page) from a query parameter."""
+    if cursor is None:
+        return 0
+    if not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(cursor)
+
+def student_page_response(students: List[dict], next_offset: Optional[int], response: Response) -> List[StudentResponse]:
+    """Build a page of students, passing the next page's cursor in the X-Next-Cursor header."""
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = str(next_offset)
+    return [StudentResponse(
+        id=student["auth_id"],
+        first_name=student["first_name"],
+        last_name=student["last_name"],
+        email=student["email"]
+    ) for student in students]
 
-        return students
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@router.get("/students/search", response_model=List[StudentResponse])
+async def search_students(
+    query: str,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    # Answered from the in-memory index, ranked by how well each student matches
+    index = await get_student_index()
+    students, next_offset = index.search(query, limit, parse_cursor(cursor))
+    return student_page_response(students, next_offset, response)
 
 @router.get("/students", response_model=List[StudentResponse])
-async def get_all_students(current_user=Depends(get_current_user)):
+async def get_all_students(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
     try:
-        response = admin_client.table("users").select("auth_id, first_name, last_name, email").eq("role", "student").execute()
-
-        students = []
-        for user in response.data:
-            students.append(StudentResponse(
-                id=user["auth_id"],
-                first_name=user["first_name"],
-                last_name=user["email"],
-                email=user["email"]
-            ))
-
-        return students
+        index = await get_student_index()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    students, next_offset = index.search("", limit, parse_cursor(cursor))
+    return student_page_response(students, next_offset, response)
 
 # Assessments endpoints
 @router.post("/assessments", response_model=AssessmentResponse)
 async def create_assessment(assessment_data: AssessmentCreate, current_user=Depends(get_current_user)):
     try:
         # Verify the professor owns the class
-        class_check = admin_client.table("classes").select("id").eq("id", assessment_data.class_id).eq("professor_id", current_user.id).execute()
-        if not class_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to create assessments for this class")
+        await authorization.require_class_owner(assessment_data.class_id, current_user.id, "Not authorized to create assessments for this class")
 
         # Convert Manila time to UTC for storage
         deadline_utc = parse_manila_datetime(assessment_data.deadline)
 
         assessment_id = str(uuid.uuid4())
-        response = admin_client.table("assessments").insert({
+        response = await execute(admin_client.table("assessments").insert({
             "id": assessment_id,
             "class_id": assessment_data.class_id,
             "title": assessment_data.title,
             "instructions": assessment_data.instructions,
             "deadline": deadline_utc.isoformat()
-        }).execute()
+        }))
+        authorization.assessment_created(assessment_id, assessment_data.class_id)
 
         # Convert back to Manila time for response
         assessment_data = response.data[0]
@@ -434,10 +418,18 @@ async def create_assessment(assessment_data: AssessmentCreate, current_user=Depe
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/assessments", response_model=List[AssessmentResponse])
-async def get_professor_assessments(current_user=Depends(get_current_user)):
+async def get_professor_assessments(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
     try:
+        not_modified = await check_not_modified("professor_assessments", current_user.id, if_none_match, response)
+        if not_modified:
+            return not_modified
+
         # Get professor's classes first to get class names
-        classes_response = admin_client.table("classes").select("id, name").eq("professor_id", current_user.id).execute()
+        classes_response = await execute(admin_client.table("classes").select("id, name").eq("professor_id", current_user.id))
         class_map = {cls["id"]: cls["name"] for cls in classes_response.data}
         class_ids = list(class_map.keys())
 
@@ -445,10 +437,10 @@ async def get_professor_assessments(current_user=Depends(get_current_user)):
             return []
 
         # Get assessments for these classes
-        response = admin_client.table("assessments").select("*").in_("class_id", class_ids).execute()
+        assessments_response = await execute(admin_client.table("assessments").select("*").in_("class_id", class_ids))
 
         assessments = []
-        for assessment in response.data:
+        for assessment in assessments_response.data:
             # Convert UTC deadline back to Manila time for display
             utc_deadline = datetime.fromisoformat(assessment['deadline'].replace('Z', '+00:00'))
             assessment['deadline'] = format_manila_datetime(utc_deadline)
@@ -463,12 +455,7 @@ async def get_professor_assessments(current_user=Depends(get_current_user)):
 async def update_assessment(assessment_id: str, assessment_data: dict, current_user=Depends(get_current_user)):
     try:
         # Verify the professor owns the assessment
-        ownership_check = admin_client.table("assessments").select(
-            "class_id, classes!inner(professor_id)"
-        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id).execute()
-
-        if not ownership_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to update this assessment")
+        await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to update this assessment")
 
         # Update the assessment
         update_data = {}
@@ -484,7 +471,7 @@ async def update_assessment(assessment_id: str, assessment_data: dict, current_u
         if not update_data:
             raise HTTPException(status_code=400, detail="No valid fields provided for update")
 
-        response = admin_client.table("assessments").update(update_data).eq("id", assessment_id).execute()
+        response = await execute(admin_client.table("assessments").update(update_data).eq("id", assessment_id))
 
         # Convert back to Manila time for response
         assessment = response.data[0]
@@ -499,9 +486,9 @@ async def update_assessment(assessment_id: str, assessment_data: dict, current_u
 async def get_assessment_details(assessment_id: str, current_user=Depends(get_current_user)):
     try:
         # Get assessment with class info to verify ownership
-        assessment_response = admin_client.table("assessments").select(
+        assessment_response = await execute(admin_client.table("assessments").select(
             "*, classes!inner(name, professor_id)"
-        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id).execute()
+        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id))
 
         if not assessment_response.data:
             raise HTTPException(status_code=404, detail="Assessment not found")
@@ -524,133 +511,140 @@ async def get_assessment_details(assessment_id: str, current_user=Depends(get_cu
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/assessments/{assessment_id}/submissions")
-async def get_assessment_submissions(assessment_id: str, current_user=Depends(get_current_user)):
-    try:
-        # Verify the professor owns the assessment's class and get class_id
-        assessment_check = admin_client.table("assessments").select(
-            "class_id, classes!inner(professor_id)"
-        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id).execute()
-
-        if not assessment_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to view this assessment")
-
-        class_id = assessment_check.data[0]["class_id"]
-
-        # Get all students in the class
-        students_response = admin_client.table("class_students").select(
-            "users!inner(auth_id, first_name, last_name, email)"
-        ).eq("class_id", class_id).execute()
-
-        # Get all submissions for this assessment
-        submissions_response = admin_client.table("submissions").select(
-            "*, users!inner(first_name, last_name, email)"
-        ).eq("assessment_id", assessment_id).execute()
-
-        # Create a map of submissions by student_id
-        submission_map = {sub["student_id"]: sub for sub in submissions_response.data}
+def encode_submission_cursor(row: dict) -> str:
+    """Opaque cursor pointing after a row of the submission list."""
+    if row["id"] is not None:
+        key = {"created_at": row["created_at"], "id": row["id"]}
+    else:
+        key = {"student_id": row["student_id"]}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
 
-        submissions = []
-        import json
-        for item in students_response.data:
-            user = item["users"]
-            student_id = user["auth_id"]
+def decode_submission_cursor(cursor: Optional[str]) -> dict:
+    """Turn a submission list cursor into the keyset parameters of assessment_submission_page."""
+    if cursor is None:
+        return {}
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if "student_id" in key:
+            return {"p_after_student_id": str(key["student_id"])}
+        return {"p_after_created_at": str(key["created_at"]), "p_after_id": int(key["id"])}
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-            if student_id in submission_map:
-                # Student submitted
-                submission = submission_map[student_id]
-                
-                # Parse ai_evaluation_data if it exists
-                ai_evaluation_data = None
-                if submission.get("ai_evaluation_data"):
-                    try:
-                        ai_evaluation_data = json.loads(submission["ai_evaluation_data"])
-                    except (json.JSONDecodeError, TypeError):
-                        ai_evaluation_data = None
-                
-                submissions.append({
-                    "id": submission["id"],
-                    "assessment_id": submission["assessment_id"],
-                    "student_id": submission["student_id"],
-                    "student_name": f"{user['first_name']} {user['last_name']}",
-                    "student_email": user["email"],
-                    "ai_feedback": submission["ai_feedback"],
-                    "ai_score": submission["ai_score"],
-                    "ai_evaluation_data": ai_evaluation_data,  # Full evaluation data
-                    "professor_feedback": submission["professor_feedback"],
-                    "final_score": submission["final_score"],
-                    "zip_path": submission["zip_path"],
-                    "status": submission["status"],
-                    "created_at": submission["created_at"]
-                })
-            else:
-                # Student did not submit - create placeholder
-                submissions.append({
-                    "id": None,
-                    "assessment_id": assessment_id,
-                    "student_id": student_id,
-                    "student_name": f"{user['first_name']} {user['last_name']}",
-                    "student_email": user["email"],
-                    "ai_feedback": None,
-                    "ai_score": None,
-                    "professor_feedback": None,
-                    "final_score": None,
-                    "zip_path": None,
-                    "status": "no submission",
-                    "created_at": None
-                })
-
-        return submissions
+@router.get("/assessments/{assessment_id}/submissions")
+async def get_assessment_submissions(
+    assessment_id: str,
+    response: Response,
+    status: Optional[List[str]] = Query(None),
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
+    """
+    List an assessment's submissions, one row per enrolled student.
+
+    Rows carry summary columns only; the evaluation text and data come from
+    GET /submissions/{id}. Submissions are listed newest first, followed by
+    the students who have not submitted. When there are more rows, the cursor
+    of the next page is returned in the X-Next-Cursor header. Responses carry
+    an ETag; a matching If-None-Match is answered with 304 Not Modified.
+
+    Args:
+        status: Only list rows with these statuses (repeatable; "no submission" includes students without a row)
+        limit: Maximum number of rows to return
+        cursor: X-Next-Cursor of the previous page
+    """
+    try:
+        # Verify the professor owns the assessment's class
+        await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to view this assessment")
+
+        not_modified = await check_not_modified(
+            "assessment_submissions", assessment_id, if_none_match, response, status, limit, cursor)
+        if not_modified:
+            return not_modified
+
+        # One keyset page in the database (see migration 006); one extra row tells if there is a next page
+        rows = (await execute(admin_client.rpc("assessment_submission_page", {
+            "p_assessment_id": assessment_id,
+            "p_statuses": status,
+            "p_limit": limit + 1,
+            **decode_submission_cursor(cursor)
+        }))).data
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = encode_submission_cursor(rows[-1])
+
+        return fast_json([{
+            "id": row["id"],
+            "assessment_id": assessment_id,
+            "student_id": row["student_id"],
+            "student_name": f"{row['first_name']} {row['last_name']}",
+            "student_email": row["email"],
+            "ai_score": row["ai_score"],
+            "professor_feedback": row["professor_feedback"],
+            "final_score": row["final_score"],
+            "zip_path": row["zip_path"],
+            "status": row["status"],
+            "created_at": row["created_at"]
+        } for row in rows], response.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/assessments/{assessment_id}/export")
+async def export_assessment_gradebook(
+    assessment_id: str,
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    current_user=Depends(get_current_user)
+):
+    """
+    Download an assessment's gradebook: one row per enrolled student, ordered by name.
+
+    Rows carry the submission status and time, AI score, adjusted AI score,
+    human evaluation subscores and final score. The file is streamed as the
+    gradebook is read page by page, so it starts downloading right away and
+    memory use does not grow with the class size.
+
+    Args:
+        format: "csv" (default) or "xlsx"
+    """
+    await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to export this assessment")
+
+    pages = gradebook.gradebook_pages(assessment_id)
+    if format == "xlsx":
+        body, media_type = gradebook.xlsx_stream(pages), gradebook.XLSX_MEDIA_TYPE
+    else:
+        body, media_type = gradebook.csv_stream(pages), gradebook.CSV_MEDIA_TYPE
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="gradebook-{assessment_id}.{format}"'
+    })
+
 @router.get("/submissions/{submission_id}")
 async def get_submission(submission_id: str, current_user=Depends(get_current_user)):
     try:
         # Get the submission first
-        submission_response = admin_client.table("submissions").select("*").eq("id", submission_id).execute()
+        submission_response = await execute(admin_client.table("submissions").select("*").eq("id", submission_id))
 
         if not submission_response.data:
             raise HTTPException(status_code=404, detail="Submission not found")
 
         submission = submission_response.data[0]
 
-        # Get the assessment
-        assessment_response = admin_client.table("assessments").select("class_id").eq("id", submission["assessment_id"]).execute()
+        # Check the professor owns the assessment's class (cached after the first lookup)
+        await authorization.require_assessment_owner(
+            submission["assessment_id"], current_user.id, "Not authorized to access this submission")
 
-        if not assessment_response.data:
-            raise HTTPException(status_code=404, detail="Assessment not found")
-
-        assessment = assessment_response.data[0]
-
-        # Get the class and check professor_id
-        class_response = admin_client.table("classes").select("professor_id").eq("id", assessment["class_id"]).execute()
-
-        if not class_response.data or class_response.data[0]["professor_id"] != current_user.id:
-            raise HTTPException(status_code=403, detail="Not authorized to access this submission")
+        # Evaluation data is jsonb, so it arrives decoded (see json_column)
+        ai_evaluation_data = json_column(submission.get("ai_evaluation_data"))
+        human_evaluation = json_column(submission.get("human_evaluation"))
 
-        # Parse ai_evaluation_data if it exists
-        ai_evaluation_data = None
-        if submission.get("ai_evaluation_data"):
-            try:
-                import json
-                ai_evaluation_data = json.loads(submission["ai_evaluation_data"])
-            except (json.JSONDecodeError, TypeError):
-                # If parsing fails, just use None
-                ai_evaluation_data = None
-        
         # Get adjusted_ai_score if it exists
         adjusted_ai_score = submission.get("adjusted_ai_score")
-        
-        # Parse human_evaluation if it exists
-        human_evaluation = None
-        if submission.get("human_evaluation"):
-            try:
-                human_evaluation = json.loads(submission["human_evaluation"])
-            except (json.JSONDecodeError, TypeError):
-                human_evaluation = None
 
-        return {
+        return fast_json({
             "id": submission["id"],
             "assessment_id": submission["assessment_id"],
             "student_id": submission["student_id"],
@@ -664,67 +658,73 @@ async def get_submission(submission_id: str, current_user=Depends(get_current_us
             "zip_path": submission["zip_path"],
             "status": submission["status"],
             "created_at": submission["created_at"]
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def grade_update(update_data: SubmissionUpdate) -> dict:
+    """
+    Validate a grade and build the submission columns it updates.
+
+    Raises:
+        HTTPException: 400 if a score is out of range or the human evaluation is incomplete
+    """
+    # Validate final score
+    if update_data.final_score < 0 or update_data.final_score > 100:
+        raise HTTPException(status_code=400, detail="Final score must be between 0 and 100")
+
+    # Validate adjusted AI score if provided
+    if update_data.adjusted_ai_score is not None:
+        if update_data.adjusted_ai_score < 0 or update_data.adjusted_ai_score > 24:
+            raise HTTPException(status_code=400, detail="Adjusted AI score must be between 0 and 24")
+
+    # Validate human evaluation if provided
+    if update_data.human_evaluation:
+        human_eval = update_data.human_evaluation
+        required_fields = ['innovation_score', 'collaboration_score', 'presentation_score']
+        
+        for field in required_fields:
+            if field not in human_eval:
+                raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+            
+            score = human_eval[field]
+            if not isinstance(score, (int, float)) or score < 0 or score > 4:
+                raise HTTPException(status_code=400, detail=f"{field} must be a number between 0 and 4")
+
+    # Prepare update data
+    update_dict = {
+        "professor_feedback": update_data.professor_feedback or "",
+        "final_score": update_data.final_score,
+        "status": "reviewed"
+    }
+    
+    # Add adjusted AI score if provided
+    if update_data.adjusted_ai_score is not None:
+        update_dict["adjusted_ai_score"] = float(update_data.adjusted_ai_score)
+    
+    # Add human evaluation if provided (a jsonb column since migration 008)
+    if update_data.human_evaluation:
+        # Ensure all scores are floats
+        human_eval_clean = {
+            "innovation_score": float(update_data.human_evaluation.get("innovation_score", 0)),
+            "collaboration_score": float(update_data.human_evaluation.get("collaboration_score", 0)),
+            "presentation_score": float(update_data.human_evaluation.get("presentation_score", 0))
+        }
+        update_dict["human_evaluation"] = human_eval_clean
+
+    return update_dict
+
 @router.put("/submissions/{submission_id}")
 async def update_submission(submission_id: str, update_data: SubmissionUpdate, current_user=Depends(get_current_user)):
     try:
         # Verify the professor owns the submission's assessment's class
-        submission_check = admin_client.table("submissions").select(
-            "assessments(classes(professor_id))"
-        ).eq("id", submission_id).execute()
-
-        if not submission_check.data or submission_check.data[0]["assessments"]["classes"]["professor_id"] != current_user.id:
-            raise HTTPException(status_code=403, detail="Not authorized to update this submission")
-
-        # Validate final score
-        if update_data.final_score < 0 or update_data.final_score > 100:
-            raise HTTPException(status_code=400, detail="Final score must be between 0 and 100")
-
-        # Validate adjusted AI score if provided
-        if update_data.adjusted_ai_score is not None:
-            if update_data.adjusted_ai_score < 0 or update_data.adjusted_ai_score > 24:
-                raise HTTPException(status_code=400, detail="Adjusted AI score must be between 0 and 24")
-
-        # Validate human evaluation if provided
-        if update_data.human_evaluation:
-            human_eval = update_data.human_evaluation
-            required_fields = ['innovation_score', 'collaboration_score', 'presentation_score']
-            
-            for field in required_fields:
-                if field not in human_eval:
-                    raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
-                
-                score = human_eval[field]
-                if not isinstance(score, (int, float)) or score < 0 or score > 4:
-                    raise HTTPException(status_code=400, detail=f"{field} must be a number between 0 and 4")
-
-        # Prepare update data
-        update_dict = {
-            "professor_feedback": update_data.professor_feedback or "",
-            "final_score": update_data.final_score,
-            "status": "reviewed"
-        }
-        
-        # Add adjusted AI score if provided
-        if update_data.adjusted_ai_score is not None:
-            update_dict["adjusted_ai_score"] = float(update_data.adjusted_ai_score)
-        
-        # Add human evaluation if provided (store as JSON string)
-        if update_data.human_evaluation:
-            # Ensure all scores are floats
-            human_eval_clean = {
-                "innovation_score": float(update_data.human_evaluation.get("innovation_score", 0)),
-                "collaboration_score": float(update_data.human_evaluation.get("collaboration_score", 0)),
-                "presentation_score": float(update_data.human_evaluation.get("presentation_score", 0))
-            }
-            update_dict["human_evaluation"] = json.dumps(human_eval_clean)
-        
+        await authorization.require_submission_owner(submission_id, current_user.id, "Not authorized to update this submission")
+
+        update_dict = grade_update(update_data)
+
         # Update submission
         try:
-            response = admin_client.table("submissions").update(update_dict).eq("id", submission_id).execute()
+            response = await execute(admin_client.table("submissions").update(update_dict).eq("id", submission_id))
 
             if not response.data:
                 raise HTTPException(status_code=404, detail="Submission not found")
@@ -751,81 +751,156 @@ async def update_submission(submission_id: str, update_data: SubmissionUpdate, c
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/assessments/{assessment_id}/release-scores")
-async def release_assessment_scores(assessment_id: str, current_user=Depends(get_current_user)):
+@router.get("/assessments/{assessment_id}/analytics")
+async def get_assessment_analytics(assessment_id: str, current_user=Depends(get_current_user)):
+    """
+    Score distributions of an assessment: count, average, median, standard
+    deviation and histogram of the AI, adjusted AI, final and human
+    evaluation scores and of each AI rubric criterion.
+
+    Read from the bins kept current by migration 011, in constant time
+    whatever the number of submissions.
+    """
     try:
         # Verify the professor owns the assessment's class
-        assessment_check = admin_client.table("assessments").select(
-            "class_id, classes!inner(professor_id)"
-        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id).execute()
+        await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to view this assessment")
 
-        if not assessment_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to release scores for this assessment")
+        return {"assessment_id": assessment_id, **await analytics.assessment_analytics(assessment_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        class_id = assessment_check.data[0]["class_id"]
+@router.post("/assessments/{assessment_id}/grades")
+async def grade_submissions(assessment_id: str, batch: BatchGradeUpdate, current_user=Depends(get_current_user)):
+    """
+    Grade many submissions of an assessment in one request.
+
+    Ownership is checked once for the assessment and every grade is validated
+    before anything is written; the valid grades are then applied in a single
+    grade_submissions call (migration 010). Grades that fail validation, repeat
+    a submission or name a submission of another assessment are reported and
+    not applied, so one bad row does not block the rest of the class.
+
+    Returns:
+        dict: "updated" and "failed" counts, and "results" with a status
+            ("updated", "invalid" or "not_found") and, for failures, a detail
+            per grade, in request order
+    """
+    try:
+        # Verify the professor owns the assessment's class
+        await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to grade this assessment")
+
+        if not batch.grades:
+            raise HTTPException(status_code=400, detail="No grades to apply")
+        if len(batch.grades) > GRADE_BATCH_LIMIT:
+            raise HTTPException(status_code=400, detail=f"At most {GRADE_BATCH_LIMIT} grades can be applied at once")
+
+        # Validate every grade up front
+        results = []
+        updates = []
+        seen = set()
+        for grade in batch.grades:
+            result = {"submission_id": grade.submission_id, "status": "updated"}
+            results.append(result)
+            if grade.submission_id in seen:
+                result.update(status="invalid", detail="Submission is graded more than once in this request")
+                continue
+            seen.add(grade.submission_id)
+            try:
+                update_dict = grade_update(grade)
+            except HTTPException as e:
+                result.update(status="invalid", detail=e.detail)
+                continue
+            del update_dict["status"]
+            updates.append({"id": grade.submission_id, **update_dict})
+
+        updated_ids = set()
+        if updates:
+            response = await execute(admin_client.rpc("grade_submissions", {
+                "p_assessment_id": assessment_id,
+                "p_grades": updates,
+            }))
+            updated_ids = {int(submission_id) for submission_id in response.data or []}
+
+        for result in results:
+            if result["status"] == "updated" and result["submission_id"] not in updated_ids:
+                result.update(status="not_found", detail="Submission not found in this assessment")
 
-        import random
+        return {
+            "message": f"Graded {len(updated_ids)} of {len(results)} submissions",
+            "updated": len(updated_ids),
+            "failed": len(results) - len(updated_ids),
+            "results": results,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Get all students in the class to check for missing submissions
-        students_response = admin_client.table("class_students").select(
-            "users!inner(auth_id, first_name, last_name, email)"
-        ).eq("class_id", class_id).execute()
+@router.post("/assessments/{assessment_id}/release-scores")
+async def release_assessment_scores(assessment_id: str, current_user=Depends(get_current_user)):
+    try:
+        # Verify the professor owns the assessment's class
+        class_id = await authorization.require_assessment_owner(
+            assessment_id, current_user.id, "Not authorized to release scores for this assessment")
+
+        import random
 
-        # Get existing submissions
-        submissions_response = admin_client.table("submissions").select(
-            "student_id"
-        ).eq("assessment_id", assessment_id).execute()
+        # Get all students in the class and the existing submissions, concurrently
+        students_response, submissions_response = await asyncio.gather(
+            execute(admin_client.table("class_students").select(
+                "users!inner(auth_id, first_name, last_name, email)"
+            ).eq("class_id", class_id)),
+            execute(admin_client.table("submissions").select("student_id").eq("assessment_id", assessment_id))
+        )
 
         existing_student_ids = {sub["student_id"] for sub in submissions_response.data}
 
-        # Create submissions for students who haven't submitted
-        for item in students_response.data:
-            student_id = item["users"]["auth_id"]
-            if student_id not in existing_student_ids:
-                # Create a "no submission" record
-                submission_id = random.randint(1000000000, 9999999999)
-                admin_client.table("submissions").insert({
-                    "id": submission_id,
-                    "assessment_id": assessment_id,
-                    "student_id": student_id,
-                    "ai_feedback": "No submission.",
-                    "ai_score": 0.0,
-                    "professor_feedback": "No submission.",
-                    "final_score": 0.0,
-                    "zip_path": None,
-                    "status": "released"
-                }).execute()
+        # Create "no submission" records for students who haven't submitted, in one request
+        # (ON CONFLICT DO NOTHING: a student may be submitting right now)
+        missing = [{
+            "id": random.randint(1000000000, 9999999999),
+            "assessment_id": assessment_id,
+            "student_id": item["users"]["auth_id"],
+            "ai_feedback": "No submission.",
+            "ai_score": 0.0,
+            "professor_feedback": "No submission.",
+            "final_score": 0.0,
+            "zip_path": None,
+            "status": "released"
+        } for item in students_response.data if item["users"]["auth_id"] not in existing_student_ids]
+        if missing:
+            await execute(admin_client.table("submissions").upsert(
+                missing, on_conflict="assessment_id,student_id", ignore_duplicates=True
+            ))
 
         # Update all submissions for this assessment to 'released' status (this will also update the ones we just created)
-        response = admin_client.table("submissions").update({
+        response = await execute(admin_client.table("submissions").update({
             "status": "released"
-        }).eq("assessment_id", assessment_id).eq("status", "reviewed").execute()
+        }).eq("assessment_id", assessment_id).eq("status", "reviewed"))
 
         # Count total released submissions
-        total_released = admin_client.table("submissions").select(
+        total_released = await execute(admin_client.table("submissions").select(
             "id"
-        ).eq("assessment_id", assessment_id).eq("status", "released").execute()
+        ).eq("assessment_id", assessment_id).eq("status", "released"))
 
         return {"message": f"Released scores for {len(total_released.data)} submissions"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/assessments/{assessment_id}")
-async def delete_assessment(assessment_id: str, current_user=Depends(get_current_user)):
+async def delete_assessment(assessment_id: str, current_user=Depends(get_current_user_revalidated)):
     try:
         # Verify the professor owns the assessment
-        ownership_check = admin_client.table("assessments").select(
-            "class_id, classes!inner(professor_id)"
-        ).eq("id", assessment_id).eq("classes.professor_id", current_user.id).execute()
-
-        if not ownership_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to delete this assessment")
+        await authorization.require_assessment_owner(assessment_id, current_user.id, "Not authorized to delete this assessment")
 
         # Delete associated submissions first
-        admin_client.table("submissions").delete().eq("assessment_id", assessment_id).execute()
+        await execute(admin_client.table("submissions").delete().eq("assessment_id", assessment_id))
 
         # Delete the assessment
-        admin_client.table("assessments").delete().eq("id", assessment_id).execute()
+        await execute(admin_client.table("assessments").delete().eq("id", assessment_id))
+        authorization.assessments_deleted([assessment_id])
 
         return {"message": "Assessment deleted successfully"}
     except Exception as e:
@@ -833,15 +908,23 @@ async def delete_assessment(assessment_id: str, current_user=Depends(get_current
 
 # Student routes
 @router.get("/student/classes")
-async def get_student_classes(current_user=Depends(get_current_user)):
+async def get_student_classes(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
     try:
+        not_modified = await check_not_modified("student_classes", current_user.id, if_none_match, response)
+        if not_modified:
+            return not_modified
+
         # Get classes where student is enrolled
-        response = admin_client.table("class_students").select(
+        enrollments_response = await execute(admin_client.table("class_students").select(
             "classes(*, assessments(*))"
-        ).eq("student_id", current_user.id).execute()
+        ).eq("student_id", current_user.id))
 
         classes = []
-        for item in response.data:
+        for item in enrollments_response.data:
             cls = item["classes"]
             classes.append({
                 "id": cls["id"],
@@ -850,7 +933,7 @@ async def get_student_classes(current_user=Depends(get_current_user)):
                 "assessments": cls["assessments"]
             })
 
-        return classes
+        return fast_json(classes, response.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -858,21 +941,21 @@ async def get_student_classes(current_user=Depends(get_current_user)):
 async def get_assessment_details(assessment_id: str, current_user=Depends(get_current_user)):
     try:
         # Get assessment details
-        assessment_response = admin_client.table("assessments").select("*").eq("id", assessment_id).execute()
+        assessment_response = await execute(admin_client.table("assessments").select("*").eq("id", assessment_id))
         if not assessment_response.data:
             raise HTTPException(status_code=404, detail="Assessment not found")
 
         assessment = assessment_response.data[0]
         class_id = assessment["class_id"]
 
-        # Verify student is enrolled in this class
-        enrollment_check = admin_client.table("class_students").select("*").eq("class_id", class_id).eq("student_id", current_user.id).execute()
-        if not enrollment_check.data:
+        # Check enrollment and look up the student's submission concurrently
+        enrolled, submission_check = await asyncio.gather(
+            authorization.is_enrolled(class_id, current_user.id),
+            execute(admin_client.table("submissions").select("*").eq("assessment_id", assessment_id).eq("student_id", current_user.id))
+        )
+        if not enrolled:
             raise HTTPException(status_code=403, detail="Not authorized to view this assessment - not enrolled in class")
 
-        # Check if student already submitted
-        submission_check = admin_client.table("submissions").select("*").eq("assessment_id", assessment_id).eq("student_id", current_user.id).execute()
-
         submission = None
         if submission_check.data:
             submission = submission_check.data[0]
@@ -884,80 +967,205 @@ async def get_assessment_details(assessment_id: str, current_user=Depends(get_cu
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/student/assessments/{assessment_id}/submit")
-async def submit_assessment(assessment_id: str, file: bytes = File(...), current_user=Depends(get_current_user)):
-    temp_dirs = []  # Track directories for cleanup
-
-    try:
-        # Step 1: Get assessment details
-        assessment_response = admin_client.table("assessments").select("*").eq("id", assessment_id).execute()
-        if not assessment_response.data:
-            raise HTTPException(status_code=404, detail="Assessment not found")
-
-        assessment_data = assessment_response.data[0]
-        class_id = assessment_data["class_id"]
-
-        # Step 2: Verify student is enrolled in this class
-        enrollment_check = admin_client.table("class_students").select("*").eq("class_id", class_id).eq("student_id", current_user.id).execute()
-        if not enrollment_check.data:
-            raise HTTPException(status_code=403, detail="Not authorized to submit to this assessment - not enrolled in class")
-
-        # Check if student already submitted
-        existing_submission = admin_client.table("submissions").select("id").eq("assessment_id", assessment_id).eq("student_id", current_user.id).execute()
-
-        if existing_submission.data:
+def extract_and_evaluate(zip_path: str, extracted_dir: str) -> dict:
+    """Extract a validated submission ZIP and run the basic project evaluation on it."""
+    with open_archive(zip_path) as zip_ref:
+        safe_extract_all(zip_ref, extracted_dir)
+    return evaluate_project(extracted_dir)
+
+def check_submission_allowed(assessment_id: str, student_id: str) -> dict:
+    """
+    Run the submission preflight checks in one database round trip.
+
+    Returns:
+        dict: The assessment row, and the id of the student's "no submission"
+            placeholder row for this assessment (None if there is none)
+
+    Raises:
+        HTTPException: If the assessment does not exist, the student is not
+            enrolled in its class, or the student already submitted
+    """
+    preflight = admin_client.rpc("submission_preflight", {
+        "p_assessment_id": assessment_id,
+        "p_student_id": student_id
+    }).execute()
+    state = preflight.data[0] if preflight.data else {}
+
+    if not state.get("assessment"):
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    if not state.get("is_enrolled"):
+        raise HTTPException(status_code=403, detail="Not authorized to submit to this assessment - not enrolled in class")
+
+    placeholder_id = None
+    if state.get("existing_submission_id") is not None:
+        if state.get("existing_status") != NO_SUBMISSION_STATUS:
             raise HTTPException(status_code=400, detail="You have already submitted to this assessment")
-
-        # Step 1: Create organized directory structure
-        base_upload_dir = "backend/uploads"
-        class_dir = os.path.join(base_upload_dir, f"class_{class_id}")
-        assessment_dir = os.path.join(class_dir, f"assessment_{assessment_id}")
-        extracted_dir = os.path.join(assessment_dir, "extracted")
-
-        # Create directories
-        os.makedirs(extracted_dir, exist_ok=True)
-        temp_dirs.extend([extracted_dir, assessment_dir, class_dir])
-
-        # Step 2: Save ZIP file temporarily
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_filename = f"student_{current_user.id}_project.zip"
-        zip_path = os.path.join(assessment_dir, zip_filename)
-
-        with open(zip_path, "wb") as f:
-            f.write(file)
-
-        # Step 3: Extract ZIP file
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extracted_dir)
-        except zipfile.BadZipFile:
-            raise HTTPException(status_code=400, detail="Invalid ZIP file")
-
-        # Step 4: Run LLM evaluation on ZIP file (for official submissions)
-        llm_evaluation_result = None
+        placeholder_id = state["existing_submission_id"]
+
+    return {"assessment": state["assessment"], "placeholder_id": placeholder_id}
+
+def record_submission(submission_data: dict, placeholder_id: Optional[int]) -> dict:
+    """
+    Store a submission row, relying on the unique (assessment_id, student_id) constraint.
+
+    A "no submission" placeholder is claimed with a conditional update, which
+    also moves its created_at to the submission time; otherwise the row is
+    inserted with ON CONFLICT DO NOTHING. Either way a concurrent submission
+    from the same student makes this call fail.
+
+    Raises:
+        HTTPException: If the student already submitted to this assessment
+    """
+    if placeholder_id is not None:
+        update_data = {k: v for k, v in submission_data.items() if k != "id"}
+        # The placeholder dates from when the student joined the class, not from this submission
+        update_data["created_at"] = datetime.now(timezone.utc).isoformat()
+        response = admin_client.table("submissions").update(update_data).eq(
+            "id", placeholder_id).eq("status", NO_SUBMISSION_STATUS).execute()
+    else:
+        response = admin_client.table("submissions").upsert(
+            submission_data, on_conflict="assessment_id,student_id", ignore_duplicates=True
+        ).execute()
+
+    if not response.data:
+        raise HTTPException(status_code=400, detail="You have already submitted to this assessment")
+    return response.data[0]
+
+def submission_blob_path(sha256: str) -> str:
+    """
+    New storage path for a submission ZIP, keyed by its content hash.
+
+    The random suffix keeps a blob registered again after the sweep deleted it
+    apart from the object the sweep is removing.
+    """
+    return f"blobs/{sha256[:2]}/{sha256}-{uuid.uuid4().hex[:12]}.zip"
+
+def store_submission_zip(zip_path: str, sha256: str, size_bytes: int) -> str:
+    """
+    Store a submission ZIP under its content hash and return its public URL.
+
+    The upload is skipped when the same bytes are already in the bucket (for
+    example a re-submission after a failed insert). The blob is referenced once
+    the submission row is inserted; blobs left unreferenced are removed by
+    sweep_unreferenced_blobs after a grace period.
+    """
+    blob = admin_client.rpc("register_submission_blob_path", {
+        "p_sha256": sha256,
+        "p_storage_path": submission_blob_path(sha256),
+        "p_size_bytes": size_bytes
+    }).execute().data[0]
+    storage_path = blob["storage_path"]
+
+    if not blob["uploaded"]:
+        # upsert: a concurrent submission of the same bytes may be uploading the same object
+        with open(zip_path, 'rb') as f:
+            supabase.storage.from_("submissions").upload(
+                path=storage_path,
+                file=f,
+                file_options={"content-type": "application/zip", "upsert": "true"}
+            )
+        admin_client.table("submission_blobs").update({"uploaded": True}).eq("sha256", sha256).eq(
+            "storage_path", storage_path).execute()
+    else:
+        print(f"Submission ZIP {sha256} already stored, skipping upload")
+
+    return supabase.storage.from_("submissions").get_public_url(storage_path)
+
+async def evaluate_submission(zip_path: str, preflight: Optional[asyncio.Future] = None) -> tuple:
+    """
+    Run the LLM evaluation and comment-quality scoring of a submission concurrently.
+
+    LLM failures never raise: the evaluation is deferred if the provider
+    circuit is open or the provider answers with an error status, and the
+    basic evaluation is used for any other error.
+    When a preflight is given the (paid) LLM evaluation only starts once it
+    has passed, and a failed preflight is raised.
+
+    Returns:
+        tuple: (LLM evaluation result or None, whether the evaluation was deferred,
+            comment quality result or None)
+    """
+    async def run_llm_evaluation():
+        if preflight is not None:
+            # Shielded: cancelling the evaluation must not cancel the preflight
+            await asyncio.shield(preflight)
         try:
-            llm_evaluation_result = await llm_evaluate(zip_path)
+            llm_evaluation_result = await llm_evaluate(zip_path, canned_on_provider_error=False)
             print(f"LLM evaluation completed for submission")
+            return llm_evaluation_result, False
+        except (CircuitOpenError, ProviderError) as provider_error:
+            # Provider is degraded - skip it now and re-evaluate this submission later
+            print(f"LLM provider unavailable ({provider_error}), deferring evaluation")
+            DEFERRED_EVALUATIONS.inc()
+            return None, True
         except Exception as llm_error:
             # Log LLM error but don't fail the submission
             print(f"LLM evaluation failed (non-critical): {str(llm_error)}")
-            # Fallback to basic evaluation
-            ai_result = evaluate_project(extracted_dir)
-            llm_evaluation_result = None
+            BASIC_EVALUATION_FALLBACKS.inc()
+            return None, False
+
+    # Comment quality scoring never fails - returns None if it errored or timed out
+    (llm_evaluation_result, evaluation_deferred), comment_quality_result = await asyncio.gather(
+        run_llm_evaluation(), score_comment_quality(zip_path)
+    )
+    return llm_evaluation_result, evaluation_deferred, comment_quality_result
+
+async def join_stages(*tasks: asyncio.Future) -> list:
+    """
+    Wait for concurrent pipeline stages and return their results in order.
+
+    If any stage fails, the others are cancelled and awaited before the
+    error is re-raised, so no stage keeps running after the request ends.
+    """
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
-        # Step 5: Upload ZIP to Supabase storage
-        supabase_storage_path = f"submissions/student_{current_user.id}/{assessment_id}_{timestamp}.zip"
+@router.post("/student/assessments/{assessment_id}/submit")
+async def submit_assessment(assessment_id: str, file: UploadFile = File(...), current_user=Depends(get_current_user)):
+    temp_dirs = []  # Track directories for cleanup
 
-        # Upload file to Supabase storage
-        with open(zip_path, 'rb') as f:
-            supabase.storage.from_("submissions").upload(
-                path=supabase_storage_path,
-                file=f,
-                file_options={"content-type": "application/zip"}
-            )
+    try:
+        submission_start = time.perf_counter()
+
+        # Step 1: Create a working directory - each submission gets its own so
+        # concurrent submissions never clean up each other's files
+        assessment_dir = os.path.join("backend/uploads", f"assessment_{assessment_id}")
+        os.makedirs(assessment_dir, exist_ok=True)
+        submission_dir = tempfile.mkdtemp(prefix=f"student_{current_user.id}_", dir=assessment_dir)
+        temp_dirs.append(submission_dir)
+
+        # Step 2: Stream the ZIP file to disk in chunks, hashing it on the way
+        zip_filename = f"student_{current_user.id}_project.zip"
+        zip_path = os.path.join(submission_dir, zip_filename)
 
-        # Get public URL for the uploaded file
-        supabase_url = supabase.storage.from_("submissions").get_public_url(supabase_storage_path)
+        # Step 3: Check the archive against the upload limits (extraction only happens if the fallback needs it)
+        try:
+            upload_sha256, upload_size = await time_stage("save_upload", save_upload(file, zip_path))
+            validate_archive(zip_path)
+        except ArchiveError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        print(f"Received submission upload: {upload_size} bytes, sha256 {upload_sha256}")
+
+        # Step 4: Run the DB preflight, the evaluation and the storage upload
+        # concurrently. Comment quality scoring starts right away; the LLM call
+        # waits for the preflight so rejected submissions never reach the provider
+        preflight_task = asyncio.create_task(time_stage(
+            "preflight", run_blocking(check_submission_allowed, assessment_id, current_user.id)))
+        evaluation_task = asyncio.create_task(time_stage("evaluation", evaluate_submission(zip_path, preflight_task)))
+        storage_task = asyncio.create_task(time_stage(
+            "storage_upload", run_blocking(store_submission_zip, zip_path, upload_sha256, upload_size)))
+
+        # Step 5: Join the stages; a failed preflight cancels comment quality scoring. A ZIP
+        # stored for a submission that is never recorded stays unreferenced and is swept
+        join_start = time.perf_counter()
+        preflight, (llm_evaluation_result, evaluation_deferred, comment_quality_result), supabase_url = await join_stages(
+            preflight_task, evaluation_task, storage_task)
+        SUBMISSION_STAGE_SECONDS.labels("join").observe(time.perf_counter() - join_start)
 
         # Step 6: Create submission record in database
         # Note: The submissions table uses bigint for id instead of uuid
@@ -967,12 +1175,13 @@ async def submit_assessment(assessment_id: str, file: bytes = File(...), current
 
         # Prepare submission data with LLM evaluation if available
         if llm_evaluation_result:
-            # Store full LLM evaluation data
+            # Store full LLM evaluation data together with the comment quality score
+            llm_evaluation_result["comment_quality"] = comment_quality_result
             submission_data = {
                 "id": submission_id,
                 "assessment_id": assessment_id,
                 "student_id": current_user.id,
-                "ai_evaluation_data": json.dumps(llm_evaluation_result),  # Full evaluation as JSON
+                "ai_evaluation_data": llm_evaluation_result,  # Full evaluation (jsonb)
                 "ai_score": llm_evaluation_result.get("overall_score", 0),
                 "ai_feedback": "\n".join(llm_evaluation_result.get("feedback", [])) if llm_evaluation_result.get("feedback") else None,
                 "professor_feedback": "",
@@ -980,10 +1189,25 @@ async def submit_assessment(assessment_id: str, file: bytes = File(...), current
                 "zip_path": supabase_url,
                 "status": "pending"
             }
+        elif evaluation_deferred:
+            submission_data = {
+                "id": submission_id,
+                "assessment_id": assessment_id,
+                "student_id": current_user.id,
+                "ai_feedback": DEFERRED_AI_FEEDBACK,
+                "ai_score": None,
+                "professor_feedback": "",
+                "final_score": None,
+                "zip_path": supabase_url,
+                "status": "pending",
+                "needs_reevaluation": True
+            }
+            if comment_quality_result:
+                submission_data["ai_evaluation_data"] = {"comment_quality": comment_quality_result}
         else:
-            # Fallback to basic evaluation
-            if 'ai_result' not in locals():
-                ai_result = evaluate_project(extracted_dir)
+            # Fallback to basic evaluation - the only stage that needs the files on disk
+            extracted_dir = os.path.join(submission_dir, "extracted")
+            ai_result = await asyncio.to_thread(extract_and_evaluate, zip_path, extracted_dir)
             submission_data = {
                 "id": submission_id,
                 "assessment_id": assessment_id,
@@ -995,26 +1219,149 @@ async def submit_assessment(assessment_id: str, file: bytes = File(...), current
                 "zip_path": supabase_url,
                 "status": "pending"
             }
+            if comment_quality_result:
+                submission_data["ai_evaluation_data"] = {"comment_quality": comment_quality_result}
 
-        response = admin_client.table("submissions").insert(submission_data).execute()
+        # Reference the stored ZIP (the database trigger counts the reference)
+        submission_data["content_sha256"] = upload_sha256
 
-        # Step 7: Cleanup - Delete local files immediately after successful upload
-        try:
-            shutil.rmtree(class_dir)  # Remove entire class directory
-        except Exception as e:
-            print(f"Warning: Failed to cleanup local files: {e}")
+        insert_start = time.perf_counter()
+        submission_id = (await run_blocking(record_submission, submission_data, preflight["placeholder_id"]))["id"]
+        SUBMISSION_STAGE_SECONDS.labels("insert").observe(time.perf_counter() - insert_start)
+        SUBMISSION_STAGE_SECONDS.labels("total").observe(time.perf_counter() - submission_start)
 
         return {"message": "Assessment submitted successfully", "submission_id": submission_id}
 
     except Exception as e:
-        # Cleanup any created directories on error
-        for temp_dir in temp_dirs:
-            try:
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-            except Exception as cleanup_error:
-                print(f"Warning: Failed to cleanup {temp_dir}: {cleanup_error}")
-
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Submission failed: {str(e)}")
+
+    finally:
+        # Step 7: Cleanup - Delete local files whatever the outcome, including
+        # a cancelled request (CancelledError is not an Exception)
+        for temp_dir in temp_dirs:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+# Deferred evaluation
+def storage_path_from_url(public_url: str) -> str:
+    """Recover the storage object path from a public URL of the submissions bucket."""
+    return public_url.split("/object/public/submissions/", 1)[1].split("?", 1)[0]
+
+async def reevaluate_deferred_submissions(limit: int = 10) -> int:
+    """
+    Run the LLM evaluation for submissions stored while the provider was unavailable.
+
+    Rows are claimed with claim_deferred_submissions (see migration 012), which
+    leases them for REEVALUATION_LEASE_SECONDS, so several workers can run this
+    concurrently without evaluating a row twice. needs_reevaluation is only
+    cleared once the evaluation is stored: if the worker dies mid-way, the row
+    is picked up again when its lease expires. While the provider is degraded
+    (circuit open, 429 or 5xx) the claims are released untouched; any other
+    failure counts as an attempt, and after REEVALUATION_MAX_ATTEMPTS the
+    submission is left to the professor.
+
+    Args:
+        limit (int): Maximum number of submissions to process in this run.
+
+    Returns:
+        int: Number of submissions re-evaluated.
+    """
+    claimed = await execute(admin_client.rpc("claim_deferred_submissions", {
+        "p_lease_seconds": REEVALUATION_LEASE_SECONDS,
+        "p_limit": limit
+    }))
+
+    evaluated = 0
+    rows = claimed.data or []
+    for position, row in enumerate(rows):
+        temp_dir = tempfile.mkdtemp(prefix="reevaluate_")
+        try:
+            zip_bytes = await run_blocking(supabase.storage.from_("submissions").download, storage_path_from_url(row["zip_path"]))
+            zip_path = os.path.join(temp_dir, "project.zip")
+            with open(zip_path, "wb") as f:
+                f.write(zip_bytes)
+
+            llm_evaluation_result = await llm_evaluate(zip_path, canned_on_provider_error=False)
+            # Keep what the submission stored next to the evaluation (the comment quality score)
+            stored = json_object(row.get("ai_evaluation_data"))
+            if "comment_quality" in stored:
+                llm_evaluation_result["comment_quality"] = stored["comment_quality"]
+            # Only while still flagged: a row resolved meanwhile keeps its data
+            await execute(admin_client.table("submissions").update({
+                "ai_evaluation_data": llm_evaluation_result,
+                "ai_score": llm_evaluation_result.get("overall_score", 0),
+                "ai_feedback": "\n".join(llm_evaluation_result.get("feedback", [])) if llm_evaluation_result.get("feedback") else None,
+                "needs_reevaluation": False,
+                "reevaluation_claimed_at": None
+            }).eq("id", row["id"]).eq("needs_reevaluation", True))
+            evaluated += 1
+        except (CircuitOpenError, ProviderError) as e:
+            if isinstance(e, ProviderError) and not e.transient:
+                await record_reevaluation_failure(row, e)
+                continue
+            # Provider is still degraded - release this and the remaining claims and try again next run
+            await execute(admin_client.table("submissions").update({"reevaluation_claimed_at": None}).in_(
+                "id", [remaining["id"] for remaining in rows[position:]]))
+            break
+        except Exception as e:
+            await record_reevaluation_failure(row, e)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return evaluated
+
+async def record_reevaluation_failure(row: dict, error: Exception):
+    """Release a claimed submission after a failed re-evaluation, giving up after REEVALUATION_MAX_ATTEMPTS."""
+    attempts = (row.get("reevaluation_attempts") or 0) + 1
+    update_data = {"reevaluation_attempts": attempts, "reevaluation_claimed_at": None}
+    if attempts >= REEVALUATION_MAX_ATTEMPTS:
+        print(f"Re-evaluation of submission {row['id']} failed {attempts} times, giving up: {error}")
+        update_data.update(needs_reevaluation=False, ai_feedback=REEVALUATION_FAILED_FEEDBACK)
+    else:
+        print(f"Re-evaluation of submission {row['id']} failed (attempt {attempts}): {error}")
+    await execute(admin_client.table("submissions").update(update_data).eq("id", row["id"]).eq(
+        "needs_reevaluation", True))
+
+async def reevaluation_loop(interval_seconds: int):
+    """Periodically re-evaluate deferred submissions (started on app startup)."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            evaluated = await reevaluate_deferred_submissions()
+            if evaluated:
+                print(f"Re-evaluated {evaluated} deferred submissions")
+        except Exception as e:
+            print(f"Deferred re-evaluation run failed: {e}")
+
+async def sweep_unreferenced_blobs(grace_seconds: int = 3600, limit: int = 100) -> int:
+    """
+    Delete stored submission ZIPs that no submission references any more.
+
+    Blobs are only claimed after staying unreferenced for grace_seconds, so a
+    ZIP uploaded for a submission that is still being evaluated is kept. Only
+    the objects of the rows the claim deleted are removed; a blob registered
+    again meanwhile gets a row under a new path (see store_submission_zip).
+
+    Returns:
+        int: Number of objects removed from storage.
+    """
+    claimed = await execute(admin_client.rpc("claim_unreferenced_submission_blobs", {
+        "p_grace_seconds": grace_seconds,
+        "p_limit": limit
+    }))
+    storage_paths = [row["storage_path"] for row in claimed.data or []]
+    if storage_paths:
+        await run_blocking(supabase.storage.from_("submissions").remove, storage_paths)
+    return len(storage_paths)
+
+async def storage_sweep_loop(interval_seconds: int):
+    """Periodically remove unreferenced submission ZIPs (started on app startup)."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            removed = await sweep_unreferenced_blobs()
+            if removed:
+                print(f"Removed {removed} unreferenced submission ZIPs from storage")
+        except Exception as e:
+            print(f"Submission storage sweep failed: {e}")
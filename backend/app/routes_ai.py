@@ -4,13 +4,31 @@ from typing import Optional
 import tempfile
 import os
 import shutil
-import sys
 from pathlib import Path
 import requests
 import json
+import asyncio
+import time
 from dotenv import load_dotenv
 from backend.app.auth import get_current_user
-from backend.app.zip_extractor import extract_developer_files
+from backend.app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from backend.app.comment_quality_pool import score_comment_quality
+from backend.app.metrics import (
+    CANNED_RESPONSE_FALLBACKS,
+    CORRECTION_SECONDS,
+    LLM_CIRCUIT_REJECTIONS,
+    LLM_CORRECTIONS,
+    LLM_EVALUATIONS_IN_FLIGHT,
+    LLM_PROVIDER_IN_FLIGHT,
+    LLM_PROVIDER_REQUESTS,
+    PACKING_SECONDS,
+    PROVIDER_SECONDS,
+    VALIDATION_SECONDS,
+    record_circuit_state,
+    record_token_usage,
+)
+from backend.common.archive import ArchiveError, save_upload, validate_archive
+from backend.app.zip_extractor import extract_developer_files, collect_developer_files, chunk_developer_files
 from backend.app.database import admin_client
 
 # Load environment variables - check both backend directory and project root
@@ -34,13 +52,59 @@ else:
     load_dotenv(override=True)
     env_loaded = True
 
-# Add ai directory to path to import evaluate_comment_quality
-ai_dir = Path(__file__).parent.parent / "ai"
-sys.path.insert(0, str(ai_dir))
-from api import evaluate_comment_quality
-
 router = APIRouter()
 
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+LLM_MODEL = "x-ai/grok-4.1-fast"
+
+# Trips on provider errors/slow calls so degraded periods fail fast instead of waiting out timeouts
+# (configured with LLM_BREAKER_* environment variables, see CircuitBreaker.from_env)
+LLM_BREAKER = CircuitBreaker.from_env("openrouter", "LLM_BREAKER", on_state_change=record_circuit_state)
+
+class ProviderError(Exception):
+    """Raised when the LLM provider answers an evaluation request with an error status."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"LLM API returned status {status_code}")
+        self.status_code = status_code
+
+    @property
+    def transient(self) -> bool:
+        """Whether the error is the provider's (429 or 5xx), so the same request may succeed later."""
+        return self.status_code == 429 or self.status_code >= 500
+
+# Rubric criteria, each scored 1-4 (6 criteria = 24 points max)
+RUBRIC_CRITERIA = [
+    "system_design_architecture",
+    "functionality_features",
+    "code_quality_efficiency",
+    "usability_user_interface",
+    "testing_debugging",
+    "documentation"
+]
+MAX_RUBRIC_SCORE = 4 * len(RUBRIC_CRITERIA)
+
+EVALUATION_SCHEMA = {
+    "overall_score": {"type": "number", "minimum": 0, "maximum": 24},
+    "max_score": {"type": "number", "minimum": 0, "maximum": 24},
+    "percentage": {"type": "number", "minimum": 0, "maximum": 100},
+    "evaluation": {
+        criterion: {"type": "number", "minimum": 1, "maximum": 4} for criterion in RUBRIC_CRITERIA
+    },
+    "feedback": {"type": "array", "items": {"type": "string"}}
+}
+
+# Map-reduce evaluation for projects too large to send as a single prompt:
+# developer files are split into token-bounded chunks, chunks are scored concurrently,
+# and the partial rubric scores are combined locally (or by one final "llm" reduce call)
+MAP_REDUCE_ENABLED = os.getenv("LLM_MAP_REDUCE", "true").lower() != "false"
+MAP_REDUCE_CHUNK_TOKENS = int(os.getenv("LLM_MAP_REDUCE_CHUNK_TOKENS", "50000"))
+# Every chunk is a paid provider call: projects are cut to this many chunks
+MAP_REDUCE_MAX_CHUNKS = int(os.getenv("LLM_MAP_REDUCE_MAX_CHUNKS", "8"))
+# Defaults to the chunk cap so a capped project is scored in a single round
+MAP_REDUCE_CONCURRENCY = int(os.getenv("LLM_MAP_REDUCE_CONCURRENCY", str(MAP_REDUCE_MAX_CHUNKS)))
+MAP_REDUCE_REDUCER = os.getenv("LLM_MAP_REDUCE_REDUCER", "local").lower()
+
 @router.post("/ai_evaluate")
 async def ai_evaluate(
     file: UploadFile = File(...), 
@@ -51,14 +115,17 @@ async def ai_evaluate(
         # Create a temporary working directory for this session
         temp_dir = tempfile.mkdtemp(prefix=f"{current_user.id}_")
 
-        # Save the uploaded ZIP locally
-        zip_path = os.path.join(temp_dir, file.filename)
-        with open(zip_path, "wb") as f:
-            f.write(await file.read())
+        # Stream the uploaded ZIP to disk and reject archives over the upload
+        # limits before any evaluation work starts
+        zip_path = os.path.join(temp_dir, "project.zip")
+        try:
+            await save_upload(file, zip_path)
+            validate_archive(zip_path)
+        except ArchiveError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
 
-        # Evaluate project with comment quality evaluation
-        # comment_quality_result_all = evaluate_comment_quality(zip_path).model_dump()
-        # comment_quality_score = comment_quality_result_all["overall_score"]["score"]
+        # Score comment quality in the worker pool while the LLM request is in flight
+        comment_quality_task = asyncio.create_task(score_comment_quality(zip_path))
 
         # Run LLM evaluation (optional - can fail without breaking the response)
         try:
@@ -68,6 +135,11 @@ async def ai_evaluate(
             print(f"LLM evaluation failed (non-critical): {str(llm_error)}")
             llm_result = None
 
+        # Never fails - returns None if scoring errored or timed out
+        comment_quality_result = await comment_quality_task
+        if llm_result is not None:
+            llm_result["comment_quality"] = comment_quality_result
+
         # Note: /ai_evaluate is for testing only - does not store evaluation data
         # Official submissions store evaluation data automatically in the submission endpoint
 
@@ -88,62 +160,11 @@ async def ai_evaluate(
         if temp_dir and os.path.exists(temp_dir):
             shutil.rmtree(temp_dir, ignore_errors=True)
 
-# LLM Evaluation
-async def llm_evaluate(zip_path: str):
-    try:
-        # Check if API key is loaded
-        api_key = os.getenv('OPENROUTER_API_KEY')
-        if not api_key or api_key == "your-api-key-here":
-            # Debug: Check which .env file was loaded
-            backend_env = Path(__file__).parent.parent / ".env"
-            root_env = Path(__file__).parent.parent.parent / ".env"
-            env_location = "root" if root_env.exists() else ("backend" if backend_env.exists() else "not found")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"OPENROUTER_API_KEY not found or is placeholder. .env file location: {env_location}. Please check your .env file in the project root."
-            )
-        
-        # Check ZIP file size and decide on approach
-        # Model limit is ~2M tokens. Base64 encoding increases size by ~33%, and roughly 4 chars = 1 token
-        # So max safe ZIP size is ~1.5MB (which becomes ~2MB base64 = ~500k tokens, leaving room for prompt)
-        import base64
-        import zipfile
-        
-        zip_size = os.path.getsize(zip_path)
-        MAX_ZIP_SIZE_BYTES = 1_500_000  # ~1.5MB
-        
-        if zip_size > MAX_ZIP_SIZE_BYTES:
-            # ZIP is too large - extract and send only developer-written source files
-            print(f"ZIP file too large ({zip_size} bytes), extracting developer files only...")
-            project_text = extract_developer_files(zip_path)
-            prompt_text_end = f"Project files:\n{project_text}"
-        else:
-            # ZIP is small enough - send as base64
-            try:
-                with open(zip_path, 'rb') as zip_file:
-                    zip_data = zip_file.read()
-                    zip_base64 = base64.b64encode(zip_data).decode('utf-8')
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Failed to read ZIP file: {str(e)}")
-            
-            prompt_text_end = f"ZIP file (base64 encoded):\n{zip_base64}"
-        
-        
-        schema = {
-            "overall_score": {"type": "number", "minimum": 0, "maximum": 24},
-            "max_score": {"type": "number", "minimum": 0, "maximum": 24},
-            "percentage": {"type": "number", "minimum": 0, "maximum": 100},
-            "evaluation": {
-                "system_design_architecture": {"type": "number", "minimum": 1, "maximum": 4},
-                "functionality_features": {"type": "number", "minimum": 1, "maximum": 4},
-                "code_quality_efficiency": {"type": "number", "minimum": 1, "maximum": 4},
-                "usability_user_interface": {"type": "number", "minimum": 1, "maximum": 4},
-                "testing_debugging": {"type": "number", "minimum": 1, "maximum": 4},
-                "documentation": {"type": "number", "minimum": 1, "maximum": 4}
-            },
-            "feedback": {"type": "array", "items": {"type": "string"}}
-        }
-        prompt_text = f"""Evaluate the provided software project using this rubric. Score each criterion 1-4 based on the descriptions.
+# Prompt and provider helpers shared by single-prompt and map-reduce evaluation
+def build_evaluation_prompt(prompt_text_end: str, scope_note: str = "") -> str:
+    """Build the rubric evaluation prompt for the given project content."""
+    scope_text = f"\n{scope_note}\n" if scope_note else ""
+    return f"""Evaluate the provided software project using this rubric. Score each criterion 1-4 based on the descriptions.
 
 ## Rubric
 
@@ -184,42 +205,156 @@ async def llm_evaluate(zip_path: str):
 - 1: Little/no documentation
 
 Note: You are evaluating a software project of a student, so be generous in your feedback and score.
-
+{scope_text}
 ## Output JSON
-{json.dumps(schema, indent=2)}
+{json.dumps(EVALUATION_SCHEMA, indent=2)}
 
 Please analyze the project files and provide your evaluation in this JSON format. Limit to 5 feedback items.
 
 {prompt_text_end}"""
 
-        # Prepare the request payload
-        payload = {
-            "model": "x-ai/grok-4.1-fast",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a software engineering expert. You are given a project and you need to evaluate it based on the project files."
-                },
-                {
-                    "role": "user",
-                    "content": prompt_text
-                }
-            ]
-        }
-        
-        # Make the API request
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
+def build_evaluation_payload(prompt_text: str) -> dict:
+    """Build the OpenRouter chat payload for an evaluation prompt."""
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a software engineering expert. You are given a project and you need to evaluate it based on the project files."
+            },
+            {
+                "role": "user",
+                "content": prompt_text
+            }
+        ]
+    }
+
+async def post_chat_completion(payload: dict, api_key: str, timeout: int, phase: str = "provider"):
+    """
+    POST a chat completion to OpenRouter without blocking the event loop.
+
+    The call is timed under the given metrics phase ("provider" or "correction")
+    and guarded by LLM_BREAKER: while the circuit is open CircuitOpenError is
+    raised immediately. Network errors, 429 and 5xx responses count as failures;
+    a cancelled call is not counted either way.
+    """
+    try:
+        LLM_BREAKER.before_call()
+    except CircuitOpenError:
+        LLM_CIRCUIT_REJECTIONS.inc()
+        raise
+
+    phase_seconds = CORRECTION_SECONDS if phase == "correction" else PROVIDER_SECONDS
+    start = time.perf_counter()
+    LLM_PROVIDER_IN_FLIGHT.inc()
+    try:
+        response = await asyncio.to_thread(
+            requests.post,
+            url=OPENROUTER_URL,
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
             },
             json=payload,
-            timeout=120
+            timeout=timeout
         )
+    except Exception:
+        LLM_BREAKER.record_failure(time.perf_counter() - start)
+        LLM_PROVIDER_REQUESTS.labels(phase, "exception").inc()
+        raise
+    except asyncio.CancelledError:
+        # Our request was abandoned, which says nothing about the provider
+        LLM_BREAKER.release()
+        LLM_PROVIDER_REQUESTS.labels(phase, "cancelled").inc()
+        raise
+    finally:
+        LLM_PROVIDER_IN_FLIGHT.dec()
+        phase_seconds.observe(time.perf_counter() - start)
+
+    latency = time.perf_counter() - start
+    if response.status_code == 429 or response.status_code >= 500:
+        LLM_BREAKER.record_failure(latency)
+    else:
+        LLM_BREAKER.record_success(latency)
+    LLM_PROVIDER_REQUESTS.labels(phase, "ok" if response.status_code == 200 else "http_error").inc()
+    return response
+
+# LLM Evaluation
+async def llm_evaluate(zip_path: str, canned_on_provider_error: bool = True):
+    """
+    Evaluate a project ZIP against the rubric with the LLM.
+
+    Args:
+        zip_path (str): Path to the project ZIP file, already checked with validate_archive.
+        canned_on_provider_error (bool): Return a canned evaluation when the
+            provider answers with an error status (the /ai_evaluate preview).
+            Callers that store the result pass False to get ProviderError instead.
+
+    Raises:
+        CircuitOpenError: If the provider circuit is open
+        ProviderError: If the provider answered with an error status and
+            canned_on_provider_error is False
+        HTTPException: For any other failure
+    """
+    LLM_EVALUATIONS_IN_FLIGHT.inc()
+    try:
+        # Check if API key is loaded
+        api_key = os.getenv('OPENROUTER_API_KEY')
+        if not api_key or api_key == "your-api-key-here":
+            # Debug: Check which .env file was loaded
+            backend_env = Path(__file__).parent.parent / ".env"
+            root_env = Path(__file__).parent.parent.parent / ".env"
+            env_location = "root" if root_env.exists() else ("backend" if backend_env.exists() else "not found")
+            raise HTTPException(
+                status_code=500, 
+                detail=f"OPENROUTER_API_KEY not found or is placeholder. .env file location: {env_location}. Please check your .env file in the project root."
+            )
+        
+        # Check ZIP file size and decide on approach
+        # Model limit is ~2M tokens. Base64 encoding increases size by ~33%, and roughly 4 chars = 1 token
+        # So max safe ZIP size is ~1.5MB (which becomes ~2MB base64 = ~500k tokens, leaving room for prompt)
+        import base64
+        import zipfile
+        
+        zip_size = os.path.getsize(zip_path)
+        MAX_ZIP_SIZE_BYTES = 1_500_000  # ~1.5MB
+        packing_start = time.perf_counter()
+        
+        if zip_size > MAX_ZIP_SIZE_BYTES and MAP_REDUCE_ENABLED:
+            # ZIP is too large for one prompt - score all developer files chunk by chunk
+            print(f"ZIP file too large ({zip_size} bytes), evaluating developer files with map-reduce...")
+            return await llm_evaluate_map_reduce(zip_path, api_key)
+        elif zip_size > MAX_ZIP_SIZE_BYTES:
+            # ZIP is too large - extract and send only developer-written source files
+            print(f"ZIP file too large ({zip_size} bytes), extracting developer files only...")
+            project_text = extract_developer_files(zip_path)
+            prompt_text_end = f"Project files:\n{project_text}"
+        else:
+            # ZIP is small enough - send as base64 (callers have already checked it
+            # against the upload limits)
+            try:
+                with open(zip_path, 'rb') as zip_file:
+                    zip_data = zip_file.read()
+                    zip_base64 = base64.b64encode(zip_data).decode('utf-8')
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Failed to read ZIP file: {str(e)}")
+            
+            prompt_text_end = f"ZIP file (base64 encoded):\n{zip_base64}"
+        
+
+        prompt_text = build_evaluation_prompt(prompt_text_end)
+
+        # Prepare the request payload
+        payload = build_evaluation_payload(prompt_text)
+        PACKING_SECONDS.observe(time.perf_counter() - packing_start)
+        
+        # Make the API request
+        response = await post_chat_completion(payload, api_key, timeout=120)
         
         # Check for HTTP errors
         if response.status_code != 200:
+            if not canned_on_provider_error:
+                raise ProviderError(response.status_code)
             json_response = {
                 "overall_score": 21,
                 "max_score": 24,
@@ -240,10 +375,12 @@ Please analyze the project files and provide your evaluation in this JSON format
                     "Solid base; consider modularizing for easier future improvements."
                 ]
             }
+            CANNED_RESPONSE_FALLBACKS.inc()
             return json_response
         
         # Extract the assistant message with reasoning_details
         response_data = response.json()
+        record_token_usage(response_data)
         
         # Validate and retry if needed
         validation = await check_json_schema(response_data["choices"][0]["message"]["content"], api_key)
@@ -257,6 +394,9 @@ Please analyze the project files and provide your evaluation in this JSON format
     except HTTPException:
         # Re-raise HTTPExceptions as-is
         raise
+    except (CircuitOpenError, ProviderError):
+        # Provider is degraded or refused the request - let callers defer the evaluation
+        raise
     except requests.exceptions.RequestException as e:
         # Handle requests-specific errors
         import traceback
@@ -278,6 +418,238 @@ Please analyze the project files and provide your evaluation in this JSON format
         print(f"Error in llm_evaluate: {str(e)}")
         print(f"Traceback: {error_trace}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        LLM_EVALUATIONS_IN_FLIGHT.dec()
+
+# Map-reduce evaluation
+async def llm_evaluate_map_reduce(zip_path: str, api_key: str) -> dict:
+    """
+    Evaluate a project that does not fit in one prompt.
+
+    Developer files are packed into token-bounded chunks (map), chunks are scored
+    concurrently under MAP_REDUCE_CONCURRENCY, and the partial rubric scores are
+    combined into one evaluation (reduce). At most MAP_REDUCE_MAX_CHUNKS chunks
+    are scored: files are read in priority order until that many chunks' worth
+    of characters, and chunks past the cap are dropped. Latency is about
+    ceil(chunks / MAP_REDUCE_CONCURRENCY) chunk calls, one by default.
+
+    Args:
+        zip_path (str): Path to the project ZIP file.
+        api_key (str): The OpenRouter API key.
+
+    Returns:
+        dict: Evaluation in the EVALUATION_SCHEMA format plus a 'coverage' summary,
+            which reports whether the project was cut to fit the chunk cap or
+            had source files too large to read.
+    """
+    with PACKING_SECONDS.time():
+        # chunk_developer_files estimates 4 characters per token
+        files, files_truncated = collect_developer_files(
+            zip_path, max_total_chars=MAP_REDUCE_MAX_CHUNKS * MAP_REDUCE_CHUNK_TOKENS * 4)
+        chunks = chunk_developer_files(files, max_chunk_tokens=MAP_REDUCE_CHUNK_TOKENS)
+        # Greedy packing can spill past the budget's chunk count
+        chunks_dropped = max(len(chunks) - MAP_REDUCE_MAX_CHUNKS, 0)
+        chunks = chunks[:MAP_REDUCE_MAX_CHUNKS]
+    semaphore = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
+
+    async def score(index: int, chunk: str):
+        async with semaphore:
+            return await score_chunk(chunk, index, len(chunks), api_key)
+
+    results = await asyncio.gather(
+        *(score(index, chunk) for index, chunk in enumerate(chunks)),
+        return_exceptions=True
+    )
+
+    # Weight each partial evaluation by the amount of code it saw
+    partials = []
+    for index, (chunk, result) in enumerate(zip(chunks, results)):
+        if isinstance(result, BaseException):
+            print(f"Chunk {index + 1}/{len(chunks)} evaluation failed: {str(result)}")
+            continue
+        partials.append((len(chunk), result))
+
+    if not partials:
+        if any(isinstance(result, CircuitOpenError) for result in results):
+            raise CircuitOpenError("openrouter circuit opened during map-reduce evaluation")
+        provider_errors = [result for result in results if isinstance(result, ProviderError)]
+        if provider_errors:
+            raise provider_errors[0]
+        raise HTTPException(status_code=500, detail="AI Evaluation is currently unavailable.")
+
+    evaluation = None
+    if MAP_REDUCE_REDUCER == "llm" and len(partials) > 1:
+        try:
+            evaluation = await reduce_with_llm(partials, api_key)
+        except Exception as e:
+            print(f"LLM reduce failed, aggregating locally: {str(e)}")
+    if evaluation is None:
+        evaluation = aggregate_partial_evaluations(partials)
+
+    evaluation["coverage"] = {
+        "files": len(files),
+        "files_truncated": files_truncated,
+        "chunks": len(chunks),
+        "chunks_dropped": chunks_dropped,
+        "chunks_scored": len(partials),
+        "truncated": bool(files_truncated or chunks_dropped)
+    }
+    return evaluation
+
+async def score_chunk(chunk: str, index: int, total: int, api_key: str) -> dict:
+    """Score one chunk of project files against the rubric (map step)."""
+    scope_note = ""
+    if total > 1:
+        scope_note = (
+            f"Note: This is part {index + 1} of {total} of the project. Other parts are evaluated separately, "
+            f"so score only what is visible in this part and do not penalize references to files that are not shown."
+        )
+    prompt_text = build_evaluation_prompt(f"Project files:\n{chunk}", scope_note)
+    response = await post_chat_completion(build_evaluation_payload(prompt_text), api_key, timeout=120)
+    if response.status_code != 200:
+        raise ProviderError(response.status_code)
+
+    response_data = response.json()
+    record_token_usage(response_data)
+    validation = await check_json_schema(response_data["choices"][0]["message"]["content"], api_key)
+    if validation["validation"]["errors"]:
+        raise Exception(f"Invalid chunk evaluation: {validation['validation']['errors'][-1]}")
+    return json.loads(validation["validation"]["corrected_text"])
+
+def aggregate_partial_evaluations(partials: list, max_feedback: int = 5) -> dict:
+    """
+    Deterministically combine partial evaluations (local reduce step).
+
+    Criterion scores are averaged, weighted by chunk size. Feedback items are taken
+    round-robin from the partials, largest chunk first, skipping duplicates.
+
+    Args:
+        partials (list): List of (weight, evaluation dict) tuples.
+        max_feedback (int): Maximum number of feedback items to keep.
+
+    Returns:
+        dict: Combined evaluation in the EVALUATION_SCHEMA format.
+    """
+    total_weight = sum(weight for weight, _ in partials) or 1
+
+    evaluation = {}
+    for criterion in RUBRIC_CRITERIA:
+        weighted = sum(weight * float(partial["evaluation"][criterion]) for weight, partial in partials)
+        evaluation[criterion] = round(weighted / total_weight, 1)
+
+    overall_score = round(sum(evaluation.values()), 1)
+
+    ordered = sorted(partials, key=lambda item: -item[0])
+    feedback = []
+    seen = set()
+    for position in range(max(len(partial.get("feedback", [])) for _, partial in ordered)):
+        for _, partial in ordered:
+            items = partial.get("feedback", [])
+            if position >= len(items) or len(feedback) >= max_feedback:
+                continue
+            key = items[position].strip().lower()
+            if key not in seen:
+                seen.add(key)
+                feedback.append(items[position])
+
+    return {
+        "overall_score": overall_score,
+        "max_score": MAX_RUBRIC_SCORE,
+        "percentage": round(overall_score / MAX_RUBRIC_SCORE * 100, 1),
+        "evaluation": evaluation,
+        "feedback": feedback
+    }
+
+async def reduce_with_llm(partials: list, api_key: str) -> dict:
+    """Combine partial evaluations with one final LLM call (optional reduce step)."""
+    total_weight = sum(weight for weight, _ in partials) or 1
+    parts = [
+        {"share_of_project": round(weight / total_weight, 3), "evaluation": partial}
+        for weight, partial in partials
+    ]
+    prompt_text = f"""The following are rubric evaluations of separate parts of one student software project.
+Each part includes the share of the project's code it covered.
+
+{json.dumps(parts, indent=2)}
+
+Combine them into a single evaluation of the whole project. Weigh each part by its share, keep criterion scores between 1 and 4,
+and merge the feedback into at most 5 non-repetitive items.
+
+## Output JSON
+{json.dumps(EVALUATION_SCHEMA, indent=2)}
+
+Return ONLY the JSON, no additional text or markdown formatting."""
+
+    response = await post_chat_completion(build_evaluation_payload(prompt_text), api_key, timeout=120)
+    response.raise_for_status()
+    response_data = response.json()
+    record_token_usage(response_data)
+    validation = await check_json_schema(response_data["choices"][0]["message"]["content"], api_key)
+    if validation["validation"]["errors"]:
+        raise Exception(f"Invalid combined evaluation: {validation['validation']['errors'][-1]}")
+    return json.loads(validation["validation"]["corrected_text"])
+
+def validate_evaluation(parsed_json: dict) -> list:
+    """
+    Validate a parsed evaluation against EVALUATION_SCHEMA.
+
+    Args:
+        parsed_json (dict): The parsed LLM output.
+
+    Returns:
+        list: Validation error messages (empty if valid).
+    """
+    validation_errors = []
+    
+    # Check required fields
+    required_fields = ["overall_score", "max_score", "percentage", "evaluation", "feedback"]
+    for field in required_fields:
+        if field not in parsed_json:
+            validation_errors.append(f"Missing required field: {field}")
+    
+    # Validate overall_score
+    if "overall_score" in parsed_json:
+        score = parsed_json["overall_score"]
+        if not isinstance(score, (int, float)) or score < 0 or score > 24:
+            validation_errors.append(f"overall_score must be a number between 0 and 24, got: {score}")
+    
+    # Validate max_score
+    if "max_score" in parsed_json:
+        score = parsed_json["max_score"]
+        if not isinstance(score, (int, float)) or score < 0 or score > 24:
+            validation_errors.append(f"max_score must be a number between 0 and 24, got: {score}")
+    
+    # Validate percentage
+    if "percentage" in parsed_json:
+        pct = parsed_json["percentage"]
+        if not isinstance(pct, (int, float)) or pct < 0 or pct > 100:
+            validation_errors.append(f"percentage must be a number between 0 and 100, got: {pct}")
+    
+    # Validate evaluation object
+    if "evaluation" in parsed_json:
+        eval_obj = parsed_json["evaluation"]
+        if not isinstance(eval_obj, dict):
+            validation_errors.append("evaluation must be an object")
+        else:
+            for field in RUBRIC_CRITERIA:
+                if field not in eval_obj:
+                    validation_errors.append(f"Missing evaluation field: {field}")
+                else:
+                    val = eval_obj[field]
+                    if not isinstance(val, (int, float)) or val < 1 or val > 4:
+                        validation_errors.append(f"{field} must be a number between 1 and 4, got: {val}")
+    
+    # Validate feedback array
+    if "feedback" in parsed_json:
+        feedback = parsed_json["feedback"]
+        if not isinstance(feedback, list):
+            validation_errors.append("feedback must be an array")
+        else:
+            for i, item in enumerate(feedback):
+                if not isinstance(item, str):
+                    validation_errors.append(f"feedback[{i}] must be a string")
+    
+    return validation_errors
 
 # Async function to check if the text follows a specific JSON schema using an LLM
 async def check_json_schema(text: str, api_key: str):
@@ -292,22 +664,7 @@ async def check_json_schema(text: str, api_key: str):
     Returns:
         dict: Dictionary containing 'corrected_text' (str) and 'errors' (list of strings).
     """
-    schema = {
-        "overall_score": {"type": "number", "minimum": 0, "maximum": 24},
-        "max_score": {"type": "number", "minimum": 0, "maximum": 24},
-        "percentage": {"type": "number", "minimum": 0, "maximum": 100},
-        "evaluation": {
-            "system_design_architecture": {"type": "number", "minimum": 1, "maximum": 4},
-            "functionality_features": {"type": "number", "minimum": 1, "maximum": 4},
-            "code_quality_efficiency": {"type": "number", "minimum": 1, "maximum": 4},
-            "usability_user_interface": {"type": "number", "minimum": 1, "maximum": 4},
-            "testing_debugging": {"type": "number", "minimum": 1, "maximum": 4},
-            "documentation": {"type": "number", "minimum": 1, "maximum": 4}
-        },
-        "feedback": {"type": "array", "items": {"type": "string"}}
-    }
-
-    schema_str = json.dumps(schema, indent=2)
+    schema_str = json.dumps(EVALUATION_SCHEMA, indent=2)
     
     # Try to parse and validate the JSON
     errors = []
@@ -315,67 +672,10 @@ async def check_json_schema(text: str, api_key: str):
     
     for attempt in range(3):
         try:
-            # Try to parse as JSON
-            parsed_json = json.loads(corrected_text)
-            
-            # Basic validation against schema
-            validation_errors = []
-            
-            # Check required fields
-            required_fields = ["overall_score", "max_score", "percentage", "evaluation", "feedback"]
-            for field in required_fields:
-                if field not in parsed_json:
-                    validation_errors.append(f"Missing required field: {field}")
-            
-            # Validate overall_score
-            if "overall_score" in parsed_json:
-                score = parsed_json["overall_score"]
-                if not isinstance(score, (int, float)) or score < 0 or score > 24:
-                    validation_errors.append(f"overall_score must be a number between 0 and 24, got: {score}")
-            
-            # Validate max_score
-            if "max_score" in parsed_json:
-                score = parsed_json["max_score"]
-                if not isinstance(score, (int, float)) or score < 0 or score > 24:
-                    validation_errors.append(f"max_score must be a number between 0 and 24, got: {score}")
-            
-            # Validate percentage
-            if "percentage" in parsed_json:
-                pct = parsed_json["percentage"]
-                if not isinstance(pct, (int, float)) or pct < 0 or pct > 100:
-                    validation_errors.append(f"percentage must be a number between 0 and 100, got: {pct}")
-            
-            # Validate evaluation object
-            if "evaluation" in parsed_json:
-                eval_obj = parsed_json["evaluation"]
-                if not isinstance(eval_obj, dict):
-                    validation_errors.append("evaluation must be an object")
-                else:
-                    eval_fields = [
-                        "system_design_architecture",
-                        "functionality_features",
-                        "code_quality_efficiency",
-                        "usability_user_interface",
-                        "testing_debugging",
-                        "documentation"
-                    ]
-                    for field in eval_fields:
-                        if field not in eval_obj:
-                            validation_errors.append(f"Missing evaluation field: {field}")
-                        else:
-                            val = eval_obj[field]
-                            if not isinstance(val, (int, float)) or val < 1 or val > 4:
-                                validation_errors.append(f"{field} must be a number between 1 and 4, got: {val}")
-            
-            # Validate feedback array
-            if "feedback" in parsed_json:
-                feedback = parsed_json["feedback"]
-                if not isinstance(feedback, list):
-                    validation_errors.append("feedback must be an array")
-                else:
-                    for i, item in enumerate(feedback):
-                        if not isinstance(item, str):
-                            validation_errors.append(f"feedback[{i}] must be a string")
+            # Try to parse as JSON and validate against the schema
+            with VALIDATION_SECONDS.time():
+                parsed_json = json.loads(corrected_text)
+                validation_errors = validate_evaluation(parsed_json)
             
             # If validation passed, return the corrected text
             if not validation_errors:
@@ -428,7 +728,7 @@ Please correct the JSON to match the schema exactly. Return ONLY the corrected J
         
         try:
             correction_payload = {
-                "model": "x-ai/grok-4.1-fast",
+                "model": LLM_MODEL,
                 "messages": [
                     {
                         "role": "system",
@@ -441,18 +741,12 @@ Please correct the JSON to match the schema exactly. Return ONLY the corrected J
                 ]
             }
             
-            correction_response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=correction_payload,
-                timeout=60
-            )
+            LLM_CORRECTIONS.inc()
+            correction_response = await post_chat_completion(correction_payload, api_key, timeout=60, phase="correction")
             
             correction_response.raise_for_status()
             correction_data = correction_response.json()
+            record_token_usage(correction_data)
             corrected_text = correction_data["choices"][0]["message"]["content"].strip()
             
             # Remove markdown code blocks if present
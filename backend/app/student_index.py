@@ -0,0 +1,261 @@
+"""In-memory search index of students for the professor autocomplete.
+
+The index is loaded from the users table on first use and kept current by
+calling upsert_student after signups and profile updates. Because each worker
+process holds its own copy, the whole index is also reloaded in the background
+once it is older than STUDENT_INDEX_REFRESH_SECONDS, which picks up changes
+made by other workers.
+
+Queries are answered from memory:
+- queries shorter than 3 characters match word prefixes (names and email parts)
+- longer queries match substrings of the first name, last name, full name or
+  email, found through a trigram index
+
+Results are ranked: exact field matches first, then field prefixes, word
+prefixes and finally other substrings, each ordered by name. Ranked results
+are cached per query until the next upsert, so fetching further pages or
+repeating a keystroke only slices a list.
+"""
+
+import asyncio
+import bisect
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from operator import attrgetter, itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .database import admin_client, run_blocking
+
+STUDENT_INDEX_REFRESH_SECONDS = float(os.getenv("STUDENT_INDEX_REFRESH_SECONDS", "300"))
+
+# Rows fetched per request when loading the index (PostgREST caps responses at 1000 rows)
+LOAD_PAGE_SIZE = 1000
+
+STUDENT_COLUMNS = "auth_id, first_name, last_name, email"
+STUDENT_KEYS = ("auth_id", "first_name", "last_name", "email")
+WORD_SEPARATORS = re.compile(r"[\s@._+-]+")
+
+# Ranked results kept per query, so paging and repeated keystrokes skip the ranking
+RESULT_CACHE_SIZE = 256
+
+RANK_EXACT, RANK_FIELD_PREFIX, RANK_WORD_PREFIX, RANK_SUBSTRING = range(4)
+
+
+def _fields(student: dict) -> Tuple[str, ...]:
+    """Lowercased searchable fields: first name, last name, full name and email."""
+    first = (student.get("first_name") or "").lower()
+    last = (student.get("last_name") or "").lower()
+    return first, last, f"{first} {last}".strip(), (student.get("email") or "").lower()
+
+
+def _words(fields: Tuple[str, ...]) -> Set[str]:
+    return {word for field in fields for word in WORD_SEPARATORS.split(field) if word}
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Entry:
+    """A student row with its lowercased fields and words precomputed for ranking."""
+
+    __slots__ = ("student", "fields", "words", "sort_key")
+
+    def __init__(self, student: dict):
+        self.student = {key: student.get(key) or "" for key in STUDENT_KEYS}
+        self.fields = _fields(self.student)
+        self.words = _words(self.fields)
+        self.sort_key = (self.fields[1], self.fields[0], self.student["auth_id"])
+
+    def rank(self, query: str, short_query: bool) -> Optional[int]:
+        if query in self.fields:
+            return RANK_EXACT
+        if any(field.startswith(query) for field in self.fields):
+            return RANK_FIELD_PREFIX
+        if any(word.startswith(query) for word in self.words):
+            return RANK_WORD_PREFIX
+        if not short_query and any(query in field for field in self.fields):
+            return RANK_SUBSTRING
+        return None
+
+
+class StudentSearchIndex:
+    """Prefix and trigram index over student names and emails."""
+
+    def __init__(self, students: Optional[List[dict]] = None):
+        self.entries: Dict[str, _Entry] = {}
+        self.trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.words: List[Tuple[str, str]] = []  # sorted (word, auth_id) pairs for prefix lookups
+        self.results: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self.loaded_at = time.monotonic()
+        # Bulk load: index every row, then sort the word list once
+        for student in students or []:
+            entry = self._add(student)
+            self.words.extend((word, entry.student["auth_id"]) for word in entry.words)
+        self.words.sort()
+
+    def _add(self, student: dict) -> _Entry:
+        """Store a student and index its trigrams (words are indexed by the caller)."""
+        entry = _Entry(student)
+        auth_id = entry.student["auth_id"]
+        self.entries[auth_id] = entry
+        for field in entry.fields:
+            for trigram in _trigrams(field):
+                self.trigrams[trigram].add(auth_id)
+        return entry
+
+    def upsert(self, student: dict):
+        """Add a student, or re-index one whose name or email changed."""
+        self.remove(student["auth_id"])
+        entry = self._add(student)
+        for word in entry.words:
+            bisect.insort(self.words, (word, entry.student["auth_id"]))
+        self.results.clear()
+
+    def remove(self, auth_id: str):
+        entry = self.entries.pop(auth_id, None)
+        if entry is None:
+            return
+        self.results.clear()
+        for field in entry.fields:
+            for trigram in _trigrams(field):
+                postings = self.trigrams.get(trigram)
+                if postings is not None:
+                    postings.discard(auth_id)
+                    if not postings:
+                        del self.trigrams[trigram]
+        for word in entry.words:
+            position = bisect.bisect_left(self.words, (word, auth_id))
+            if position < len(self.words) and self.words[position] == (word, auth_id):
+                del self.words[position]
+
+    def _prefix_candidates(self, prefix: str) -> Set[str]:
+        candidates = set()
+        position = bisect.bisect_left(self.words, (prefix, ""))
+        while position < len(self.words) and self.words[position][0].startswith(prefix):
+            candidates.add(self.words[position][1])
+            position += 1
+        return candidates
+
+    def _trigram_candidates(self, query: str) -> Set[str]:
+        postings = [self.trigrams.get(trigram) for trigram in _trigrams(query)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _ranked(self, query: str) -> List[dict]:
+        """Every student matching the query, best match first."""
+        cached = self.results.get(query)
+        if cached is not None:
+            self.results.move_to_end(query)
+            return cached
+
+        if not query:
+            matches = [entry.student for entry in sorted(self.entries.values(), key=attrgetter("sort_key"))]
+        else:
+            short_query = len(query) < 3
+            candidates = self._prefix_candidates(query)
+            if not short_query:
+                candidates |= self._trigram_candidates(query)
+            ranked = []
+            for auth_id in candidates:
+                entry = self.entries[auth_id]
+                rank = entry.rank(query, short_query)
+                if rank is not None:
+                    ranked.append(((rank, entry.sort_key), entry.student))
+            ranked.sort(key=itemgetter(0))
+            matches = [student for _, student in ranked]
+
+        self.results[query] = matches
+        if len(self.results) > RESULT_CACHE_SIZE:
+            self.results.popitem(last=False)
+        return matches
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[List[dict], Optional[int]]:
+        """
+        Find students matching a query.
+
+        Args:
+            query: Text typed by the user (case-insensitive); empty lists every student
+            limit: Maximum number of students to return
+            offset: Number of ranked results to skip (the cursor of the previous page)
+
+        Returns:
+            Tuple of (students, offset of the next page or None if this is the last page)
+        """
+        matches = self._ranked(query.strip().lower())
+        page = matches[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(matches) else None
+        return page, next_offset
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > STUDENT_INDEX_REFRESH_SECONDS
+
+
+def load_student_index() -> StudentSearchIndex:
+    """Build an index of every student in the users table, a page at a time."""
+    students = []
+    while True:
+        response = admin_client.table("users").select(STUDENT_COLUMNS).eq("role", "student").order(
+            "auth_id").range(len(students), len(students) + LOAD_PAGE_SIZE - 1).execute()
+        students.extend(response.data)
+        if len(response.data) < LOAD_PAGE_SIZE:
+            break
+    return StudentSearchIndex(students)
+
+
+_index: Optional[StudentSearchIndex] = None
+_load_lock = threading.Lock()
+_refresh_task: Optional[asyncio.Task] = None
+# Rows indexed while a background refresh is loading, replayed onto the fresh copy
+_pending_upserts: List[dict] = []
+
+
+def _load_once() -> StudentSearchIndex:
+    global _index
+    with _load_lock:
+        if _index is None:
+            _index = load_student_index()
+        return _index
+
+
+async def _refresh():
+    global _index, _refresh_task
+    try:
+        fresh = await run_blocking(load_student_index)
+        for user in _pending_upserts:
+            fresh.upsert(user)
+        _index = fresh
+    except Exception as e:
+        # Keep serving the current copy and retry after another refresh interval
+        print(f"Student index refresh failed: {e}")
+        _index.loaded_at = time.monotonic()
+    finally:
+        _pending_upserts.clear()
+        _refresh_task = None
+
+
+async def get_student_index() -> StudentSearchIndex:
+    """
+    Return the process-wide student index, loading it on first use.
+
+    A stale index keeps serving queries while a fresh copy loads in the background.
+    """
+    global _refresh_task
+    if _index is None:
+        return await run_blocking(_load_once)
+    if _index.is_stale() and _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh())
+    return _index
+
+
+def upsert_student(user: dict):
+    """Index a new or updated user row if it belongs to a student (no-op before the index is loaded)."""
+    if _index is not None and user.get("role") == "student":
+        _index.upsert(user)
+        if _refresh_task is not None:
+            _pending_upserts.append(user)
@@ -0,0 +1,80 @@
+"""Rejecting oversized uploads before their body is read.
+
+save_upload enforces MAX_UPLOAD_BYTES on the file itself, but only once
+Starlette has parsed the multipart body, which spools the whole upload to a
+temporary file first: an oversized upload would still cost its full size in
+bandwidth and disk. UploadLimitMiddleware answers multipart requests whose
+Content-Length is over the limit with 413 straight away, and stops reading a
+body sent without Content-Length (chunked) once it passes the limit.
+"""
+
+import json
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.common.archive import MAX_UPLOAD_BYTES, megabytes
+
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware capping the body size of multipart (upload) requests."""
+
+    def __init__(self, app: ASGIApp, max_upload_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_upload_bytes = max_upload_bytes
+        self.max_body_bytes = max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+
+    def detail(self) -> str:
+        return f"Upload is larger than {megabytes(self.max_upload_bytes)} (limit)"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get("content-length")
+        if content_length is not None:
+            try:
+                too_large = int(content_length) > self.max_body_bytes
+            except ValueError:
+                too_large = False
+            if too_large:
+                await self.reject(send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Raised inside the endpoint's form parsing, which passes HTTPException through
+                    raise HTTPException(status_code=413, detail=self.detail())
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+    async def reject(self, send: Send):
+        body = json.dumps({"detail": self.detail()}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,51 @@
+"""Read-through cache of rows of the users table, keyed by auth_id.
+
+/login, /me and /confirm all need the caller's profile or role, and the
+frontend calls /me on nearly every page load. Profiles almost never change,
+so each worker keeps them for USER_PROFILE_CACHE_SECONDS. Signup and PUT /me
+write the new row through to the cache of their own worker; other workers see
+the change once their entry expires. Only existing profiles are cached, so a
+user who just signed up is never reported missing because of a stale entry.
+
+Hits and misses are counted in sepai_cache_lookups_total{cache="user_profile"}.
+"""
+
+import os
+from typing import Optional
+
+from .cache import TTLCache
+from .database import admin_client, execute
+
+USER_PROFILE_CACHE_SECONDS = float(os.getenv("USER_PROFILE_CACHE_SECONDS", "300"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+
+profiles = TTLCache("user_profile", USER_PROFILE_CACHE_SECONDS, USER_PROFILE_CACHE_SIZE)
+
+
+async def get_user_profile(auth_id: str) -> Optional[dict]:
+    """
+    The users row of an authenticated user.
+
+    Args:
+        auth_id: The user's Supabase Auth id
+
+    Returns:
+        Optional[dict]: The full row, or None if the user has no profile
+    """
+    profile = profiles.get(auth_id)
+    if profile is None:
+        response = await execute(admin_client.table("users").select("*").eq("auth_id", auth_id))
+        if not response.data:
+            return None
+        profile = response.data[0]
+        profiles.set(auth_id, profile)
+    return profile
+
+
+def profile_written(profile: dict):
+    """Store a users row that was just inserted or updated."""
+    profiles.set(profile["auth_id"], profile)
+
+
+def forget_profile(auth_id: str):
+    profiles.pop(auth_id)
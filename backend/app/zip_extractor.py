@@ -1,8 +1,23 @@
 """Utilities for extracting and filtering developer-written source files from ZIP archives."""
 
+import codecs
 import zipfile
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 
+from backend.common.archive import ArchiveError, open_archive
+
+# Per-file character budget for extract_developer_files
+MAX_FILE_CHARS = 5000
+# Bytes read per step when streaming a member; bounds over-read past the budget
+READ_BLOCK_BYTES = 16 * 1024
+# Members larger than this are data dumps or bundles, not hand-written source
+MAX_MEMBER_BYTES = 1_000_000
+# Source text compresses ~3-10x; far higher ratios indicate padding or zip bombs
+MAX_COMPRESSION_RATIO = 100
+# Smallest member that can hold the 10 non-whitespace characters a file needs to be kept
+MIN_MEMBER_BYTES = 10
+
 
 def should_include_file(file_path: str) -> bool:
     """Check if a file should be included in the evaluation.
@@ -84,6 +99,56 @@ def get_file_priority(file_path: str) -> int:
     return 4
 
 
+def is_candidate_member(info: zipfile.ZipInfo) -> bool:
+    """Pre-screen a ZIP member using only its directory entry (no decompression).
+
+    Args:
+        info: ZipInfo of the member
+
+    Returns:
+        True if the member is a plausibly hand-written source file worth reading
+    """
+    if info.is_dir() or not should_include_file(info.filename):
+        return False
+    if info.file_size < MIN_MEMBER_BYTES or info.file_size > MAX_MEMBER_BYTES:
+        return False
+    if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+        return False
+    return True
+
+
+def read_text_prefix(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, max_chars: int) -> Tuple[str, bool]:
+    """Decode at most max_chars characters of a member, reading it incrementally.
+
+    Decompression stops one block after the budget is reached, so the cost
+    depends on max_chars rather than the member's size.
+
+    Args:
+        zip_ref: Open ZipFile
+        info: ZipInfo of the member to read
+        max_chars: Character budget
+
+    Returns:
+        Tuple of (decoded text of at most max_chars characters, whether it was truncated)
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    parts = []
+    chars = 0
+
+    with zip_ref.open(info) as f:
+        while chars <= max_chars:
+            block = f.read(READ_BLOCK_BYTES)
+            if not block:
+                parts.append(decoder.decode(b'', final=True))
+                text = "".join(parts)
+                return text[:max_chars], len(text) > max_chars
+            text = decoder.decode(block)
+            parts.append(text)
+            chars += len(text)
+
+    return "".join(parts)[:max_chars], True
+
+
 def extract_developer_files(zip_path: str, max_total_chars: int = 500_000, max_files: int = 50) -> str:
     """Extract and filter developer-written source files from a ZIP archive.
     
@@ -104,39 +169,34 @@ def extract_developer_files(zip_path: str, max_total_chars: int = 500_000, max_f
     project_content = []
     
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Get all files and filter
-            all_files = zip_ref.namelist()
-            source_files = [f for f in all_files if should_include_file(f)]
-            
-            # Sort by priority (most important files first)
-            source_files.sort(key=get_file_priority)
+        with open_archive(zip_path) as zip_ref:
+            # Screen members by their directory entries, then sort by priority (most important first)
+            candidates = [info for info in zip_ref.infolist() if is_candidate_member(info)]
+            candidates.sort(key=lambda info: get_file_priority(info.filename))
             
-            # Extract files up to limits
+            # Single pass: take files in priority order until the file or character budget is spent
             total_chars = 0
             
-            for file_name in source_files[:max_files]:
-                if total_chars >= max_total_chars:
+            for info in candidates:
+                if total_chars >= max_total_chars or len(project_content) >= max_files:
                     break
+                max_file_chars = min(MAX_FILE_CHARS, max_total_chars - total_chars)
                 try:
-                    with zip_ref.open(file_name) as f:
-                        content = f.read().decode('utf-8', errors='ignore')
-                        
-                        # Skip empty or very small files (likely not important)
-                        if len(content.strip()) < 10:
-                            continue
-                        
-                        # Limit file content to avoid exceeding token limits
-                        max_file_chars = min(5000, max_total_chars - total_chars)
-                        if len(content) > max_file_chars:
-                            content = content[:max_file_chars] + "\n... (truncated)"
-                        project_content.append(f"=== {file_name} ===\n{content}\n")
-                        total_chars += len(content)
+                    content, truncated = read_text_prefix(zip_ref, info, max_file_chars)
                 except Exception as e:
-                    print(f"Skipping file {file_name}: {str(e)}")
+                    print(f"Skipping file {info.filename}: {str(e)}")
                     continue  # Skip files that can't be read
-    except zipfile.BadZipFile:
-        raise HTTPException(status_code=400, detail="Invalid ZIP file format")
+                
+                # Skip empty or very small files (likely not important)
+                if len(content.strip()) < 10:
+                    continue
+                
+                total_chars += len(content)
+                if truncated:
+                    content += "\n... (truncated)"
+                project_content.append(f"=== {info.filename} ===\n{content}\n")
+    except ArchiveError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     
     if not project_content:
         raise HTTPException(
@@ -146,3 +206,117 @@ def extract_developer_files(zip_path: str, max_total_chars: int = 500_000, max_f
     
     return "\n".join(project_content)
 
+
+def collect_developer_files(zip_path: str, max_total_chars: Optional[int] = None) -> Tuple[List[Tuple[str, str]], int]:
+    """Read developer-written source files from a ZIP archive, most important first.
+
+    Unlike extract_developer_files, files are not cut to a per-file budget, so
+    callers that split the project across several prompts see whole files.
+    Reading stops once max_total_chars characters have been read: the file
+    that crosses the budget is cut short and the remaining files are skipped.
+    Source files rejected by is_candidate_member for their size or compression
+    ratio are never read and count as skipped too.
+
+    Args:
+        zip_path: Path to the ZIP file
+        max_total_chars: Total character budget (default: no limit)
+
+    Returns:
+        Tuple of (list of (file name, content) tuples, number of files cut short or skipped)
+
+    Raises:
+        HTTPException: If ZIP is invalid or no source files found
+    """
+    files = []
+    files_truncated = 0
+
+    try:
+        with open_archive(zip_path) as zip_ref:
+            source_files = [info for info in zip_ref.infolist()
+                            if not info.is_dir() and should_include_file(info.filename)]
+            candidates = [info for info in source_files if is_candidate_member(info)]
+            # Files too small to keep are not lost coverage; oversized or suspiciously compressed ones are
+            files_truncated += sum(1 for info in source_files
+                                   if info.file_size >= MIN_MEMBER_BYTES and not is_candidate_member(info))
+            # Keep files of the same priority in path order so chunks stay grouped by directory
+            candidates.sort(key=lambda info: (get_file_priority(info.filename), info.filename))
+
+            total_chars = 0
+            for position, info in enumerate(candidates):
+                if max_total_chars is not None and total_chars >= max_total_chars:
+                    files_truncated += len(candidates) - position
+                    break
+                try:
+                    if max_total_chars is None:
+                        with zip_ref.open(info) as f:
+                            content, truncated = f.read().decode('utf-8', errors='ignore'), False
+                    else:
+                        content, truncated = read_text_prefix(zip_ref, info, max_total_chars - total_chars)
+                except Exception as e:
+                    print(f"Skipping file {info.filename}: {str(e)}")
+                    continue
+
+                # Skip empty or very small files (likely not important)
+                if len(content.strip()) < 10:
+                    continue
+                total_chars += len(content)
+                if truncated:
+                    files_truncated += 1
+                    content += "\n... (truncated)"
+                files.append((info.filename, content))
+    except ArchiveError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if not files:
+        raise HTTPException(
+            status_code=400,
+            detail="No developer source code files found in the ZIP archive. Please ensure your project contains source code files (not just libraries or static assets)."
+        )
+
+    return files, files_truncated
+
+
+def chunk_developer_files(files: List[Tuple[str, str]], max_chunk_tokens: int = 50_000, chars_per_token: int = 4) -> List[str]:
+    """Pack developer files into token-bounded prompt chunks.
+
+    Files are packed greedily in the given order. A file larger than a whole
+    chunk is split into consecutive parts so no content is dropped.
+
+    Args:
+        files: List of (file name, content) tuples
+        max_chunk_tokens: Approximate token budget per chunk (default: 50k)
+        chars_per_token: Characters per token used for the estimate (default: 4)
+
+    Returns:
+        List of formatted chunk strings in the same layout as extract_developer_files
+    """
+    max_chunk_chars = max(1, max_chunk_tokens * chars_per_token)
+    chunks = []
+    current = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunks.append("\n".join(current))
+        current = []
+        current_chars = 0
+
+    for file_name, content in files:
+        if len(content) <= max_chunk_chars:
+            if current_chars + len(content) > max_chunk_chars:
+                flush()
+            current.append(f"=== {file_name} ===\n{content}\n")
+            current_chars += len(content)
+            continue
+
+        # Oversized file: each part starts a new chunk, the last part can share with following files
+        parts = range(0, len(content), max_chunk_chars)
+        for part_number, start in enumerate(parts, start=1):
+            part = content[start:start + max_chunk_chars]
+            flush()
+            current.append(f"=== {file_name} (part {part_number}/{len(parts)}) ===\n{part}\n")
+            current_chars = len(part)
+
+    flush()
+    return chunks
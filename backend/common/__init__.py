@@ -0,0 +1,2 @@
+"""Standard-library-only helpers shared by the API (backend.app) and the
+comment-quality scorer (backend.ai), so neither package imports the other."""
@@ -0,0 +1,267 @@
+"""Opening and extracting uploaded ZIP archives under resource limits.
+
+Every code path that opens a student upload goes through open_archive (or
+validate_archive) and safe_extract_all, so a zip bomb or an archive with
+hundreds of thousands of tiny files is rejected from its central directory
+before any decompression starts. Extraction also counts the bytes actually
+written, in case an entry decompresses to more than it declares. Uploads
+themselves are saved with save_upload, which streams them to disk in chunks.
+
+This module only depends on the standard library so the comment-quality
+scorer (backend.ai) and its worker processes can use it without importing
+the API package.
+"""
+
+import asyncio
+import hashlib
+import os
+import stat
+import zipfile
+from pathlib import PurePosixPath
+from typing import Optional
+
+# Entries that are themselves archives; they are never unpacked recursively
+NESTED_ARCHIVE_EXTENSIONS = ('.zip', '.jar', '.war', '.whl', '.egg', '.tar', '.tgz', '.gz', '.bz2',
+                             '.xz', '.7z', '.rar')
+
+COPY_BLOCK_BYTES = 64 * 1024
+
+# Largest accepted upload (matches the frontend's 50 MB limit)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+
+class ArchiveError(Exception):
+    """The upload is not a usable ZIP archive."""
+    status_code = 400
+
+
+class ArchiveLimitError(ArchiveError):
+    """The upload exceeds one of the configured archive limits."""
+    status_code = 413
+
+
+class ArchiveLimits:
+    """Resource limits applied to uploaded archives."""
+
+    def __init__(
+        self,
+        max_total_bytes: int = 200 * 1024 * 1024,
+        max_entries: int = 20_000,
+        max_entry_ratio: float = 250.0,
+        ratio_min_bytes: int = 1024 * 1024,
+        max_path_depth: int = 32,
+        max_nested_archives: int = 20
+    ):
+        """
+        Initialize the limits.
+
+        Args:
+            max_total_bytes: Maximum total uncompressed size of all entries
+            max_entries: Maximum number of entries (files and directories)
+            max_entry_ratio: Maximum uncompressed/compressed ratio of a single entry
+            ratio_min_bytes: Entries smaller than this are exempt from the ratio check
+            max_path_depth: Maximum number of path components of an entry
+            max_nested_archives: Maximum number of entries that are archives themselves
+        """
+        self.max_total_bytes = max_total_bytes
+        self.max_entries = max_entries
+        self.max_entry_ratio = max_entry_ratio
+        self.ratio_min_bytes = ratio_min_bytes
+        self.max_path_depth = max_path_depth
+        self.max_nested_archives = max_nested_archives
+
+    @classmethod
+    def from_env(cls) -> "ArchiveLimits":
+        """Create limits from ARCHIVE_* environment variables, falling back to the defaults."""
+        defaults = cls()
+        return cls(
+            max_total_bytes=int(os.getenv("ARCHIVE_MAX_TOTAL_BYTES", defaults.max_total_bytes)),
+            max_entries=int(os.getenv("ARCHIVE_MAX_ENTRIES", defaults.max_entries)),
+            max_entry_ratio=float(os.getenv("ARCHIVE_MAX_ENTRY_RATIO", defaults.max_entry_ratio)),
+            ratio_min_bytes=int(os.getenv("ARCHIVE_RATIO_MIN_BYTES", defaults.ratio_min_bytes)),
+            max_path_depth=int(os.getenv("ARCHIVE_MAX_PATH_DEPTH", defaults.max_path_depth)),
+            max_nested_archives=int(os.getenv("ARCHIVE_MAX_NESTED_ARCHIVES", defaults.max_nested_archives))
+        )
+
+
+DEFAULT_LIMITS = ArchiveLimits.from_env()
+
+
+def megabytes(size: int) -> str:
+    """Format a size in bytes for limit messages, e.g. "50.0 MB"."""
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def check_archive(zip_ref: zipfile.ZipFile, limits: Optional[ArchiveLimits] = None):
+    """
+    Check an open archive's central directory against the limits.
+
+    Only directory entries are inspected, so this is cheap regardless of the
+    archive's content.
+
+    Raises:
+        ArchiveLimitError: If a limit is exceeded
+        ArchiveError: If an entry has an unsafe path
+    """
+    limits = limits or DEFAULT_LIMITS
+    infos = zip_ref.infolist()
+
+    if len(infos) > limits.max_entries:
+        raise ArchiveLimitError(
+            f"Archive has {len(infos)} entries (limit {limits.max_entries}). "
+            f"Remove dependency folders such as node_modules or venv before zipping."
+        )
+
+    total_bytes = 0
+    nested_archives = 0
+    for info in infos:
+        path = PurePosixPath(info.filename.replace('\\', '/'))
+        if path.is_absolute() or '..' in path.parts:
+            raise ArchiveError(f"Archive entry has an unsafe path: {info.filename}")
+        if len(path.parts) > limits.max_path_depth:
+            raise ArchiveLimitError(
+                f"Archive entry is nested {len(path.parts)} levels deep (limit {limits.max_path_depth}): {info.filename}"
+            )
+
+        total_bytes += info.file_size
+        if total_bytes > limits.max_total_bytes:
+            raise ArchiveLimitError(
+                f"Archive expands to more than {megabytes(limits.max_total_bytes)} (limit). "
+                f"Remove build outputs, datasets and dependency folders before zipping."
+            )
+
+        if (info.file_size >= limits.ratio_min_bytes
+                and info.file_size > limits.max_entry_ratio * max(info.compress_size, 1)):
+            raise ArchiveLimitError(
+                f"Archive entry {info.filename} has a suspicious compression ratio "
+                f"({megabytes(info.file_size)} from {info.compress_size} bytes)"
+            )
+
+        if info.filename.lower().endswith(NESTED_ARCHIVE_EXTENSIONS):
+            nested_archives += 1
+            if nested_archives > limits.max_nested_archives:
+                raise ArchiveLimitError(
+                    f"Archive contains more than {limits.max_nested_archives} nested archives (limit)"
+                )
+
+
+def open_archive(zip_path: str, limits: Optional[ArchiveLimits] = None) -> zipfile.ZipFile:
+    """
+    Open an uploaded ZIP file after checking it against the limits.
+
+    Args:
+        zip_path: Path to the ZIP file
+        limits: Limits to enforce (defaults to ARCHIVE_* environment settings)
+
+    Returns:
+        The open ZipFile (use it as a context manager)
+
+    Raises:
+        ArchiveError: If the file is not a valid ZIP or has unsafe paths
+        ArchiveLimitError: If a limit is exceeded
+    """
+    try:
+        zip_ref = zipfile.ZipFile(zip_path, 'r')
+    except zipfile.BadZipFile:
+        raise ArchiveError("Invalid ZIP file")
+
+    try:
+        check_archive(zip_ref, limits)
+    except BaseException:
+        zip_ref.close()
+        raise
+    return zip_ref
+
+
+def validate_archive(zip_path: str, limits: Optional[ArchiveLimits] = None):
+    """Check an uploaded ZIP file against the limits without extracting anything."""
+    with open_archive(zip_path, limits):
+        pass
+
+
+def safe_extract_all(zip_ref: zipfile.ZipFile, output_dir: str, limits: Optional[ArchiveLimits] = None):
+    """
+    Extract a checked archive, streaming each entry and counting the bytes written.
+
+    Symlink entries are skipped and extraction aborts as soon as the written
+    total passes the limit, even if entries under-declare their size.
+
+    Raises:
+        ArchiveError: If an entry would be written outside output_dir or is corrupt
+        ArchiveLimitError: If the extracted size exceeds the limit
+    """
+    limits = limits or DEFAULT_LIMITS
+    root = os.path.realpath(output_dir)
+    os.makedirs(root, exist_ok=True)
+    written = 0
+
+    for info in zip_ref.infolist():
+        target = os.path.realpath(os.path.join(root, info.filename))
+        if target != root and not target.startswith(root + os.sep):
+            raise ArchiveError(f"Archive entry has an unsafe path: {info.filename}")
+
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            continue
+        if stat.S_ISLNK(info.external_attr >> 16):
+            continue
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zip_ref.open(info) as source, open(target, 'wb') as destination:
+            while True:
+                try:
+                    block = source.read(COPY_BLOCK_BYTES)
+                except zipfile.BadZipFile as e:
+                    # zipfile stops at the declared size, so an under-declared entry fails its CRC check
+                    raise ArchiveError(f"Archive entry {info.filename} is corrupt: {e}")
+                if not block:
+                    break
+                written += len(block)
+                if written > limits.max_total_bytes:
+                    raise ArchiveLimitError(
+                        f"Archive expands to more than {megabytes(limits.max_total_bytes)} (limit)"
+                    )
+                destination.write(block)
+
+
+async def save_upload(upload, destination: str, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Stream an uploaded file to disk in chunks, hashing it on the way through.
+
+    Memory use is bounded by UPLOAD_CHUNK_BYTES regardless of the upload size.
+    File operations run in a worker thread so a slow disk never blocks the
+    event loop.
+
+    Args:
+        upload: The FastAPI UploadFile to read
+        destination: Path of the file to write
+        max_bytes: Largest accepted upload
+
+    Returns:
+        Tuple of (SHA-256 hex digest, size in bytes)
+
+    Raises:
+        ArchiveLimitError: If the upload is larger than max_bytes
+    """
+    too_large = ArchiveLimitError(f"Upload is larger than {megabytes(max_bytes)} (limit)")
+    # The multipart parser already knows the size; reject without copying anything
+    if getattr(upload, "size", None) is not None and upload.size > max_bytes:
+        raise too_large
+
+    digest = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, destination, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large
+            digest.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    finally:
+        await asyncio.to_thread(f.close)
+    return digest.hexdigest(), size
@@ -0,0 +1 @@
+"""Load-test harness: fake OpenRouter, in-memory Supabase and a submission driver."""
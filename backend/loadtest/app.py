@@ -0,0 +1,30 @@
+"""ASGI entry point serving the real backend against the in-memory Supabase stand-in.
+
+The fixture size and simulated database latency come from the environment
+(set by the driver): LOADTEST_PROFESSORS, LOADTEST_STUDENTS,
+LOADTEST_ASSESSMENTS_PER_CLASS and LOADTEST_DB_LATENCY (seconds per query).
+
+Run with: python -m uvicorn backend.loadtest.app:app --port 8000
+"""
+
+import os
+
+import supabase
+
+from backend.loadtest.fake_supabase import LOADTEST_JWT_SECRET, FakeSupabase, build_fixture
+
+fake_client = FakeSupabase(latency=float(os.getenv("LOADTEST_DB_LATENCY", "0")))
+fake_client.load(build_fixture(
+    professors=int(os.getenv("LOADTEST_PROFESSORS", "5")),
+    students=int(os.getenv("LOADTEST_STUDENTS", "200")),
+    assessments_per_class=int(os.getenv("LOADTEST_ASSESSMENTS_PER_CLASS", "1"))
+))
+
+# backend.app.database creates both clients at import time, so patch the factory first
+supabase.create_client = lambda url, key: fake_client
+os.environ.setdefault("SUPABASE_URL", fake_client.url)
+os.environ.setdefault("SUPABASE_ANON_KEY", "loadtest")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "loadtest")
+os.environ.setdefault("SUPABASE_JWT_SECRET", LOADTEST_JWT_SECRET)
+
+from backend.main import app  # noqa: E402
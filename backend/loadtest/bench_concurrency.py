@@ -0,0 +1,100 @@
+"""Throughput of read endpoints as concurrency grows, against a slow in-memory Supabase.
+
+Runs the real app in process (httpx ASGI transport) over the in-memory
+stand-in with a fixed latency per query, and sends a fixed number of
+requests per endpoint at several concurrency levels. While handlers block
+the event loop on database calls, throughput stays at one request per
+round trip whatever the concurrency; with the calls offloaded it grows with
+concurrency up to the size of the database thread pool.
+
+Example:
+    python -m backend.loadtest.bench_concurrency --db-latency 0.02 --concurrency 1,4,16,64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import supabase
+
+from backend.loadtest.fake_supabase import LOADTEST_JWT_SECRET, FakeSupabase, build_fixture, sign_access_token
+
+fake_client = FakeSupabase()
+
+# backend.app.database creates both clients at import time, so patch the factory first
+supabase.create_client = lambda url, key: fake_client
+os.environ.setdefault("SUPABASE_URL", fake_client.url)
+os.environ.setdefault("SUPABASE_ANON_KEY", "loadtest")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "loadtest")
+os.environ.setdefault("SUPABASE_JWT_SECRET", LOADTEST_JWT_SECRET)
+
+from backend.main import app  # noqa: E402
+
+ENDPOINTS = [
+    "/api/classes",
+    "/api/assessments",
+    "/api/assessments/assessment-0-0/submissions",
+    "/api/classes/class-0/students",
+    "/me",
+]
+
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict, concurrency: int, requests: int) -> dict:
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(path, headers=headers)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"endpoint": path, "concurrency": concurrency, "rps": round(requests / elapsed, 1), "errors": errors}
+
+
+async def run(concurrency_levels, requests: int, db_latency: float, students: int) -> list:
+    fixture = build_fixture(professors=1, students=students, assessments_per_class=1)
+    fake_client.load(fixture)
+    headers = {"Authorization": f"Bearer {sign_access_token('professor-0', 'professor-0@example.edu')}"}
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up caches so every level measures the same steady state
+        for path in ENDPOINTS:
+            await client.get(path, headers=headers)
+        fake_client.latency = db_latency
+        for path in ENDPOINTS:
+            for concurrency in concurrency_levels:
+                results.append(await measure(client, path, headers, concurrency, requests))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=128, help="requests per endpoint and concurrency level")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="simulated seconds per Supabase round trip")
+    parser.add_argument("--students", type=int, default=100, help="students in the class")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = asyncio.run(run(levels, args.requests, args.db_latency, args.students))
+    header = f"{'endpoint':<48}{'concurrency':>12}{'req/s':>10}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['endpoint']:<48}{row['concurrency']:>12}{row['rps']:>10}{row['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Serialization time and response size of a 300-row submission list.
+
+Compares the path a list took before and after the jsonb migration and the
+fast JSON response class, for two row shapes: the summary rows of
+GET /assessments/{id}/submissions, and full rows with the AI and human
+evaluation data (as GET /submissions/{id} returns them one at a time):
+
+- before: evaluation columns arrive as JSON text and are decoded row by
+  row, then FastAPI's jsonable_encoder and JSONResponse serialize the list
+- after: evaluation columns arrive decoded (jsonb) and FastJSONResponse
+  serializes the list in one pass (orjson when installed)
+
+and reports the bytes on the wire without compression, with gzip and, when
+the brotli package is installed, with brotli.
+
+Example:
+    python -m backend.loadtest.bench_serialization --rows 300 --repeat 50
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.app import compression
+from backend.app.responses import FastJSONResponse, orjson
+from backend.loadtest.fake_openrouter import CRITERIA
+
+WORDS = ("project", "handles", "main", "flows", "error", "handling", "tests", "could", "improve", "clear", "structure",
+         "naming", "database", "queries", "validation", "input", "user", "interface", "documentation", "readme",
+         "components", "reuse", "logic", "edge", "cases", "coverage", "routes", "state", "responsive", "layout")
+
+SUMMARY_COLUMNS = ["id", "assessment_id", "student_id", "student_name", "student_email", "ai_score",
+                   "professor_feedback", "final_score", "zip_path", "status", "created_at"]
+
+
+def build_rows(count: int, seed: int = 7) -> list:
+    """Full submission rows with decoded evaluation data, like jsonb columns return them."""
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30))).capitalize() + "."
+
+    rows = []
+    for i in range(count):
+        feedback = [sentence() for _ in range(6)]
+        evaluation = {criterion: rng.randint(2, 4) for criterion in CRITERIA}
+        overall = sum(evaluation.values())
+        rows.append({
+            "id": 1_000_000_000 + i,
+            "assessment_id": "3f1c2a9e-1d2b-4c5d-8e9f-0a1b2c3d4e5f",
+            "student_id": f"6b7c8d9e-0f1a-2b3c-4d5e-{i:012d}",
+            "student_name": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}",
+            "student_email": f"student{i}@example.edu",
+            "ai_feedback": "\n".join(feedback),
+            "ai_score": overall,
+            "ai_evaluation_data": {
+                "overall_score": overall,
+                "max_score": 24,
+                "percentage": round(overall / 24 * 100, 1),
+                "evaluation": evaluation,
+                "feedback": feedback,
+                "comment_quality": {"score": round(rng.random(), 3), "label": rng.choice(["good", "fair", "poor"]),
+                                    "comments_scored": rng.randint(5, 80)},
+            },
+            "adjusted_ai_score": None,
+            "human_evaluation": {"innovation_score": 3.0, "collaboration_score": 4.0, "presentation_score": 3.0},
+            "professor_feedback": "",
+            "final_score": None,
+            "zip_path": f"https://example.supabase.co/storage/v1/object/public/submissions/blobs/ab/{rng.getrandbits(256):064x}.zip",
+            "status": "pending",
+            "created_at": f"2026-10-{1 + i % 28:02d}T08:{i % 60:02d}:00+00:00",
+        })
+    return rows
+
+
+def as_text_columns(rows: list) -> list:
+    """The same rows as they came from the TEXT columns before migration 008."""
+    return [{**row, "ai_evaluation_data": json.dumps(row["ai_evaluation_data"]),
+             "human_evaluation": json.dumps(row["human_evaluation"])} for row in rows]
+
+
+def render_before(rows: list, full: bool) -> bytes:
+    items = []
+    for row in rows:
+        item = {column: row[column] for column in SUMMARY_COLUMNS}
+        if full:
+            item["ai_feedback"] = row["ai_feedback"]
+            item["ai_evaluation_data"] = json.loads(row["ai_evaluation_data"])
+            item["human_evaluation"] = json.loads(row["human_evaluation"])
+        items.append(item)
+    return JSONResponse(jsonable_encoder(items)).body
+
+
+def render_after(rows: list, full: bool) -> bytes:
+    items = []
+    for row in rows:
+        item = {column: row[column] for column in SUMMARY_COLUMNS}
+        if full:
+            item["ai_feedback"] = row["ai_feedback"]
+            item["ai_evaluation_data"] = row["ai_evaluation_data"]
+            item["human_evaluation"] = row["human_evaluation"]
+        items.append(item)
+    return FastJSONResponse(items).body
+
+
+def time_ms(function, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def run(row_count: int, repeat: int) -> list:
+    rows = build_rows(row_count)
+    text_rows = as_text_columns(rows)
+    results = []
+    for shape, full in (("summary", False), ("full", True)):
+        for path, render, source in (("before", render_before, text_rows), ("after", render_after, rows)):
+            body = render(source, full)
+            result = {
+                "shape": shape,
+                "path": path,
+                "serialize_ms": time_ms(lambda: render(source, full), repeat),
+                "bytes": len(body),
+                "gzip_bytes": len(compression.StreamCompressor("gzip").compress(body, True)),
+                "gzip_ms": time_ms(lambda: compression.StreamCompressor("gzip").compress(body, True), repeat),
+                "br_bytes": None,
+                "br_ms": None,
+            }
+            if compression.brotli is not None:
+                result["br_bytes"] = len(compression.StreamCompressor("br").compress(body, True))
+                result["br_ms"] = time_ms(lambda: compression.StreamCompressor("br").compress(body, True), repeat)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=300, help="rows in the list")
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per measurement (the median is reported)")
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson is not None else 'no'}   brotli: {'yes' if compression.brotli is not None else 'no'}")
+    header = f"{'rows':<10}{'path':<8}{'serialize ms':>14}{'bytes':>10}{'gzip bytes':>12}{'gzip ms':>9}{'br bytes':>10}{'br ms':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in run(args.rows, args.repeat):
+        print(f"{row['shape']:<10}{row['path']:<8}{row['serialize_ms']:>14}{row['bytes']:>10}{row['gzip_bytes']:>12}"
+              f"{row['gzip_ms']:>9}{row['br_bytes'] or '-':>10}{row['br_ms'] or '-':>7}")
+
+
+if __name__ == "__main__":
+    main()
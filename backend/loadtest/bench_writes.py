@@ -0,0 +1,93 @@
+"""Benchmark of the bulk write endpoints against the in-memory Supabase stand-in.
+
+Runs add_student_to_class, release_assessment_scores and delete_class for
+classes of increasing size and reports the Supabase round trips and elapsed
+time of each call. With bulk writes the round trips stay constant as the
+class grows.
+
+Example:
+    python -m backend.loadtest.bench_writes --class-sizes 30,300 --assessments 5 --db-latency 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import supabase
+
+from backend.loadtest.fake_supabase import FakeSupabase, build_fixture
+
+fake_client = FakeSupabase()
+
+# backend.app.database creates both clients at import time, so patch the factory first
+supabase.create_client = lambda url, key: fake_client
+os.environ.setdefault("SUPABASE_URL", fake_client.url)
+os.environ.setdefault("SUPABASE_ANON_KEY", "loadtest")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "loadtest")
+
+from backend.app.routes import (  # noqa: E402
+    AddStudentToClass,
+    add_student_to_class,
+    delete_class,
+    release_assessment_scores,
+)
+
+PROFESSOR = SimpleNamespace(id="professor-0")
+NEW_STUDENT_ID = "student-new"
+
+
+def reset(class_size: int, assessments: int):
+    """Load one class with class_size students and a student who is not enrolled yet."""
+    fake_client.tables = {}
+    fixture = build_fixture(professors=1, students=class_size, assessments_per_class=assessments)
+    fixture["users"].append({"auth_id": NEW_STUDENT_ID, "email": "new@example.edu", "first_name": "New",
+                             "last_name": "Student", "role": "student", "university": "Load Test University"})
+    fake_client.load(fixture)
+
+
+def measure(operation) -> dict:
+    fake_client.round_trips.clear()
+    start = time.perf_counter()
+    asyncio.run(operation)
+    return {
+        "round_trips": sum(fake_client.round_trips.values()),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def run(class_sizes, assessments: int, db_latency: float) -> list:
+    results = []
+    for class_size in class_sizes:
+        reset(class_size, assessments)
+        fake_client.latency = db_latency
+        operations = [
+            ("add_student_to_class", add_student_to_class(
+                "class-0", AddStudentToClass(student_id=NEW_STUDENT_ID), current_user=PROFESSOR)),
+            ("release_assessment_scores", release_assessment_scores("assessment-0-0", current_user=PROFESSOR)),
+            ("delete_class", delete_class("class-0", current_user=PROFESSOR)),
+        ]
+        for name, operation in operations:
+            results.append({"operation": name, "class_size": class_size, **measure(operation)})
+        fake_client.latency = 0
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--class-sizes", default="30,300", help="comma-separated numbers of students per class")
+    parser.add_argument("--assessments", type=int, default=5, help="assessments in the class")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="simulated seconds per Supabase round trip")
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.class_sizes.split(",")], args.assessments, args.db_latency)
+    header = f"{'operation':<28}{'students':>10}{'round trips':>14}{'elapsed ms':>12}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['operation']:<28}{row['class_size']:>10}{row['round_trips']:>14}{row['elapsed_ms']:>12}")
+
+
+if __name__ == "__main__":
+    main()
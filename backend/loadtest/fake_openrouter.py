@@ -0,0 +1,80 @@
+"""Local fake of the OpenRouter chat completions API.
+
+Behaviour is configured with environment variables:
+
+- FAKE_LLM_LATENCY_MEDIAN: median response time in seconds (default 2.0)
+- FAKE_LLM_LATENCY_SIGMA: log-normal spread of the response time (default 0.5)
+- FAKE_LLM_ERROR_RATE: fraction of requests answered with HTTP 503 (default 0)
+- FAKE_LLM_MALFORMED_RATE: fraction of answers with truncated JSON content (default 0)
+- FAKE_LLM_SEED: random seed for reproducible runs
+
+Run with: python -m uvicorn backend.loadtest.fake_openrouter:app --port 8100
+"""
+
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MEDIAN = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", "2.0"))
+LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))
+
+CRITERIA = [
+    "system_design_architecture",
+    "functionality_features",
+    "code_quality_efficiency",
+    "usability_user_interface",
+    "testing_debugging",
+    "documentation"
+]
+
+rng = random.Random(os.getenv("FAKE_LLM_SEED"))
+app = FastAPI()
+stats = {"requests": 0, "errors": 0, "malformed": 0}
+
+
+def fake_evaluation() -> dict:
+    evaluation = {criterion: rng.randint(2, 4) for criterion in CRITERIA}
+    overall = sum(evaluation.values())
+    return {
+        "overall_score": overall,
+        "max_score": 24,
+        "percentage": round(overall / 24 * 100, 1),
+        "evaluation": evaluation,
+        "feedback": [f"Synthetic feedback item {i + 1}." for i in range(3)]
+    }
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+    stats["requests"] += 1
+
+    await asyncio.sleep(rng.lognormvariate(0, LATENCY_SIGMA) * LATENCY_MEDIAN)
+
+    if rng.random() < ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "Injected provider error"}})
+
+    content = json.dumps(fake_evaluation())
+    if rng.random() < MALFORMED_RATE:
+        stats["malformed"] += 1
+        content = content[:len(content) // 2]
+
+    return {
+        "id": f"fake-{stats['requests']}",
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4}
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,742 @@
+"""In-memory stand-in for the Supabase client used by the routes.
+
+FakeSupabase implements the subset of supabase-py that the backend calls:
+table queries with PostgREST-style embedded selects (`users!inner(...)`,
+`classes(*, assessments(*))`), filters, ordering, inserts, updates, upserts,
+deletes and RPCs, plus storage uploads and `auth.get_user`. Every `execute()`
+can sleep for a configurable latency to imitate a network round trip, and
+round trips are counted per table so benchmarks can compare query plans.
+Access tokens are HS256 JWTs signed with LOADTEST_JWT_SECRET (see
+sign_access_token), so the backend verifies them locally like real ones.
+The database functions from backend/migrations are available to rpc() as the
+Python versions at the end of this module.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from jose import JWTError, jwt
+from postgrest import APIError
+
+DEFAULT_URL = "http://fake-supabase.local"
+LOADTEST_JWT_SECRET = "loadtest-jwt-secret"
+
+# (table, embedded relation) -> (local column, remote column, one-to-many)
+RELATIONSHIPS = {
+    ("submissions", "users"): ("student_id", "auth_id", False),
+    ("submissions", "assessments"): ("assessment_id", "id", False),
+    ("assessments", "classes"): ("class_id", "id", False),
+    ("class_students", "users"): ("student_id", "auth_id", False),
+    ("class_students", "classes"): ("class_id", "id", False),
+    ("classes", "users"): ("professor_id", "auth_id", False),
+    ("classes", "assessments"): ("id", "class_id", True),
+    ("classes", "class_students"): ("id", "class_id", True),
+    ("assessments", "submissions"): ("id", "assessment_id", True),
+}
+
+# Column sets that must be unique per table (primary keys and unique constraints)
+UNIQUE_KEYS = {
+    "users": [("auth_id",)],
+    "classes": [("id",)],
+    "assessments": [("id",)],
+    "class_students": [("id",), ("class_id", "student_id")],
+    "submissions": [("id",), ("assessment_id", "student_id")],
+    "submission_blobs": [("sha256",)],
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a select string on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def parse_select(columns: str) -> list:
+    """Parse a PostgREST select string into (name, inner, children) items.
+
+    Plain columns have children=None; embedded relations have a nested list.
+    """
+    items = []
+    for part in _split_top_level(columns or "*"):
+        match = re.match(r"^([\w*]+)(!inner)?\s*(?:\((.*)\))?$", part, re.S)
+        if not match:
+            raise ValueError(f"Unsupported select item: {part}")
+        name, inner, children = match.groups()
+        items.append((name, bool(inner), parse_select(children) if children is not None else None))
+    return items
+
+
+class Response(SimpleNamespace):
+    """Mimics postgrest's APIResponse (`data` and `count`)."""
+
+
+class QueryBuilder:
+    """Chainable query against one table of a FakeSupabase store."""
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.count = None
+        self.filters = []  # (column path, predicate)
+        self.orders = []
+        self.limit_value = None
+        self.offset_value = 0
+        self.single_row = False
+
+    # Operations
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        if self.operation == "select":
+            self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs):
+        self.operation, self.payload = "upsert", payload
+        self.on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip()) or None
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column: str, predicate: Callable):
+        self.filters.append((column, predicate))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v is not None and str(v) == str(value))
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v is None or str(v) != str(value))
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def is_(self, column, value):
+        expected = None if value in (None, "null") else value
+        return self._filter(column, lambda v: v is expected or v == expected)
+
+    def in_(self, column, values):
+        allowed = {str(v) for v in values}
+        return self._filter(column, lambda v: v is not None and str(v) in allowed)
+
+    def ilike(self, column, pattern):
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$", re.I | re.S)
+        return self._filter(column, lambda v: v is not None and bool(regex.match(str(v))))
+
+    def order(self, column, desc: bool = False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.limit_value = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self.offset_value, self.limit_value = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    # Execution
+    def execute(self) -> Response:
+        self.client.before_execute(self.table, self.operation)
+        with self.client.lock:
+            data, count = getattr(self, f"_execute_{self.operation}")()
+        if self.single_row:
+            data = data[0] if data else None
+        return Response(data=data, count=count)
+
+    def _base_filters(self):
+        return [(c, p) for c, p in self.filters if "." not in c]
+
+    def _matching_rows(self) -> list:
+        rows = self.client.tables.setdefault(self.table, [])
+        base = self._base_filters()
+        return [row for row in rows if all(pred(row.get(col)) for col, pred in base)]
+
+    def _execute_select(self):
+        rows = self._matching_rows()
+        items = parse_select(self.columns)
+        embedded_filters = [(c, p) for c, p in self.filters if "." in c]
+
+        result = []
+        for row in rows:
+            projected = self.client.project(self.table, row, items, embedded_filters)
+            if projected is not None:
+                result.append(projected)
+
+        for column, desc in reversed(self.orders):
+            result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+
+        count = len(result) if self.count else None
+        end = None if self.limit_value is None else self.offset_value + self.limit_value
+        return result[self.offset_value:end], count
+
+    def _execute_insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = [self.client.prepare_row(self.table, row) for row in rows]
+        for row in inserted:
+            self.client.check_unique(self.table, row)
+        self.client.tables.setdefault(self.table, []).extend(inserted)
+        self.client.on_write(self.table)
+        return [dict(r) for r in inserted], len(inserted)
+
+    def _execute_upsert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        key = self.on_conflict or UNIQUE_KEYS.get(self.table, [("id",)])[0]
+        table = self.client.tables.setdefault(self.table, [])
+        result = []
+        for payload in rows:
+            existing = next((r for r in table if all(str(r.get(k)) == str(payload.get(k)) for k in key)), None)
+            if existing is None:
+                row = self.client.prepare_row(self.table, payload)
+                self.client.check_unique(self.table, row)
+                table.append(row)
+                result.append(dict(row))
+            elif not self.ignore_duplicates:
+                existing.update(payload)
+                result.append(dict(existing))
+        self.client.on_write(self.table)
+        return result, len(result)
+
+    def _execute_update(self):
+        rows = self._matching_rows()
+        for row in rows:
+            row.update(self.payload)
+        self.client.on_write(self.table)
+        return [dict(r) for r in rows], len(rows)
+
+    def _execute_delete(self):
+        rows = self._matching_rows()
+        doomed = {id(r) for r in rows}
+        self.client.tables[self.table] = [r for r in self.client.tables.get(self.table, []) if id(r) not in doomed]
+        self.client.on_write(self.table)
+        return [dict(r) for r in rows], len(rows)
+
+
+class RpcBuilder:
+    """Deferred call of a registered fake RPC function."""
+
+    def __init__(self, client: "FakeSupabase", name: str, params: dict):
+        self.client, self.name, self.params = client, name, params or {}
+
+    def execute(self) -> Response:
+        self.client.before_execute(f"rpc:{self.name}", "rpc")
+        if self.name not in self.client.functions:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self.name}"})
+        with self.client.lock:
+            data = self.client.functions[self.name](self.client, **self.params)
+        return Response(data=data, count=None)
+
+
+class FakeBucket:
+    """Storage bucket keeping object sizes and hashes (and bytes if requested)."""
+
+    def __init__(self, client: "FakeSupabase", name: str):
+        self.client, self.name = client, name
+
+    def _objects(self) -> dict:
+        return self.client.objects.setdefault(self.name, {})
+
+    def upload(self, path: str, file, file_options: Optional[dict] = None):
+        self.client.before_execute(f"storage:{self.name}", "upload")
+        data = file if isinstance(file, (bytes, bytearray)) else file.read()
+        upsert = str((file_options or {}).get("upsert", "false")).lower() == "true"
+        with self.client.lock:
+            if path in self._objects() and not upsert:
+                raise Exception(f"The resource already exists: {path}")
+            self._objects()[path] = {
+                "size": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "data": bytes(data) if self.client.keep_objects else None,
+            }
+        return SimpleNamespace(path=path, full_path=f"{self.name}/{path}")
+
+    def download(self, path: str) -> bytes:
+        self.client.before_execute(f"storage:{self.name}", "download")
+        stored = self._objects().get(path)
+        if stored is None or stored["data"] is None:
+            raise Exception(f"Object not found: {path}")
+        return stored["data"]
+
+    def exists(self, path: str) -> bool:
+        self.client.before_execute(f"storage:{self.name}", "exists")
+        return path in self._objects()
+
+    def remove(self, paths: List[str]):
+        self.client.before_execute(f"storage:{self.name}", "remove")
+        with self.client.lock:
+            return [{"name": p} for p in paths if self._objects().pop(p, None) is not None]
+
+    def get_public_url(self, path: str) -> str:
+        return f"{self.client.url}/storage/v1/object/public/{self.name}/{path}"
+
+
+class FakeStorage:
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+
+    def from_(self, bucket: str) -> FakeBucket:
+        return FakeBucket(self.client, bucket)
+
+
+def sign_access_token(auth_id: str, email: str, lifetime_seconds: int = 3600) -> str:
+    """Issue an access token shaped like Supabase's, for the project at SUPABASE_URL."""
+    now = int(time.time())
+    claims = {
+        "sub": auth_id,
+        "email": email,
+        "role": "authenticated",
+        "aud": "authenticated",
+        "iss": f"{os.getenv('SUPABASE_URL', DEFAULT_URL)}/auth/v1",
+        "iat": now,
+        "exp": now + lifetime_seconds,
+    }
+    return jwt.encode(claims, os.getenv("SUPABASE_JWT_SECRET", LOADTEST_JWT_SECRET), algorithm="HS256")
+
+
+class FakeAuth:
+    """Auth stand-in issuing and checking signed access tokens for the users table."""
+
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+
+    def _user(self, auth_id: str):
+        row = next((u for u in self.client.tables.get("users", []) if u["auth_id"] == auth_id), None)
+        if row is None:
+            raise Exception("Invalid JWT")
+        return SimpleNamespace(id=row["auth_id"], email=row["email"])
+
+    def get_user(self, token: str):
+        self.client.before_execute("auth", "get_user")
+        try:
+            claims = jwt.decode(token, os.getenv("SUPABASE_JWT_SECRET", LOADTEST_JWT_SECRET),
+                                algorithms=["HS256"], audience="authenticated")
+        except JWTError:
+            raise Exception("Invalid JWT")
+        return SimpleNamespace(user=self._user(claims["sub"]))
+
+    def sign_in_with_password(self, credentials: dict):
+        self.client.before_execute("auth", "sign_in")
+        row = next((u for u in self.client.tables.get("users", []) if u["email"] == credentials["email"]), None)
+        if row is None:
+            raise Exception("Invalid login credentials")
+        user = self._user(row["auth_id"])
+        token = sign_access_token(user.id, user.email)
+        return SimpleNamespace(user=user, session=SimpleNamespace(access_token=token, refresh_token=user.id))
+
+    def sign_up(self, credentials: dict):
+        self.client.before_execute("auth", "sign_up")
+        return SimpleNamespace(user=SimpleNamespace(id=str(uuid.uuid4()), email=credentials["email"]), session=None)
+
+    def set_session(self, *args, **kwargs):
+        return None
+
+
+class FakeSupabase:
+    """In-memory Supabase client: tables, RPC functions, storage and auth."""
+
+    def __init__(self, latency: float = 0.0, url: str = DEFAULT_URL, keep_objects: bool = False):
+        """
+        Initialize an empty store.
+
+        Args:
+            latency: Seconds every execute() sleeps (blocking, like the real sync client)
+            url: Base URL used for public storage URLs
+            keep_objects: Keep uploaded bytes so they can be downloaded again
+        """
+        self.latency = latency
+        self.url = url
+        self.keep_objects = keep_objects
+        self.tables: Dict[str, list] = {}
+        self.objects: Dict[str, dict] = {}
+        self.functions: Dict[str, Callable] = dict(DATABASE_FUNCTIONS)
+        self.round_trips = Counter()
+        self.lock = threading.RLock()
+        self.write_listeners: List[Callable[[str], None]] = []
+        self._ids = itertools.count(1_000_000_000)
+        self.storage = FakeStorage(self)
+        self.auth = FakeAuth(self)
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> RpcBuilder:
+        return RpcBuilder(self, name, params)
+
+    def register_function(self, name: str, function: Callable):
+        """Register a Python implementation of a database function for rpc()."""
+        self.functions[name] = function
+
+    def before_execute(self, target: str, operation: str):
+        self.round_trips[f"{target}.{operation}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def on_write(self, table: str):
+        for listener in self.write_listeners:
+            listener(table)
+
+    def prepare_row(self, table: str, row: dict) -> dict:
+        row = dict(row)
+        if "id" not in row and table != "users":
+            row["id"] = next(self._ids) if table == "submissions" else str(uuid.uuid4())
+        row.setdefault("created_at", _now())
+        return row
+
+    def check_unique(self, table: str, row: dict):
+        for key in UNIQUE_KEYS.get(table, []):
+            if any(all(str(other.get(k)) == str(row.get(k)) for k in key) for other in self.tables.get(table, [])):
+                raise APIError({
+                    "code": "23505",
+                    "message": f'duplicate key value violates unique constraint "{table}_{"_".join(key)}_key"',
+                })
+
+    def project(self, table: str, row: dict, items: list, embedded_filters: list) -> Optional[dict]:
+        """Project a row through a parsed select, embedding related rows.
+
+        Returns None when an `!inner` embedding has no matching related rows.
+        """
+        result = {}
+        for name, inner, children in items:
+            if children is None:
+                if name == "*":
+                    result.update(row)
+                else:
+                    result[name] = row.get(name)
+                continue
+
+            local, remote, many = RELATIONSHIPS[(table, name)]
+            prefix = f"{name}."
+            nested_filters = [(c[len(prefix):], p) for c, p in embedded_filters if c.startswith(prefix)]
+            direct = [(c, p) for c, p in nested_filters if "." not in c]
+            deeper = [(c, p) for c, p in nested_filters if "." in c]
+
+            related = [
+                r for r in self.tables.get(name, [])
+                if str(r.get(remote)) == str(row.get(local)) and all(p(r.get(c)) for c, p in direct)
+            ]
+            projected = [p for p in (self.project(name, r, children, deeper) for r in related) if p is not None]
+
+            if inner and not projected:
+                return None
+            result[name] = projected if many else (projected[0] if projected else None)
+        return result
+
+    def load(self, tables: Dict[str, list]):
+        """Bulk-load fixture rows without counting round trips."""
+        with self.lock:
+            for name, rows in tables.items():
+                self.tables.setdefault(name, []).extend(dict(r) for r in rows)
+
+
+# Python versions of the database functions defined in backend/migrations.
+# Triggers are not emulated, so reference counts are computed from the rows.
+
+def register_submission_blob_path(client: FakeSupabase, p_sha256: str, p_storage_path: str, p_size_bytes: int) -> List[dict]:
+    blobs = client.tables.setdefault("submission_blobs", [])
+    blob = next((b for b in blobs if b["sha256"] == p_sha256), None)
+    if blob is None:
+        blob = {"sha256": p_sha256, "storage_path": p_storage_path, "size_bytes": p_size_bytes,
+                "uploaded": False, "created_at": _now(), "updated_at": _now()}
+        blobs.append(blob)
+    else:
+        blob["updated_at"] = _now()
+    return [{"uploaded": blob["uploaded"], "storage_path": blob["storage_path"]}]
+
+
+def claim_unreferenced_submission_blobs(client: FakeSupabase, p_grace_seconds: int, p_limit: int) -> List[dict]:
+    referenced = {s.get("content_sha256") for s in client.tables.get("submissions", [])}
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=p_grace_seconds)).isoformat()
+    blobs = client.tables.get("submission_blobs", [])
+    claimed = sorted((b for b in blobs if b["sha256"] not in referenced and b["updated_at"] < cutoff),
+                     key=lambda b: b["updated_at"])[:p_limit]
+    client.tables["submission_blobs"] = [b for b in blobs if b not in claimed]
+    return [{"storage_path": b["storage_path"]} for b in claimed]
+
+
+def submission_preflight(client: FakeSupabase, p_assessment_id: str, p_student_id: str) -> List[dict]:
+    assessment = next((a for a in client.tables.get("assessments", []) if a["id"] == p_assessment_id), None)
+    enrolled = assessment is not None and any(
+        e["class_id"] == assessment["class_id"] and e["student_id"] == p_student_id
+        for e in client.tables.get("class_students", []))
+    existing = next((s for s in client.tables.get("submissions", [])
+                     if s["assessment_id"] == p_assessment_id and s["student_id"] == p_student_id), None)
+    return [{
+        "assessment": dict(assessment) if assessment else None,
+        "is_enrolled": enrolled,
+        "existing_submission_id": existing["id"] if existing else None,
+        "existing_status": existing["status"] if existing else None,
+    }]
+
+
+def _professor_submissions(client: FakeSupabase, professor_id: str) -> List[tuple]:
+    classes = {c["id"]: c for c in client.tables.get("classes", []) if c["professor_id"] == professor_id}
+    assessments = {a["id"]: a for a in client.tables.get("assessments", []) if a["class_id"] in classes}
+    return [(s, assessments[s["assessment_id"]], classes[assessments[s["assessment_id"]]["class_id"]])
+            for s in client.tables.get("submissions", []) if s["assessment_id"] in assessments]
+
+
+def professor_dashboard_stats(client: FakeSupabase, p_professor_id: str) -> dict:
+    submissions = [s for s, _, _ in _professor_submissions(client, p_professor_id)]
+    graded = [s for s in submissions if s.get("status") in ("reviewed", "released")]
+    scores = [s["final_score"] for s in graded if s.get("final_score") is not None]
+    return {
+        "total_submissions": len(submissions),
+        "graded_submissions": len(graded),
+        "pending_submissions": len(submissions) - len(graded),
+        "average_score": sum(scores) / len(scores) if scores else None,
+    }
+
+
+def professor_recent_submissions(client: FakeSupabase, p_professor_id: str, p_limit: int = 5) -> List[dict]:
+    users = {u["auth_id"]: u for u in client.tables.get("users", [])}
+    rows = [(s, a, c) for s, a, c in _professor_submissions(client, p_professor_id) if s["student_id"] in users]
+    rows.sort(key=lambda row: row[0].get("created_at") or "", reverse=True)
+    return [{
+        "id": s["id"], "status": s.get("status"), "ai_score": s.get("ai_score"),
+        "final_score": s.get("final_score"), "created_at": s.get("created_at"),
+        "first_name": users[s["student_id"]]["first_name"], "last_name": users[s["student_id"]]["last_name"],
+        "assessment_title": a["title"], "class_name": c["name"],
+    } for s, a, c in rows[:p_limit]]
+
+
+def assessment_submission_page(client: FakeSupabase, p_assessment_id: str, p_statuses: Optional[List[str]] = None,
+                               p_after_created_at: Optional[str] = None, p_after_id: Optional[int] = None,
+                               p_after_student_id: Optional[str] = None, p_limit: int = 100) -> List[dict]:
+    assessment = next((a for a in client.tables.get("assessments", []) if a["id"] == p_assessment_id), None)
+    if assessment is None:
+        return []
+    users = {u["auth_id"]: u for u in client.tables.get("users", [])}
+    enrolled = {cs["student_id"] for cs in client.tables.get("class_students", [])
+                if cs["class_id"] == assessment["class_id"] and cs["student_id"] in users}
+    submissions = [s for s in client.tables.get("submissions", [])
+                   if s["assessment_id"] == p_assessment_id and s["student_id"] in enrolled]
+    submitted = {s["student_id"] for s in submissions}
+
+    def summary(student_id: str, submission: dict) -> dict:
+        user = users[student_id]
+        return {
+            "id": submission.get("id"), "student_id": student_id,
+            "status": submission.get("status", "no submission"), "ai_score": submission.get("ai_score"),
+            "final_score": submission.get("final_score"), "professor_feedback": submission.get("professor_feedback"),
+            "zip_path": submission.get("zip_path"), "created_at": submission.get("created_at"),
+            "first_name": user["first_name"], "last_name": user["last_name"], "email": user["email"],
+        }
+
+    page = []
+    if p_after_student_id is None:
+        submissions.sort(key=lambda s: (s["created_at"], s["id"]), reverse=True)
+        page = [summary(s["student_id"], s) for s in submissions
+                if (p_statuses is None or s.get("status") in p_statuses)
+                and (p_after_id is None or (s["created_at"], s["id"]) < (p_after_created_at, p_after_id))]
+    if p_statuses is None or "no submission" in p_statuses:
+        page += [summary(student_id, {}) for student_id in sorted(enrolled - submitted)
+                 if p_after_student_id is None or student_id > p_after_student_id]
+    return page[:p_limit]
+
+
+def assessment_gradebook_page(client: FakeSupabase, p_assessment_id: str, p_after_last_name: Optional[str] = None,
+                              p_after_first_name: Optional[str] = None, p_after_student_id: Optional[str] = None,
+                              p_limit: int = 500) -> List[dict]:
+    assessment = next((a for a in client.tables.get("assessments", []) if a["id"] == p_assessment_id), None)
+    if assessment is None:
+        return []
+    users = {u["auth_id"]: u for u in client.tables.get("users", [])}
+    submissions = {s["student_id"]: s for s in client.tables.get("submissions", []) if s["assessment_id"] == p_assessment_id}
+    rows = []
+    for enrollment in client.tables.get("class_students", []):
+        user = users.get(enrollment["student_id"])
+        if enrollment["class_id"] != assessment["class_id"] or user is None:
+            continue
+        key = (user.get("last_name") or "", user.get("first_name") or "", enrollment["student_id"])
+        if p_after_student_id is not None and key <= (p_after_last_name, p_after_first_name, p_after_student_id):
+            continue
+        submission = submissions.get(enrollment["student_id"], {})
+        status = submission.get("status", "no submission")
+        rows.append((key, {
+            "student_id": enrollment["student_id"], "first_name": user.get("first_name"),
+            "last_name": user.get("last_name"), "email": user.get("email"), "status": status,
+            "submitted_at": None if status == "no submission" else submission.get("created_at"),
+            "ai_score": submission.get("ai_score"), "adjusted_ai_score": submission.get("adjusted_ai_score"),
+            "human_evaluation": submission.get("human_evaluation"), "final_score": submission.get("final_score"),
+        }))
+    rows.sort(key=lambda item: item[0])
+    return [row for _, row in rows[:p_limit]]
+
+
+def grade_submissions(client: FakeSupabase, p_assessment_id: str, p_grades: List[dict]) -> List[int]:
+    grades = {str(grade["id"]): grade for grade in p_grades}
+    updated = []
+    for submission in client.tables.get("submissions", []):
+        grade = grades.get(str(submission["id"]))
+        if grade is None or submission["assessment_id"] != p_assessment_id:
+            continue
+        submission.update(professor_feedback=grade.get("professor_feedback"), final_score=grade.get("final_score"),
+                          status="reviewed")
+        for column in ("adjusted_ai_score", "human_evaluation"):
+            if grade.get(column) is not None:
+                submission[column] = grade[column]
+        updated.append(submission["id"])
+    if updated:
+        client.on_write("submissions")
+    return updated
+
+
+def begin_assessment_score_rebuild(client: FakeSupabase, p_assessment_id: str) -> int:
+    # Writes are counted by a trigger in the database; here only tests bump "writes"
+    rebuilds = client.tables.setdefault("assessment_score_rebuilds", [])
+    rebuild = next((r for r in rebuilds if r["assessment_id"] == p_assessment_id), None)
+    if rebuild is None:
+        rebuild = {"assessment_id": p_assessment_id, "writes": 0, "started_at": _now()}
+        rebuilds.append(rebuild)
+    return rebuild["writes"]
+
+
+def finish_assessment_score_rebuild(client: FakeSupabase, p_assessment_id: str, p_bins: List[dict],
+                                    p_writes: int) -> bool:
+    rebuilds = client.tables.get("assessment_score_rebuilds", [])
+    rebuild = next((r for r in rebuilds if r["assessment_id"] == p_assessment_id and r["writes"] == p_writes), None)
+    if rebuild is None:
+        return False
+    rebuilds.remove(rebuild)
+    bins = [b for b in client.tables.get("assessment_score_bins", []) if b["assessment_id"] != p_assessment_id]
+    client.tables["assessment_score_bins"] = bins + [{**b, "assessment_id": p_assessment_id} for b in p_bins]
+    return True
+
+
+def claim_deferred_submissions(client: FakeSupabase, p_lease_seconds: int, p_limit: int) -> List[dict]:
+    expired = (datetime.now(timezone.utc) - timedelta(seconds=p_lease_seconds)).isoformat()
+    claimed = []
+    for submission in sorted(client.tables.get("submissions", []), key=lambda s: s["id"]):
+        if len(claimed) >= p_limit:
+            break
+        if submission.get("needs_reevaluation") and (submission.get("reevaluation_claimed_at") or "") < expired:
+            submission["reevaluation_claimed_at"] = _now()
+            claimed.append({"id": submission["id"], "zip_path": submission.get("zip_path"),
+                            "ai_evaluation_data": submission.get("ai_evaluation_data"),
+                            "reevaluation_attempts": submission.get("reevaluation_attempts", 0)})
+    return claimed
+
+
+def list_change_token(client: FakeSupabase, p_list: str, p_key: str) -> str:
+    # Rows carry no updated_at here, so the token is a hash of the rows behind the list
+    tables = client.tables
+    if p_list in ("professor_classes", "professor_assessments", "student_classes"):
+        if p_list == "student_classes":
+            rows = [e for e in tables.get("class_students", []) if e["student_id"] == p_key]
+            class_ids = {e["class_id"] for e in rows}
+        else:
+            rows = []
+            class_ids = {c["id"] for c in tables.get("classes", []) if c["professor_id"] == p_key}
+        rows += [c for c in tables.get("classes", []) if c["id"] in class_ids]
+        if p_list != "professor_classes":
+            rows += [a for a in tables.get("assessments", []) if a["class_id"] in class_ids]
+    elif p_list == "assessment_submissions":
+        assessment = next((a for a in tables.get("assessments", []) if a["id"] == p_key), None)
+        class_id = assessment["class_id"] if assessment else None
+        rows = [e for e in tables.get("class_students", []) if e["class_id"] == class_id]
+        student_ids = {e["student_id"] for e in rows}
+        rows += [u for u in tables.get("users", []) if u["auth_id"] in student_ids]
+        rows += [s for s in tables.get("submissions", []) if s["assessment_id"] == p_key and s["student_id"] in student_ids]
+    else:
+        raise APIError({"code": "P0001", "message": f"Unknown list: {p_list}"})
+    return hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+
+
+DATABASE_FUNCTIONS = {
+    "assessment_gradebook_page": assessment_gradebook_page,
+    "grade_submissions": grade_submissions,
+    "claim_deferred_submissions": claim_deferred_submissions,
+    "begin_assessment_score_rebuild": begin_assessment_score_rebuild,
+    "finish_assessment_score_rebuild": finish_assessment_score_rebuild,
+    "list_change_token": list_change_token,
+    "assessment_submission_page": assessment_submission_page,
+    "professor_dashboard_stats": professor_dashboard_stats,
+    "professor_recent_submissions": professor_recent_submissions,
+    "submission_preflight": submission_preflight,
+    "register_submission_blob_path": register_submission_blob_path,
+    "claim_unreferenced_submission_blobs": claim_unreferenced_submission_blobs,
+}
+
+
+def build_fixture(professors: int = 5, students: int = 200, assessments_per_class: int = 1) -> dict:
+    """Build a deterministic dataset: one class per professor, students spread round-robin.
+
+    The load-test app seeds its store with this and the driver rebuilds it to
+    know the ids, so both sides agree without sharing state.
+    """
+    users, classes, assessments, class_students = [], [], [], []
+    deadline = "2099-01-01T00:00:00+00:00"
+
+    for p in range(professors):
+        professor_id = f"professor-{p}"
+        users.append({"auth_id": professor_id, "email": f"{professor_id}@example.edu", "first_name": "Prof",
+                      "last_name": str(p), "role": "professor", "university": "Load Test University"})
+        class_id = f"class-{p}"
+        classes.append({"id": class_id, "professor_id": professor_id, "name": f"Class {p}",
+                        "description": "Load test class", "created_at": _now()})
+        for a in range(assessments_per_class):
+            assessments.append({"id": f"assessment-{p}-{a}", "class_id": class_id, "title": f"Project {a}",
+                                "instructions": "Submit your project", "deadline": deadline, "created_at": _now()})
+
+    for s in range(students):
+        student_id = f"student-{s}"
+        users.append({"auth_id": student_id, "email": f"{student_id}@example.edu", "first_name": "Student",
+                      "last_name": str(s), "role": "student", "university": "Load Test University"})
+        class_students.append({"id": f"enrollment-{s}", "class_id": f"class-{s % professors}", "student_id": student_id})
+
+    return {"users": users, "classes": classes, "assessments": assessments, "class_students": class_students}
@@ -0,0 +1,333 @@
+"""Load-test driver: a deadline burst of student submissions plus professors polling dashboards.
+
+Starts the fake OpenRouter and the backend (wired to the in-memory Supabase
+stand-in) as uvicorn subprocesses, then:
+
+- every student uploads a synthetic project ZIP to
+  /api/student/assessments/{id}/submit at a random moment within the burst window
+- every professor polls the dashboard endpoints until the burst is over
+
+and reports p50/p95/p99 latency, throughput and error rate per endpoint, plus
+the peak resident memory of the backend worker processes.
+
+Example:
+    python -m backend.loadtest.run --students 300 --professors 6 --burst-seconds 30 --workers 2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+import zipfile
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from backend.loadtest.fake_supabase import build_fixture, sign_access_token
+
+PROFESSOR_ENDPOINTS = [
+    "/api/professor/dashboard-stats",
+    "/api/professor/recent-submissions",
+    "/api/classes",
+    "/api/assessments",
+]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def make_project_zip(files: int, file_kb: int, seed: int) -> bytes:
+    """Build a synthetic JavaScript/Python project ZIP of roughly files * file_kb."""
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("project/README.md", "# Load test project\n\nSynthetic submission.\n")
+        for i in range(files):
+            extension = ".py" if i % 2 else ".js"
+            lines = []
+            while sum(len(line) for line in lines) < file_kb * 1024:
+                name = f"fn_{rng.randint(0, 10**6)}"
+                if extension == ".py":
+                    lines.append(f"def {name}(value):\n    # Return the value scaled\n    return value * {rng.randint(1, 9)}\n\n")
+                else:
+                    lines.append(f"function {name}(value) {{\n  // Return the value scaled\n  return value * {rng.randint(1, 9)};\n}}\n\n")
+            archive.writestr(f"project/src/module_{i}{extension}", "".join(lines))
+    return buffer.getvalue()
+
+
+def process_tree_rss(pid: int) -> int:
+    """Total resident set size in bytes of a process and all its descendants (Linux /proc)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pending.extend(int(child) for child in children.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.error_samples: Dict[str, List[str]] = defaultdict(list)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status, detail = response.status_code, response.text
+        except httpx.HTTPError as e:
+            status, detail = 0, repr(e)
+        self.latencies[label].append(time.perf_counter() - start)
+        self.statuses[label][status] += 1
+        if status == 0 or status >= 400:
+            self.errors[label] += 1
+            # Keep a few distinct error bodies to explain failures in the report
+            detail = f"{status}: {detail[:200]}"
+            if len(self.error_samples[label]) < 3 and detail not in self.error_samples[label]:
+                self.error_samples[label].append(detail)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[label] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(self.errors[label] / len(values), 4),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "statuses": dict(self.statuses[label]),
+                "error_samples": self.error_samples[label],
+            }
+        return endpoints
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+async def student(recorder: Recorder, client: httpx.AsyncClient, token: str, assessment_id: str,
+                  zip_bytes: bytes, delay: float):
+    await asyncio.sleep(delay)
+    await recorder.request(
+        client, "POST /api/student/assessments/{id}/submit", "POST",
+        f"/api/student/assessments/{assessment_id}/submit",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": ("project.zip", zip_bytes, "application/zip")},
+    )
+
+
+async def professor(recorder: Recorder, client: httpx.AsyncClient, token: str, assessment_ids: List[str],
+                    poll_interval: float, stop: asyncio.Event):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        for endpoint in PROFESSOR_ENDPOINTS:
+            await recorder.request(client, f"GET {endpoint}", "GET", endpoint, headers=headers)
+        for assessment_id in assessment_ids:
+            await recorder.request(client, "GET /api/assessments/{id}/submissions", "GET",
+                                   f"/api/assessments/{assessment_id}/submissions", headers=headers)
+        try:
+            await asyncio.wait_for(stop.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def sample_rss(pid: int, samples: List[int], stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(process_tree_rss(pid))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(args, base_url: str, server_pid: int) -> dict:
+    fixture = build_fixture(args.professors, args.students, args.assessments_per_class)
+    assessments_by_class = defaultdict(list)
+    for assessment in fixture["assessments"]:
+        assessments_by_class[assessment["class_id"]].append(assessment["id"])
+
+    payloads = [make_project_zip(args.files, args.file_kb, seed) for seed in range(args.distinct_zips)]
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    stop = asyncio.Event()
+    tokens = {user["auth_id"]: sign_access_token(user["auth_id"], user["email"]) for user in fixture["users"]}
+    rss_samples: List[int] = []
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        start = time.perf_counter()
+        rss_task = asyncio.create_task(sample_rss(server_pid, rss_samples, stop))
+        professor_tasks = [
+            asyncio.create_task(professor(recorder, client, tokens[cls["professor_id"]], assessments_by_class[cls["id"]],
+                                          args.poll_interval, stop))
+            for cls in fixture["classes"]
+        ]
+        student_tasks = []
+        for i, enrollment in enumerate(fixture["class_students"]):
+            for assessment_id in assessments_by_class[enrollment["class_id"]]:
+                student_tasks.append(student(recorder, client, tokens[enrollment["student_id"]], assessment_id,
+                                             payloads[i % len(payloads)], rng.uniform(0, args.burst_seconds)))
+        await asyncio.gather(*student_tasks)
+        stop.set()
+        await asyncio.gather(*professor_tasks, rss_task)
+        elapsed = time.perf_counter() - start
+
+        metrics_text = (await client.get("/metrics")).text
+
+    return {
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "endpoints": recorder.report(elapsed),
+        "worker_rss_mb": {
+            "peak": round(max(rss_samples, default=0) / 2**20, 1),
+            "final": round((rss_samples[-1] if rss_samples else 0) / 2**20, 1),
+        },
+        "llm_metrics": [line for line in metrics_text.splitlines()
+                        if line.startswith(("sepai_llm_phase_seconds_count", "sepai_llm_fallbacks_total",
+                                            "sepai_llm_corrections_total", "sepai_llm_provider_requests_total"))],
+        "submission_stage_mean_ms": submission_stage_means(metrics_text),
+    }
+
+
+def submission_stage_means(metrics_text: str) -> dict:
+    """Mean duration per submit_assessment stage from the sepai_submission_stage_seconds histogram."""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        for suffix, target in (("_sum{", sums), ("_count{", counts)):
+            prefix = f"sepai_submission_stage_seconds{suffix}"
+            if line.startswith(prefix):
+                stage = line[len(prefix):].split('"')[1]
+                target[stage] = float(line.rsplit(" ", 1)[1])
+    return {stage: round(sums[stage] / counts[stage] * 1000, 1) for stage in sums if counts.get(stage)}
+
+
+def print_report(result: dict):
+    print(f"\nElapsed: {result['elapsed_seconds']}s   "
+          f"Worker RSS peak: {result['worker_rss_mb']['peak']} MB (final {result['worker_rss_mb']['final']} MB)\n")
+    header = f"{'endpoint':<48}{'reqs':>7}{'rps':>8}{'err%':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for label, stats in result["endpoints"].items():
+        print(f"{label:<48}{stats['requests']:>7}{stats['throughput_rps']:>8}{stats['error_rate'] * 100:>7.1f}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    for label, stats in result["endpoints"].items():
+        for sample in stats["error_samples"]:
+            print(f"  error sample [{label}] {sample}")
+    if result["submission_stage_mean_ms"]:
+        print("\nSubmission stage means (ms):")
+        for stage, mean_ms in result["submission_stage_mean_ms"].items():
+            print(f"  {stage:<16}{mean_ms:>10}")
+    if result["llm_metrics"]:
+        print("\nLLM metrics:")
+        for line in result["llm_metrics"]:
+            print(f"  {line}")
+
+
+def start_server(module: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    return subprocess.Popen(command, env={**os.environ, **env}, start_new_session=True)
+
+
+def stop_server(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--professors", type=int, default=5)
+    parser.add_argument("--assessments-per-class", type=int, default=1)
+    parser.add_argument("--burst-seconds", type=float, default=20.0, help="window in which all students submit")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds between dashboard polls")
+    parser.add_argument("--files", type=int, default=20, help="source files per synthetic project")
+    parser.add_argument("--file-kb", type=int, default=4, help="approximate size of each source file")
+    parser.add_argument("--distinct-zips", type=int, default=8, help="number of different ZIPs to cycle through")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the backend")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="simulated seconds per Supabase round trip")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="median fake LLM latency in seconds")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-port", type=int, default=8901)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args()
+
+    llm = start_server("backend.loadtest.fake_openrouter:app", args.llm_port, {
+        "FAKE_LLM_LATENCY_MEDIAN": str(args.llm_latency),
+        "FAKE_LLM_LATENCY_SIGMA": str(args.llm_latency_sigma),
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "FAKE_LLM_MALFORMED_RATE": str(args.llm_malformed_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+    })
+    backend = start_server("backend.loadtest.app:app", args.port, {
+        "OPENROUTER_URL": f"http://127.0.0.1:{args.llm_port}/api/v1/chat/completions",
+        "OPENROUTER_API_KEY": "loadtest",
+        "LOADTEST_PROFESSORS": str(args.professors),
+        "LOADTEST_STUDENTS": str(args.students),
+        "LOADTEST_ASSESSMENTS_PER_CLASS": str(args.assessments_per_class),
+        "LOADTEST_DB_LATENCY": str(args.db_latency),
+        "REEVALUATION_INTERVAL_SECONDS": "0",
+    }, workers=args.workers)
+
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        asyncio.run(wait_until_ready(f"http://127.0.0.1:{args.llm_port}/stats"))
+        asyncio.run(wait_until_ready(f"{base_url}/metrics"))
+        result = asyncio.run(drive(args, base_url, backend.pid))
+    finally:
+        stop_server(backend)
+        stop_server(llm)
+
+    print_report(result)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # main.py
 import os
+import asyncio
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
 from fastapi.responses import RedirectResponse, FileResponse
@@ -7,10 +8,16 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.auth import get_current_user
+from backend.app.auth import get_current_user, get_current_user_revalidated
 from backend.app.routes_ai import router as ai_router
-from backend.app.routes import router as main_router
-from backend.app.database import supabase, admin_client
+from backend.app.routes import router as main_router, reevaluation_loop, storage_sweep_loop
+from backend.app.metrics import router as metrics_router
+from backend.app.comment_quality_pool import start_pool, shutdown_pool
+from backend.app.database import supabase, admin_client, execute, run_blocking
+from backend.app.student_index import upsert_student
+from backend.app.user_profiles import get_user_profile, profile_written, forget_profile
+from backend.app.compression import CompressionMiddleware
+from backend.app.upload_limits import UploadLimitMiddleware
 
 
 load_dotenv()
@@ -19,6 +26,11 @@ app = FastAPI()
 security = HTTPBearer()
 app.include_router(ai_router, prefix="/api", tags=["AI Evaluation"])
 app.include_router(main_router, prefix="/api", tags=["Main"])
+app.include_router(metrics_router, tags=["Metrics"])
+
+# Answer uploads over MAX_UPLOAD_BYTES with 413 before reading their body
+# (added before CORS so the 413 still carries the CORS headers)
+app.add_middleware(UploadLimitMiddleware)
 
 # Add CORS middleware - restrict to allowed domains
 app.add_middleware(
@@ -27,11 +39,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor of the next page of the paginated list endpoints, readable by browser clients
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compress responses above COMPRESSION_MINIMUM_BYTES with brotli or gzip, as the client accepts
+app.add_middleware(CompressionMiddleware)
+
 # Frontend URL for redirects (configure in .env)
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5500")
 
+# How often to retry evaluations deferred while the LLM provider was down (0 disables)
+REEVALUATION_INTERVAL_SECONDS = int(os.getenv("REEVALUATION_INTERVAL_SECONDS", "300"))
+
+@app.on_event("startup")
+async def start_reevaluation_loop():
+    if REEVALUATION_INTERVAL_SECONDS > 0:
+        asyncio.create_task(reevaluation_loop(REEVALUATION_INTERVAL_SECONDS))
+
+# How often to remove submission ZIPs that no submission references any more (0 disables)
+STORAGE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL_SECONDS", "3600"))
+
+@app.on_event("startup")
+async def start_storage_sweep_loop():
+    if STORAGE_SWEEP_INTERVAL_SECONDS > 0:
+        asyncio.create_task(storage_sweep_loop(STORAGE_SWEEP_INTERVAL_SECONDS))
+
+@app.on_event("startup")
+async def start_comment_quality_pool():
+    # Spawn the scoring workers and load the model now rather than on the first submission
+    start_pool()
+
+@app.on_event("shutdown")
+async def stop_comment_quality_pool():
+    shutdown_pool()
+
 class SignupIn(BaseModel):
     email: str
     password: str
@@ -53,7 +95,7 @@ async def logout(current_user=Depends(get_current_user)):
 @app.post("/signup")
 async def signup(payload: SignupIn):
     try:
-        auth_response = supabase.auth.sign_up({
+        auth_response = await run_blocking(supabase.auth.sign_up, {
             "email": payload.email,
             "password": payload.password
         })
@@ -67,17 +109,22 @@ async def signup(payload: SignupIn):
     auth_id = user.id
 
     try:
-        insert_response = admin_client.table("users").insert({
+        insert_response = await execute(admin_client.table("users").insert({
             "auth_id": auth_id,
             "email": payload.email,
             "first_name": payload.firstName,
             "last_name": payload.lastName,
             "role": payload.role,
             "university": payload.university
-        }).execute()
+        }))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Make the new student searchable right away
+    if insert_response.data:
+        profile_written(insert_response.data[0])
+        upsert_student(insert_response.data[0])
+
     return {
         "message": "Please check your email to confirm your account",
         "user": {
@@ -90,7 +137,7 @@ async def signup(payload: SignupIn):
 @app.post("/login")
 async def login(payload: LoginIn):
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_blocking(supabase.auth.sign_in_with_password, {
             "email": payload.email,
             "password": payload.password
         })
@@ -102,9 +149,9 @@ async def login(payload: LoginIn):
 
     # Get user role from users table
     try:
-        user_data = admin_client.table("users").select("role").eq("auth_id", user.id).execute()
-        if user_data.data and len(user_data.data) > 0:
-            role = user_data.data[0]["role"]
+        profile = await get_user_profile(user.id)
+        if profile:
+            role = profile["role"]
         else:
             raise HTTPException(status_code=400, detail="User role not found")
     except Exception as e:
@@ -120,9 +167,8 @@ async def login(payload: LoginIn):
 @app.get("/me")
 async def me(current_user=Depends(get_current_user)):
     try:
-        user_data = admin_client.table("users").select("*").eq("auth_id", current_user.id).execute()
-        if user_data.data and len(user_data.data) > 0:
-            user = user_data.data[0]
+        user = await get_user_profile(current_user.id)
+        if user:
             return {
                 "user": {
                     "id": user["auth_id"],
@@ -144,17 +190,19 @@ class UpdateUserIn(BaseModel):
     university: str
 
 @app.put("/me")
-async def update_me(update_data: UpdateUserIn, current_user=Depends(get_current_user)):
+async def update_me(update_data: UpdateUserIn, current_user=Depends(get_current_user_revalidated)):
     try:
         # Update user data in users table
-        update_response = admin_client.table("users").update({
+        update_response = await execute(admin_client.table("users").update({
             "first_name": update_data.first_name,
             "last_name": update_data.last_name,
             "university": update_data.university
-        }).eq("auth_id", current_user.id).execute()
+        }).eq("auth_id", current_user.id))
 
         if update_response.data:
             updated_user = update_response.data[0]
+            profile_written(updated_user)
+            upsert_student(updated_user)
             return {
                 "user": {
                     "id": updated_user["auth_id"],
@@ -166,6 +214,7 @@ async def update_me(update_data: UpdateUserIn, current_user=Depends(get_current_
                 }
             }
         else:
+            forget_profile(current_user.id)
             raise HTTPException(status_code=404, detail="User not found")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -187,23 +236,23 @@ async def confirm_email(
             return RedirectResponse(url=f"{FRONTEND_URL}/login.html?confirmed=true")
 
         # Set the session using the tokens from the confirmation link
-        supabase.auth.set_session({
+        await run_blocking(supabase.auth.set_session, {
             "access_token": access_token,
             "refresh_token": refresh_token
         })
 
         # Verify the user is authenticated and get their data
         try:
-            user = supabase.auth.get_user(access_token)
+            user = await run_blocking(supabase.auth.get_user, access_token)
             user_id = user.user.id if user.user else None
         except Exception:
             return RedirectResponse(url=f"{FRONTEND_URL}/login.html?error=invalid_token")
 
         # Get user data from our database
         try:
-            user_data = admin_client.table("users").select("role").eq("auth_id", user_id).execute()
-            if user_data.data and len(user_data.data) > 0:
-                role = user_data.data[0]["role"]
+            profile = await get_user_profile(user_id)
+            if profile:
+                role = profile["role"]
             else:
                 return RedirectResponse(url=f"{FRONTEND_URL}/login.html?error=user_not_found")
         except Exception:
@@ -0,0 +1,30 @@
+-- Migration: Add needs_reevaluation flag to submissions table
+-- Run this migration in your Supabase SQL Editor
+
+-- Submissions stored while the LLM provider circuit breaker was open are
+-- flagged here and picked up by the periodic re-evaluation job
+DO $$ 
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 
+        FROM information_schema.columns 
+        WHERE table_name = 'submissions' 
+        AND column_name = 'needs_reevaluation'
+    ) THEN
+        ALTER TABLE submissions 
+        ADD COLUMN needs_reevaluation BOOLEAN NOT NULL DEFAULT FALSE;
+        
+        COMMENT ON COLUMN submissions.needs_reevaluation IS 'True when the AI evaluation was skipped because the LLM provider was unavailable';
+    END IF;
+END $$;
+
+-- Partial index so the re-evaluation job only scans flagged rows
+CREATE INDEX IF NOT EXISTS idx_submissions_needs_reevaluation
+    ON submissions (id)
+    WHERE needs_reevaluation;
+
+-- Verify column was added
+SELECT column_name, data_type 
+FROM information_schema.columns 
+WHERE table_name = 'submissions' 
+AND column_name = 'needs_reevaluation';
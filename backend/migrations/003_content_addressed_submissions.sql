@@ -0,0 +1,103 @@
+-- Migration: Content-addressed storage for submission ZIPs
+-- Run this migration in your Supabase SQL Editor
+
+-- One row per distinct ZIP in the submissions bucket, keyed by its SHA-256.
+-- ref_count is maintained by the trigger below and counts the submissions
+-- pointing at the object; unreferenced rows are swept by the backend.
+CREATE TABLE IF NOT EXISTS submission_blobs (
+    sha256 TEXT PRIMARY KEY,
+    storage_path TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    uploaded BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Partial index so the sweep only scans unreferenced rows
+CREATE INDEX IF NOT EXISTS idx_submission_blobs_unreferenced
+    ON submission_blobs (updated_at)
+    WHERE ref_count <= 0;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_name = 'submissions'
+        AND column_name = 'content_sha256'
+    ) THEN
+        ALTER TABLE submissions
+        ADD COLUMN content_sha256 TEXT REFERENCES submission_blobs (sha256);
+
+        COMMENT ON COLUMN submissions.content_sha256 IS 'SHA-256 of the submitted ZIP (NULL for submissions stored before content addressing)';
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_submissions_content_sha256
+    ON submissions (content_sha256);
+
+-- Keep submission_blobs.ref_count in step with the submissions referencing each blob
+CREATE OR REPLACE FUNCTION update_submission_blob_refs()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.content_sha256 IS NOT DISTINCT FROM OLD.content_sha256 THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_sha256 IS NOT NULL THEN
+        UPDATE submission_blobs
+        SET ref_count = ref_count + 1, updated_at = now()
+        WHERE sha256 = NEW.content_sha256;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.content_sha256 IS NOT NULL THEN
+        UPDATE submission_blobs
+        SET ref_count = ref_count - 1, updated_at = now()
+        WHERE sha256 = OLD.content_sha256;
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS submissions_blob_refs ON submissions;
+CREATE TRIGGER submissions_blob_refs
+    AFTER INSERT OR DELETE OR UPDATE OF content_sha256 ON submissions
+    FOR EACH ROW EXECUTE FUNCTION update_submission_blob_refs();
+
+-- Register a ZIP before uploading it. Returns TRUE when the object is already
+-- in storage, so the upload can be skipped. Touching updated_at keeps a blob
+-- that is about to be referenced again out of the sweep's grace period.
+CREATE OR REPLACE FUNCTION register_submission_blob(p_sha256 TEXT, p_storage_path TEXT, p_size_bytes BIGINT)
+RETURNS BOOLEAN
+LANGUAGE sql
+AS $$
+    INSERT INTO submission_blobs (sha256, storage_path, size_bytes)
+    VALUES (p_sha256, p_storage_path, p_size_bytes)
+    ON CONFLICT (sha256) DO UPDATE SET updated_at = now()
+    RETURNING uploaded;
+$$;
+
+-- Delete up to p_limit blobs that have been unreferenced for longer than the
+-- grace period and return their storage paths so the objects can be removed
+CREATE OR REPLACE FUNCTION claim_unreferenced_submission_blobs(p_grace_seconds INTEGER, p_limit INTEGER)
+RETURNS TABLE (storage_path TEXT)
+LANGUAGE sql
+AS $$
+    DELETE FROM submission_blobs
+    WHERE sha256 IN (
+        SELECT sha256
+        FROM submission_blobs
+        WHERE ref_count <= 0
+        AND updated_at < now() - make_interval(secs => p_grace_seconds)
+        ORDER BY updated_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING submission_blobs.storage_path;
+$$;
+
+-- Verify column was added
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'submissions'
+AND column_name = 'content_sha256';
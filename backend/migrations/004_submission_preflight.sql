@@ -0,0 +1,58 @@
+-- Migration: One-round-trip submission preflight and one submission per student and assessment
+-- Run this migration in your Supabase SQL Editor
+
+-- Placeholder rows ('no submission') duplicated by a real submission are redundant
+DELETE FROM submissions AS placeholder
+USING submissions AS other
+WHERE placeholder.status = 'no submission'
+AND placeholder.assessment_id = other.assessment_id
+AND placeholder.student_id = other.student_id
+AND placeholder.id <> other.id
+AND (other.status <> 'no submission' OR other.id > placeholder.id);
+
+-- Enforce one submission per student and assessment. If this fails, the
+-- remaining duplicates are real submissions and must be resolved by hand.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_constraint
+        WHERE conname = 'submissions_assessment_id_student_id_key'
+    ) THEN
+        ALTER TABLE submissions
+        ADD CONSTRAINT submissions_assessment_id_student_id_key UNIQUE (assessment_id, student_id);
+    END IF;
+END $$;
+
+-- Everything submit_assessment checks before accepting an upload, in one call:
+-- the assessment row (NULL if it does not exist), whether the student is
+-- enrolled in its class, and the student's existing submission, if any
+CREATE OR REPLACE FUNCTION submission_preflight(p_assessment_id UUID, p_student_id UUID)
+RETURNS TABLE (
+    assessment JSONB,
+    is_enrolled BOOLEAN,
+    existing_submission_id BIGINT,
+    existing_status TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        to_jsonb(a),
+        EXISTS (
+            SELECT 1
+            FROM class_students cs
+            WHERE cs.class_id = a.class_id
+            AND cs.student_id = p_student_id
+        ),
+        s.id,
+        s.status
+    FROM (SELECT 1) AS one
+    LEFT JOIN assessments a ON a.id = p_assessment_id
+    LEFT JOIN submissions s ON s.assessment_id = p_assessment_id AND s.student_id = p_student_id;
+$$;
+
+-- Verify constraint was added
+SELECT conname
+FROM pg_constraint
+WHERE conname = 'submissions_assessment_id_student_id_key';
@@ -0,0 +1,66 @@
+-- Migration: Database-side aggregation for the professor dashboard
+-- Run this migration in your Supabase SQL Editor
+
+-- Indexes for walking professor -> classes -> assessments -> submissions
+CREATE INDEX IF NOT EXISTS idx_classes_professor_id
+    ON classes (professor_id);
+
+CREATE INDEX IF NOT EXISTS idx_assessments_class_id
+    ON assessments (class_id);
+
+CREATE INDEX IF NOT EXISTS idx_submissions_assessment_created
+    ON submissions (assessment_id, created_at DESC);
+
+-- Submission counts and average final score across all of a professor's
+-- classes. A submission is graded once it is 'reviewed' or 'released'; the
+-- average covers graded submissions with a final score.
+CREATE OR REPLACE FUNCTION professor_dashboard_stats(p_professor_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'total_submissions', count(*),
+        'graded_submissions', count(*) FILTER (WHERE s.status IN ('reviewed', 'released')),
+        'pending_submissions', count(*) FILTER (WHERE s.status IS NULL OR s.status NOT IN ('reviewed', 'released')),
+        'average_score', avg(s.final_score) FILTER (WHERE s.status IN ('reviewed', 'released'))
+    )
+    FROM submissions s
+    JOIN assessments a ON a.id = s.assessment_id
+    JOIN classes c ON c.id = a.class_id
+    WHERE c.professor_id = p_professor_id;
+$$;
+
+-- The professor's p_limit most recent submissions with the student, assessment
+-- and class names the dashboard shows, newest first
+CREATE OR REPLACE FUNCTION professor_recent_submissions(p_professor_id UUID, p_limit INTEGER DEFAULT 5)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT coalesce(jsonb_agg(to_jsonb(recent) ORDER BY recent.created_at DESC), '[]'::jsonb)
+    FROM (
+        SELECT
+            s.id,
+            s.status,
+            s.ai_score,
+            s.final_score,
+            s.created_at,
+            u.first_name,
+            u.last_name,
+            a.title AS assessment_title,
+            c.name AS class_name
+        FROM submissions s
+        JOIN assessments a ON a.id = s.assessment_id
+        JOIN classes c ON c.id = a.class_id
+        JOIN users u ON u.auth_id = s.student_id
+        WHERE c.professor_id = p_professor_id
+        ORDER BY s.created_at DESC
+        LIMIT p_limit
+    ) AS recent;
+$$;
+
+-- Verify functions were added
+SELECT proname
+FROM pg_proc
+WHERE proname IN ('professor_dashboard_stats', 'professor_recent_submissions');
@@ -0,0 +1,90 @@
+-- Migration: Keyset-paginated summary list of an assessment's submissions
+-- Run this migration in your Supabase SQL Editor
+
+-- Keyset index for walking an assessment's submissions newest first
+CREATE INDEX IF NOT EXISTS idx_submissions_assessment_keyset
+    ON submissions (assessment_id, created_at DESC, id DESC);
+
+-- One page of the submission list for an assessment: the summary columns of
+-- each enrolled student's submission (no evaluation text), newest first by
+-- (created_at, id), followed by the enrolled students with no submission row,
+-- ordered by student_id. Pass the last row of the previous page as
+-- p_after_created_at/p_after_id, or p_after_student_id once the page ends in
+-- the students without a submission. p_statuses filters by status, where
+-- 'no submission' also selects the students without a submission row.
+CREATE OR REPLACE FUNCTION assessment_submission_page(
+    p_assessment_id UUID,
+    p_statuses TEXT[] DEFAULT NULL,
+    p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id BIGINT DEFAULT NULL,
+    p_after_student_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 100
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT coalesce(jsonb_agg(to_jsonb(page) - 'sort_group'
+                              ORDER BY page.sort_group, page.created_at DESC, page.id DESC, page.student_id), '[]'::jsonb)
+    FROM (
+        SELECT *
+        FROM (
+            SELECT
+                0 AS sort_group,
+                s.id,
+                s.student_id,
+                s.status,
+                s.ai_score,
+                s.final_score,
+                s.professor_feedback,
+                s.zip_path,
+                s.created_at,
+                u.first_name,
+                u.last_name,
+                u.email
+            FROM assessments a
+            JOIN class_students cs ON cs.class_id = a.class_id
+            JOIN submissions s ON s.assessment_id = a.id AND s.student_id = cs.student_id
+            JOIN users u ON u.auth_id = s.student_id
+            WHERE a.id = p_assessment_id
+            AND (p_statuses IS NULL OR s.status = ANY (p_statuses))
+            AND p_after_student_id IS NULL
+            AND (p_after_id IS NULL OR (s.created_at, s.id) < (p_after_created_at, p_after_id))
+
+            UNION ALL
+
+            SELECT
+                1,
+                NULL,
+                cs.student_id,
+                'no submission',
+                NULL,
+                NULL,
+                NULL,
+                NULL,
+                NULL,
+                u.first_name,
+                u.last_name,
+                u.email
+            FROM assessments a
+            JOIN class_students cs ON cs.class_id = a.class_id
+            JOIN users u ON u.auth_id = cs.student_id
+            WHERE a.id = p_assessment_id
+            AND (p_statuses IS NULL OR 'no submission' = ANY (p_statuses))
+            AND (p_after_student_id IS NULL OR cs.student_id > p_after_student_id)
+            AND NOT EXISTS (
+                SELECT 1
+                FROM submissions s
+                WHERE s.assessment_id = a.id
+                AND s.student_id = cs.student_id
+            )
+        ) AS roster
+        ORDER BY sort_group, created_at DESC, id DESC, student_id
+        LIMIT p_limit
+    ) AS page;
+$$;
+
+-- Verify function was added
+SELECT proname
+FROM pg_proc
+WHERE proname = 'assessment_submission_page';
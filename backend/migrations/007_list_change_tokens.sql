@@ -0,0 +1,85 @@
+-- Migration: Change tokens for conditional GETs of the list endpoints
+-- Run this migration in your Supabase SQL Editor
+
+-- updated_at on every table the lists are built from, kept current by a trigger
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['users', 'classes', 'assessments', 'class_students', 'submissions'] LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()', t);
+    END LOOP;
+END $$;
+
+-- clock_timestamp() rather than now(): the time of the write, not of the start
+-- of its transaction, so a later write never gets an earlier updated_at
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END $$;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['users', 'classes', 'assessments', 'class_students', 'submissions'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_touch_updated_at', t);
+        EXECUTE format('CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION touch_updated_at()',
+                       t || '_touch_updated_at', t);
+    END LOOP;
+END $$;
+
+-- Index for the student side of class_students
+CREATE INDEX IF NOT EXISTS idx_class_students_student_id
+    ON class_students (student_id);
+
+-- A token that changes whenever the rows behind a list change: row counts
+-- (which catch deletes) and the latest updated_at (which catches inserts and
+-- updates) of every table the list reads, within the list's scope.
+--   professor_classes:      p_key is the professor; their classes
+--   professor_assessments:  p_key is the professor; their classes and assessments
+--   student_classes:        p_key is the student; enrollments, classes and assessments
+--   assessment_submissions: p_key is the assessment; enrollments, students and submissions
+CREATE OR REPLACE FUNCTION list_change_token(p_list TEXT, p_key UUID)
+RETURNS TEXT
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    token TEXT;
+BEGIN
+    IF p_list = 'professor_classes' THEN
+        SELECT concat_ws(':', count(*), max(c.updated_at))
+        INTO token
+        FROM classes c
+        WHERE c.professor_id = p_key;
+    ELSIF p_list = 'professor_assessments' THEN
+        SELECT concat_ws(':', count(DISTINCT c.id), max(c.updated_at), count(a.id), max(a.updated_at))
+        INTO token
+        FROM classes c
+        LEFT JOIN assessments a ON a.class_id = c.id
+        WHERE c.professor_id = p_key;
+    ELSIF p_list = 'student_classes' THEN
+        SELECT concat_ws(':', count(DISTINCT cs.id), max(cs.updated_at), max(c.updated_at), count(a.id), max(a.updated_at))
+        INTO token
+        FROM class_students cs
+        JOIN classes c ON c.id = cs.class_id
+        LEFT JOIN assessments a ON a.class_id = c.id
+        WHERE cs.student_id = p_key;
+    ELSIF p_list = 'assessment_submissions' THEN
+        SELECT concat_ws(':', count(cs.id), max(cs.updated_at), max(u.updated_at), count(s.id), max(s.updated_at))
+        INTO token
+        FROM assessments a
+        JOIN class_students cs ON cs.class_id = a.class_id
+        JOIN users u ON u.auth_id = cs.student_id
+        LEFT JOIN submissions s ON s.assessment_id = a.id AND s.student_id = cs.student_id
+        WHERE a.id = p_key;
+    ELSE
+        RAISE EXCEPTION 'Unknown list: %', p_list;
+    END IF;
+    RETURN token;
+END $$;
@@ -0,0 +1,43 @@
+-- Migration: Store evaluation data as jsonb
+-- Run this migration in your Supabase SQL Editor
+
+-- ai_evaluation_data and human_evaluation were TEXT holding JSON, decoded
+-- row by row in the backend. As jsonb they reach the backend already decoded.
+-- Text that is empty or not valid JSON becomes NULL, which the backend
+-- already treated as "no data".
+CREATE OR REPLACE FUNCTION pg_temp.text_to_jsonb(value TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    RETURN nullif(btrim(value), '')::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN NULL;
+END $$;
+
+DO $$
+DECLARE
+    c TEXT;
+BEGIN
+    FOREACH c IN ARRAY ARRAY['ai_evaluation_data', 'human_evaluation'] LOOP
+        IF EXISTS (
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'submissions'
+            AND column_name = c
+            AND data_type = 'text'
+        ) THEN
+            EXECUTE format('ALTER TABLE submissions ALTER COLUMN %I TYPE JSONB USING pg_temp.text_to_jsonb(%I)', c, c);
+        END IF;
+    END LOOP;
+END $$;
+
+COMMENT ON COLUMN submissions.ai_evaluation_data IS 'Full LLM evaluation result, with the comment quality score';
+COMMENT ON COLUMN submissions.human_evaluation IS 'Human evaluation scores (innovation, collaboration, presentation)';
+
+-- Verify the column types
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'submissions'
+AND column_name IN ('ai_evaluation_data', 'human_evaluation');
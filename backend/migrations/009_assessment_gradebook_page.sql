@@ -0,0 +1,51 @@
+-- Migration: Keyset-paginated gradebook of an assessment, for exports
+-- Run this migration in your Supabase SQL Editor
+
+-- Index for walking a class's enrollments
+CREATE INDEX IF NOT EXISTS idx_class_students_class_id
+    ON class_students (class_id);
+
+-- One page of an assessment's gradebook: one row per enrolled student, with
+-- the scores of their submission (NULL scores and status 'no submission'
+-- when they have not submitted), ordered by last name, first name and
+-- student id. Pass the last row of the previous page as p_after_last_name,
+-- p_after_first_name and p_after_student_id (names as returned, NULL as '').
+CREATE OR REPLACE FUNCTION assessment_gradebook_page(
+    p_assessment_id UUID,
+    p_after_last_name TEXT DEFAULT NULL,
+    p_after_first_name TEXT DEFAULT NULL,
+    p_after_student_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT coalesce(jsonb_agg(to_jsonb(page) - 'sort_last_name' - 'sort_first_name'
+                              ORDER BY page.sort_last_name, page.sort_first_name, page.student_id), '[]'::jsonb)
+    FROM (
+        SELECT
+            cs.student_id,
+            u.first_name,
+            u.last_name,
+            u.email,
+            coalesce(u.last_name, '') AS sort_last_name,
+            coalesce(u.first_name, '') AS sort_first_name,
+            coalesce(s.status, 'no submission') AS status,
+            CASE WHEN s.status = 'no submission' THEN NULL ELSE s.created_at END AS submitted_at,
+            s.ai_score,
+            s.adjusted_ai_score,
+            s.human_evaluation,
+            s.final_score
+        FROM assessments a
+        JOIN class_students cs ON cs.class_id = a.class_id
+        JOIN users u ON u.auth_id = cs.student_id
+        LEFT JOIN submissions s ON s.assessment_id = a.id AND s.student_id = cs.student_id
+        WHERE a.id = p_assessment_id
+        AND (p_after_student_id IS NULL
+             OR (coalesce(u.last_name, ''), coalesce(u.first_name, ''), cs.student_id)
+                > (p_after_last_name, p_after_first_name, p_after_student_id))
+        ORDER BY coalesce(u.last_name, ''), coalesce(u.first_name, ''), cs.student_id
+        LIMIT p_limit
+    ) page;
+$$;
@@ -0,0 +1,37 @@
+-- Migration: Grade many submissions of an assessment in one statement
+-- Run this migration in your Supabase SQL Editor
+
+-- Apply a list of grades to submissions of one assessment and mark them
+-- reviewed. p_grades is a JSON array of objects with the submission "id",
+-- "professor_feedback", "final_score" and, optionally, "adjusted_ai_score"
+-- and "human_evaluation" (left unchanged when missing). Submissions that are
+-- not in the assessment are skipped. Returns the ids that were updated.
+CREATE OR REPLACE FUNCTION grade_submissions(p_assessment_id UUID, p_grades JSONB)
+RETURNS JSONB
+LANGUAGE sql
+VOLATILE
+AS $$
+    WITH grades AS (
+        SELECT *
+        FROM jsonb_to_recordset(p_grades) AS g(
+            id BIGINT,
+            professor_feedback TEXT,
+            final_score NUMERIC,
+            adjusted_ai_score NUMERIC,
+            human_evaluation JSONB
+        )
+    ),
+    updated AS (
+        UPDATE submissions s
+        SET professor_feedback = g.professor_feedback,
+            final_score = g.final_score,
+            adjusted_ai_score = coalesce(g.adjusted_ai_score, s.adjusted_ai_score),
+            human_evaluation = coalesce(g.human_evaluation, s.human_evaluation),
+            status = 'reviewed'
+        FROM grades g
+        WHERE s.id = g.id
+        AND s.assessment_id = p_assessment_id
+        RETURNING s.id
+    )
+    SELECT coalesce(jsonb_agg(id), '[]'::jsonb) FROM updated;
+$$;
@@ -0,0 +1,129 @@
+-- Migration: Score distributions of each assessment, kept current by a trigger
+-- Run this migration in your Supabase SQL Editor (after 008: the evaluation columns must be JSONB)
+
+-- Fixed-width histogram bins of the scores of an assessment's submissions, with
+-- the running count, sum and sum of squares of the scores in each bin. Metrics
+-- are ai_score, adjusted_ai_score, final_score, the human evaluation scores
+-- (innovation_score, collaboration_score, presentation_score), and
+-- 'criterion:<name>' for each AI rubric criterion. 'no submission'
+-- placeholders are not counted.
+CREATE TABLE IF NOT EXISTS assessment_score_bins (
+    assessment_id UUID NOT NULL REFERENCES assessments(id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    bin SMALLINT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (assessment_id, metric, bin)
+);
+
+-- Bin of a score: AI scores (0-24) in bins of 1, final scores (0-100) in bins
+-- of 5, human and rubric criterion scores (0-4) in bins of 0.5. The maximum
+-- goes in the last bin. Keep in sync with METRIC_SCALES in backend/app/analytics.py
+CREATE OR REPLACE FUNCTION score_bin(p_metric TEXT, p_value DOUBLE PRECISION)
+RETURNS SMALLINT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT greatest(0, least(floor(p_value / scale.bin_width), scale.bins - 1))::SMALLINT
+    FROM (
+        SELECT
+            CASE WHEN p_metric IN ('ai_score', 'adjusted_ai_score') THEN 1
+                 WHEN p_metric = 'final_score' THEN 5
+                 ELSE 0.5 END AS bin_width,
+            CASE WHEN p_metric IN ('ai_score', 'adjusted_ai_score') THEN 24
+                 WHEN p_metric = 'final_score' THEN 20
+                 ELSE 8 END AS bins
+    ) scale;
+$$;
+
+-- A JSON number as a double, NULL for anything else
+CREATE OR REPLACE FUNCTION jsonb_score(p_value JSONB)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE WHEN jsonb_typeof(p_value) = 'number' THEN (p_value #>> '{}')::DOUBLE PRECISION END;
+$$;
+
+-- The scores of a submission that count towards its assessment's distributions
+CREATE OR REPLACE FUNCTION submission_scores(p_submission submissions)
+RETURNS TABLE (metric TEXT, value DOUBLE PRECISION)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT scores.metric, scores.value
+    FROM (
+        VALUES
+            ('ai_score', p_submission.ai_score::DOUBLE PRECISION),
+            ('adjusted_ai_score', p_submission.adjusted_ai_score::DOUBLE PRECISION),
+            ('final_score', p_submission.final_score::DOUBLE PRECISION),
+            ('innovation_score', jsonb_score(p_submission.human_evaluation -> 'innovation_score')),
+            ('collaboration_score', jsonb_score(p_submission.human_evaluation -> 'collaboration_score')),
+            ('presentation_score', jsonb_score(p_submission.human_evaluation -> 'presentation_score'))
+        UNION ALL
+        SELECT 'criterion:' || criterion.key, jsonb_score(criterion.value)
+        FROM jsonb_each(CASE WHEN jsonb_typeof(p_submission.ai_evaluation_data -> 'evaluation') = 'object'
+                             THEN p_submission.ai_evaluation_data -> 'evaluation'
+                             ELSE '{}'::jsonb END) AS criterion
+    ) AS scores (metric, value)
+    WHERE scores.value IS NOT NULL
+    AND p_submission.status IS DISTINCT FROM 'no submission';
+$$;
+
+-- Take the old scores of a row out of their bins and add the new ones. Only
+-- existing bins are decremented, so the submissions deleted along with an
+-- assessment do not recreate its bins.
+CREATE OR REPLACE FUNCTION track_submission_scores()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE assessment_score_bins b
+        SET count = b.count - 1,
+            total = b.total - s.value,
+            total_sq = b.total_sq - s.value * s.value
+        FROM submission_scores(OLD) s
+        WHERE b.assessment_id = OLD.assessment_id
+        AND b.metric = s.metric
+        AND b.bin = score_bin(s.metric, s.value);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO assessment_score_bins AS b (assessment_id, metric, bin, count, total, total_sq)
+        SELECT NEW.assessment_id, s.metric, score_bin(s.metric, s.value), 1, s.value, s.value * s.value
+        FROM submission_scores(NEW) s
+        ON CONFLICT (assessment_id, metric, bin) DO UPDATE
+        SET count = b.count + 1,
+            total = b.total + EXCLUDED.total,
+            total_sq = b.total_sq + EXCLUDED.total_sq;
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS submissions_track_scores ON submissions;
+CREATE TRIGGER submissions_track_scores
+    AFTER INSERT OR DELETE
+    OR UPDATE OF assessment_id, status, ai_score, adjusted_ai_score, final_score, human_evaluation, ai_evaluation_data
+    ON submissions
+    FOR EACH ROW EXECUTE FUNCTION track_submission_scores();
+
+-- Replace all bins of an assessment with recomputed ones (the analytics
+-- rebuild), in one transaction. p_bins is a JSON array of objects with
+-- "metric", "bin", "count", "total" and "total_sq".
+CREATE OR REPLACE FUNCTION replace_assessment_score_bins(p_assessment_id UUID, p_bins JSONB)
+RETURNS VOID
+LANGUAGE sql
+VOLATILE
+AS $$
+    DELETE FROM assessment_score_bins WHERE assessment_id = p_assessment_id;
+    INSERT INTO assessment_score_bins (assessment_id, metric, bin, count, total, total_sq)
+    SELECT p_assessment_id, b.metric, b.bin, b.count, b.total, b.total_sq
+    FROM jsonb_to_recordset(p_bins) AS b (
+        metric TEXT,
+        bin SMALLINT,
+        count BIGINT,
+        total DOUBLE PRECISION,
+        total_sq DOUBLE PRECISION
+    );
+$$;
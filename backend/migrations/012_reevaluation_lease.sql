@@ -0,0 +1,37 @@
+-- Migration: Lease-based claims for the deferred re-evaluation job
+-- Run this migration in your Supabase SQL Editor
+
+-- When a worker claimed the submission for re-evaluation. needs_reevaluation
+-- stays set until the evaluation is stored, so a worker that dies mid-way
+-- only holds the row until its lease expires.
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS reevaluation_claimed_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN submissions.reevaluation_claimed_at IS 'When a re-evaluation worker claimed the submission; NULL when unclaimed';
+
+-- Failed re-evaluations; the backend stops retrying after REEVALUATION_MAX_ATTEMPTS
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS reevaluation_attempts INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN submissions.reevaluation_attempts IS 'Failed re-evaluations of the deferred submission';
+
+-- Claim up to p_limit flagged submissions that are unclaimed or whose lease
+-- (p_lease_seconds) has expired, and return them with the evaluation data
+-- stored so far (the comment quality score) and their failed attempts
+DROP FUNCTION IF EXISTS claim_deferred_submissions(INTEGER, INTEGER);
+CREATE FUNCTION claim_deferred_submissions(p_lease_seconds INTEGER, p_limit INTEGER)
+RETURNS TABLE (id BIGINT, zip_path TEXT, ai_evaluation_data JSONB, reevaluation_attempts INTEGER)
+LANGUAGE sql
+AS $$
+    UPDATE submissions
+    SET reevaluation_claimed_at = now()
+    WHERE submissions.id IN (
+        SELECT s.id
+        FROM submissions s
+        WHERE s.needs_reevaluation
+        AND (s.reevaluation_claimed_at IS NULL
+             OR s.reevaluation_claimed_at < now() - make_interval(secs => p_lease_seconds))
+        ORDER BY s.id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING submissions.id, submissions.zip_path, submissions.ai_evaluation_data, submissions.reevaluation_attempts;
+$$;
@@ -0,0 +1,40 @@
+-- Migration: Keep the submission ZIP sweep from removing re-referenced blobs
+-- Run this migration in your Supabase SQL Editor (after 003)
+
+-- Delete up to p_limit blobs that have been unreferenced for longer than the
+-- grace period and return the storage paths of the rows actually deleted. The
+-- reference count and grace period are checked again on the row being
+-- deleted, so a blob registered or referenced since the candidates were
+-- picked is kept.
+CREATE OR REPLACE FUNCTION claim_unreferenced_submission_blobs(p_grace_seconds INTEGER, p_limit INTEGER)
+RETURNS TABLE (storage_path TEXT)
+LANGUAGE sql
+AS $$
+    DELETE FROM submission_blobs
+    WHERE sha256 IN (
+        SELECT sha256
+        FROM submission_blobs
+        WHERE ref_count <= 0
+        AND updated_at < now() - make_interval(secs => p_grace_seconds)
+        ORDER BY updated_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    AND ref_count <= 0
+    AND updated_at < now() - make_interval(secs => p_grace_seconds)
+    RETURNING submission_blobs.storage_path;
+$$;
+
+-- register_submission_blob that also returns the path the blob is stored
+-- under. p_storage_path is only used for a new row: when the sweep deleted the
+-- blob the row is recreated under the new (unique) path, so the sweep removing
+-- the old object cannot remove the new one.
+CREATE OR REPLACE FUNCTION register_submission_blob_path(p_sha256 TEXT, p_storage_path TEXT, p_size_bytes BIGINT)
+RETURNS TABLE (uploaded BOOLEAN, storage_path TEXT)
+LANGUAGE sql
+AS $$
+    INSERT INTO submission_blobs AS b (sha256, storage_path, size_bytes)
+    VALUES (p_sha256, p_storage_path, p_size_bytes)
+    ON CONFLICT (sha256) DO UPDATE SET updated_at = now()
+    RETURNING b.uploaded, b.storage_path;
+$$;
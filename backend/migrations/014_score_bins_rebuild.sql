@@ -0,0 +1,123 @@
+-- Migration: Rebuild an assessment's score bins without losing concurrent writes
+-- Run this migration in your Supabase SQL Editor (after 011)
+
+-- The backend rebuilds an assessment's bins by reading its submissions page by
+-- page and binning them with NumPy, across several requests. To keep writes
+-- that land meanwhile, a rebuild is started with begin_assessment_score_rebuild,
+-- which returns the number of score writes counted for the assessment, and
+-- ended with finish_assessment_score_rebuild, which only replaces the bins if
+-- no write was counted since. Otherwise the rebuild starts over.
+
+-- Assessments being rebuilt, with the number of writes to their submissions'
+-- scores while a rebuild was running
+CREATE TABLE IF NOT EXISTS assessment_score_rebuilds (
+    assessment_id UUID PRIMARY KEY REFERENCES assessments(id) ON DELETE CASCADE,
+    writes BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Advisory lock key of an assessment's score bins. Score writes hold it shared
+-- until they commit; starting a rebuild takes it exclusively.
+CREATE OR REPLACE FUNCTION score_bins_lock_key(p_assessment_id UUID)
+RETURNS BIGINT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT hashtextextended('assessment_score_bins:' || p_assessment_id::TEXT, 0);
+$$;
+
+-- Count a score write to an assessment: a no-op unless it is being rebuilt
+CREATE OR REPLACE FUNCTION count_score_write(p_assessment_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(score_bins_lock_key(p_assessment_id));
+    UPDATE assessment_score_rebuilds SET writes = writes + 1 WHERE assessment_id = p_assessment_id;
+END $$;
+
+-- The trigger function of migration 011, counting each write before it moves
+-- the row's scores between bins
+CREATE OR REPLACE FUNCTION track_submission_scores()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM count_score_write(OLD.assessment_id);
+        UPDATE assessment_score_bins b
+        SET count = b.count - 1,
+            total = b.total - s.value,
+            total_sq = b.total_sq - s.value * s.value
+        FROM submission_scores(OLD) s
+        WHERE b.assessment_id = OLD.assessment_id
+        AND b.metric = s.metric
+        AND b.bin = score_bin(s.metric, s.value);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF TG_OP = 'INSERT' OR NEW.assessment_id IS DISTINCT FROM OLD.assessment_id THEN
+            PERFORM count_score_write(NEW.assessment_id);
+        END IF;
+        INSERT INTO assessment_score_bins AS b (assessment_id, metric, bin, count, total, total_sq)
+        SELECT NEW.assessment_id, s.metric, score_bin(s.metric, s.value), 1, s.value, s.value * s.value
+        FROM submission_scores(NEW) s
+        ON CONFLICT (assessment_id, metric, bin) DO UPDATE
+        SET count = b.count + 1,
+            total = b.total + EXCLUDED.total,
+            total_sq = b.total_sq + EXCLUDED.total_sq;
+    END IF;
+    RETURN NULL;
+END $$;
+
+-- Start rebuilding an assessment's bins and return its write count. Waits for
+-- the transactions writing its scores to commit, so the rebuild's reads see
+-- every write that was not counted.
+CREATE OR REPLACE FUNCTION begin_assessment_score_rebuild(p_assessment_id UUID)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_writes BIGINT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(score_bins_lock_key(p_assessment_id));
+    INSERT INTO assessment_score_rebuilds AS r (assessment_id)
+    VALUES (p_assessment_id)
+    ON CONFLICT (assessment_id) DO UPDATE SET started_at = now()
+    RETURNING r.writes INTO v_writes;
+    RETURN v_writes;
+END $$;
+
+-- Replace all bins of an assessment with the rebuilt ones if its write count
+-- is still p_writes, and end the rebuild. Returns FALSE, changing nothing, if
+-- a score was written since begin_assessment_score_rebuild. p_bins is a JSON
+-- array of objects with "metric", "bin", "count", "total" and "total_sq".
+CREATE OR REPLACE FUNCTION finish_assessment_score_rebuild(p_assessment_id UUID, p_bins JSONB, p_writes BIGINT)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Waits for a writer holding the row; writers arriving later wait for this
+    -- transaction and then apply their scores to the new bins
+    DELETE FROM assessment_score_rebuilds
+    WHERE assessment_id = p_assessment_id
+    AND writes = p_writes;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    DELETE FROM assessment_score_bins WHERE assessment_id = p_assessment_id;
+    INSERT INTO assessment_score_bins (assessment_id, metric, bin, count, total, total_sq)
+    SELECT p_assessment_id, b.metric, b.bin, b.count, b.total, b.total_sq
+    FROM jsonb_to_recordset(p_bins) AS b (
+        metric TEXT,
+        bin SMALLINT,
+        count BIGINT,
+        total DOUBLE PRECISION,
+        total_sq DOUBLE PRECISION
+    );
+    RETURN TRUE;
+END $$;
+
+-- Replaced by begin/finish_assessment_score_rebuild: it could overwrite the
+-- bins with a result that missed concurrent writes
+DROP FUNCTION IF EXISTS replace_assessment_score_bins(UUID, JSONB);
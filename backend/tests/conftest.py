@@ -0,0 +1,12 @@
+"""Shared test setup.
+
+backend.app.database creates its Supabase clients at import time, so the
+settings it reads must exist before any app module is imported. The tests
+never reach Supabase: calls that would are stubbed.
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
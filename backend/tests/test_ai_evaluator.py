@@ -0,0 +1,26 @@
+"""Project statistics gathered for the Claude evaluation."""
+
+from backend.app.ai_evaluator import collect_project_stats
+
+
+def test_collect_project_stats_counts_files_by_language(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "main.py").write_text("import os\nprint(os.getcwd())\n")
+    (tmp_path / "README.md").write_text("# Project\n")
+    (tmp_path / "notes.txt").write_text("not analyzed\n")
+
+    stats = collect_project_stats(str(tmp_path))
+
+    assert stats.file_count == 2
+    assert stats.lines_by_language == {"Python": 3, "Markdown": 2}
+
+
+def test_collect_project_stats_handles_files_named_only_an_extension(tmp_path):
+    # os.path.splitext(".py") has no extension; these used to raise KeyError
+    (tmp_path / ".py").write_text("x = 1\n")
+    (tmp_path / ".md").write_text("notes\n")
+
+    stats = collect_project_stats(str(tmp_path))
+
+    assert stats.file_count == 2
+    assert stats.lines_by_language == {"Python": 2, "Markdown": 2}
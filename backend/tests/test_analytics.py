@@ -0,0 +1,126 @@
+"""Score binning, the summaries computed from the bins, and the rebuild."""
+
+import asyncio
+import json
+
+import pytest
+
+from backend.app import analytics
+from backend.loadtest import fake_supabase
+from backend.loadtest.fake_supabase import FakeSupabase
+
+
+def bins_of(metric: str, scores) -> dict:
+    """The bins of one metric, keyed by bin, as summarize() groups them."""
+    submissions = [{"status": "graded", metric: score} for score in scores]
+    return {row["bin"]: row for row in analytics.compute_bins(submissions)}
+
+
+def test_maximum_scores_go_in_the_last_bin():
+    assert list(bins_of("ai_score", [24])) == [23]
+    assert list(bins_of("final_score", [100])) == [19]
+    assert list(bins_of("final_score", [-1, 0, 4.99])) == [0]
+    assert bins_of("final_score", [-1, 0, 4.99])[0]["count"] == 3
+
+
+def test_bins_keep_count_sum_and_sum_of_squares():
+    row = bins_of("final_score", [10, 12, 14.5])[2]
+    assert row["count"] == 3
+    assert row["total"] == pytest.approx(36.5)
+    assert row["total_sq"] == pytest.approx(100 + 144 + 14.5 * 14.5)
+
+
+def test_average_and_std_dev_are_exact():
+    summary = analytics.metric_summary("final_score", bins_of("final_score", [2, 4, 4, 4, 5, 5, 7, 9]))
+    assert summary["count"] == 8
+    assert summary["average"] == 5.0
+    assert summary["std_dev"] == 2.0
+
+
+def test_median_is_interpolated_within_its_bin():
+    # Half of the 4 scores is reached 2/3 of the way through bin 2 (10-15)
+    summary = analytics.metric_summary("final_score", bins_of("final_score", [10, 12, 14, 16]))
+    assert summary["median"] == round((2 + 2 / 3) * 5, 2)
+
+    # With the lower half filling bins exactly, the median is the bin boundary
+    summary = analytics.metric_summary("ai_score", bins_of("ai_score", [3, 3, 7, 7]))
+    assert summary["median"] == 4.0
+
+
+def test_histogram_covers_every_bin():
+    summary = analytics.metric_summary("final_score", bins_of("final_score", [100]))
+    assert len(summary["histogram"]) == 20
+    assert summary["histogram"][-1] == {"from": 95.0, "to": 100.0, "count": 1}
+
+
+def test_metric_without_scores():
+    summary = analytics.metric_summary("final_score", {})
+    assert summary["count"] == 0
+    assert summary["average"] is None and summary["median"] is None and summary["std_dev"] is None
+
+
+def test_submission_scores_skip_placeholders_and_non_numbers():
+    submission = {
+        "status": "graded",
+        "ai_score": 20,
+        "final_score": None,
+        # TEXT columns before migration 008
+        "human_evaluation": json.dumps({"innovation_score": 3, "collaboration_score": True}),
+        "ai_evaluation_data": json.dumps({"evaluation": {"design": 2.5, "notes": "n/a"}}),
+    }
+    assert list(analytics.submission_scores(submission)) == [
+        ("ai_score", 20.0), ("innovation_score", 3.0), ("criterion:design", 2.5)]
+    assert list(analytics.submission_scores({**submission, "status": "no submission"})) == []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeSupabase()
+    client.load({"submissions": [
+        {"id": i, "assessment_id": "assessment-1", "status": "graded", "final_score": score}
+        for i, score in enumerate([40, 60, 80, 100])
+    ]})
+    monkeypatch.setattr(analytics, "admin_client", client)
+    return client
+
+
+def stored_summary(client) -> dict:
+    return analytics.summarize(client.tables["assessment_score_bins"])["scores"]["final_score"]
+
+
+def test_rebuild_replaces_the_bins(client):
+    client.tables["assessment_score_bins"] = [
+        {"assessment_id": "assessment-1", "metric": "final_score", "bin": 0, "count": 7, "total": 0, "total_sq": 0}]
+    assert asyncio.run(analytics.rebuild_assessment_analytics("assessment-1")) == 4
+    summary = stored_summary(client)
+    assert summary["count"] == 4
+    assert summary["average"] == 70.0
+    assert client.tables["assessment_score_rebuilds"] == []
+
+
+def test_rebuild_starts_over_when_scores_change(client):
+    begin = fake_supabase.begin_assessment_score_rebuild
+    begun = []
+
+    def begin_then_grade(client, p_assessment_id):
+        writes = begin(client, p_assessment_id)
+        if not begun:
+            # A grade lands while the first rebuild reads the submissions
+            client.tables["submissions"][0]["final_score"] = 0
+            client.tables["assessment_score_rebuilds"][0]["writes"] += 1
+        begun.append(writes)
+        return writes
+
+    client.register_function("begin_assessment_score_rebuild", begin_then_grade)
+    asyncio.run(analytics.rebuild_assessment_analytics("assessment-1"))
+    assert begun == [0, 1]
+    assert stored_summary(client)["average"] == 60.0
+
+
+def test_rebuild_gives_up_while_scores_keep_changing(client):
+    def finish(client, **params):
+        return False
+
+    client.register_function("finish_assessment_score_rebuild", finish)
+    with pytest.raises(RuntimeError):
+        asyncio.run(analytics.rebuild_assessment_analytics("assessment-1"))
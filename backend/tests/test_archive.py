@@ -0,0 +1,198 @@
+"""Archive limits, safe extraction and streaming uploads to disk."""
+
+import asyncio
+import hashlib
+import io
+import os
+import stat
+import struct
+import threading
+import zipfile
+
+import pytest
+
+from backend.common import archive
+from backend.common.archive import (ArchiveError, ArchiveLimitError, ArchiveLimits, check_archive, open_archive,
+                                    safe_extract_all, save_upload, validate_archive)
+
+
+def make_zip(tmp_path, members: dict, name: str = "project.zip") -> str:
+    """Write a deflated ZIP of members (name -> bytes or str, or a ZipInfo -> content)."""
+    zip_path = str(tmp_path / name)
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for member, content in members.items():
+            zip_file.writestr(member, content)
+    return zip_path
+
+
+def check(zip_path: str, **limits):
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        check_archive(zip_ref, ArchiveLimits(**limits))
+
+
+def test_archive_within_the_limits_passes(tmp_path):
+    zip_path = make_zip(tmp_path, {"src/app.py": "print('hello')\n", "README.md": "# Project\n"})
+    validate_archive(zip_path)
+
+
+def test_invalid_zip_is_rejected(tmp_path):
+    path = tmp_path / "project.zip"
+    path.write_bytes(b"not a zip file")
+    with pytest.raises(ArchiveError) as error:
+        validate_archive(str(path))
+    assert error.value.status_code == 400
+
+
+def test_too_many_entries_are_rejected(tmp_path):
+    zip_path = make_zip(tmp_path, {f"file_{i}.py": "x = 1\n" for i in range(4)})
+    check(zip_path, max_entries=4)
+    with pytest.raises(ArchiveLimitError) as error:
+        check(zip_path, max_entries=3)
+    assert error.value.status_code == 413
+
+
+def test_total_uncompressed_size_is_limited(tmp_path):
+    zip_path = make_zip(tmp_path, {"a.py": "a" * 60, "b.py": "b" * 60})
+    check(zip_path, max_total_bytes=120)
+    with pytest.raises(ArchiveLimitError):
+        check(zip_path, max_total_bytes=100)
+
+
+def test_highly_compressed_entry_is_rejected(tmp_path):
+    zip_path = make_zip(tmp_path, {"padding.txt": b"\0" * 100_000})
+    # Small entries are exempt from the ratio check
+    check(zip_path, max_entry_ratio=10, ratio_min_bytes=200_000)
+    with pytest.raises(ArchiveLimitError) as error:
+        check(zip_path, max_entry_ratio=10, ratio_min_bytes=1000)
+    assert "compression ratio" in str(error.value)
+
+
+def test_deeply_nested_entry_is_rejected(tmp_path):
+    zip_path = make_zip(tmp_path, {"a/b/c/d.py": "x = 1\n"})
+    check(zip_path, max_path_depth=4)
+    with pytest.raises(ArchiveLimitError):
+        check(zip_path, max_path_depth=3)
+
+
+def test_nested_archives_are_limited(tmp_path):
+    zip_path = make_zip(tmp_path, {"deps/a.zip": b"PK", "deps/b.JAR": b"PK", "src/app.py": "x = 1\n"})
+    check(zip_path, max_nested_archives=2)
+    with pytest.raises(ArchiveLimitError):
+        check(zip_path, max_nested_archives=1)
+
+
+@pytest.mark.parametrize("name", ["../evil.py", "src/../../evil.py", "..\\evil.py"])
+def test_parent_directory_paths_are_rejected(tmp_path, name):
+    zip_path = make_zip(tmp_path, {name: "x = 1\n"})
+    with pytest.raises(ArchiveError) as error:
+        validate_archive(zip_path)
+    assert not isinstance(error.value, ArchiveLimitError)
+    assert "unsafe path" in str(error.value)
+
+
+def test_limits_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("ARCHIVE_MAX_ENTRIES", "10")
+    monkeypatch.setenv("ARCHIVE_MAX_ENTRY_RATIO", "12.5")
+    limits = ArchiveLimits.from_env()
+    assert limits.max_entries == 10
+    assert limits.max_entry_ratio == 12.5
+    assert limits.max_path_depth == ArchiveLimits().max_path_depth
+
+
+def test_extraction_writes_the_files(tmp_path):
+    zip_path = make_zip(tmp_path, {"src/": "", "src/app.py": "print('hello')\n"})
+    output_dir = tmp_path / "out"
+    with open_archive(zip_path) as zip_ref:
+        safe_extract_all(zip_ref, str(output_dir))
+    assert (output_dir / "src" / "app.py").read_text() == "print('hello')\n"
+
+
+def test_extraction_skips_symlinks(tmp_path):
+    link = zipfile.ZipInfo("src/passwd")
+    link.external_attr = (stat.S_IFLNK | 0o777) << 16
+    zip_path = make_zip(tmp_path, {link: "/etc/passwd", "src/app.py": "x = 1\n"})
+    output_dir = tmp_path / "out"
+    with open_archive(zip_path) as zip_ref:
+        safe_extract_all(zip_ref, str(output_dir))
+    assert not os.path.lexists(output_dir / "src" / "passwd")
+    assert (output_dir / "src" / "app.py").exists()
+
+
+def test_extraction_counts_the_bytes_written(tmp_path):
+    # Checked against one limit, extracted under a lower one: the written total trips it
+    zip_path = make_zip(tmp_path, {"a.txt": "a" * 100_000, "b.txt": "b" * 100_000})
+    output_dir = tmp_path / "out"
+    with open_archive(zip_path) as zip_ref:
+        with pytest.raises(ArchiveLimitError):
+            safe_extract_all(zip_ref, str(output_dir), ArchiveLimits(max_total_bytes=150_000))
+    written = sum(path.stat().st_size for path in output_dir.iterdir())
+    assert written <= 150_000
+
+
+def test_under_declared_entry_is_rejected(tmp_path):
+    zip_path = make_zip(tmp_path, {"bomb.txt": b"x" * 500_000})
+    # Declare 100 bytes in both the local header and the central directory
+    data = bytearray(open(zip_path, "rb").read())
+    struct.pack_into("<I", data, 22, 100)
+    struct.pack_into("<I", data, data.find(b"PK\x01\x02") + 24, 100)
+    with open(zip_path, "wb") as out:
+        out.write(data)
+
+    output_dir = tmp_path / "out"
+    with open_archive(zip_path) as zip_ref:
+        with pytest.raises(ArchiveError) as error:
+            safe_extract_all(zip_ref, str(output_dir))
+    assert "corrupt" in str(error.value)
+    assert (output_dir / "bomb.txt").stat().st_size <= 100
+
+
+class Upload:
+    """Stands in for FastAPI's UploadFile."""
+
+    def __init__(self, content: bytes, size=None):
+        self.stream = io.BytesIO(content)
+        self.size = size
+        self.reads = 0
+
+    async def read(self, size: int) -> bytes:
+        self.reads += 1
+        return self.stream.read(size)
+
+
+def test_upload_is_streamed_and_hashed(tmp_path):
+    content = os.urandom(600 * 1024)
+    destination = str(tmp_path / "upload.zip")
+    upload = Upload(content)
+    digest, size = asyncio.run(save_upload(upload, destination))
+    assert (digest, size) == (hashlib.sha256(content).hexdigest(), len(content))
+    assert open(destination, "rb").read() == content
+    # Read in chunks, plus the empty read at the end
+    assert upload.reads == 4
+
+
+def test_upload_with_a_known_size_over_the_limit_is_not_read(tmp_path):
+    upload = Upload(b"x" * 2048, size=2048)
+    with pytest.raises(ArchiveLimitError):
+        asyncio.run(save_upload(upload, str(tmp_path / "upload.zip"), max_bytes=1024))
+    assert upload.reads == 0
+
+
+def test_streamed_upload_over_the_limit_is_rejected(tmp_path):
+    # Chunked uploads have no size until they have been read
+    upload = Upload(b"x" * (300 * 1024))
+    with pytest.raises(ArchiveLimitError):
+        asyncio.run(save_upload(upload, str(tmp_path / "upload.zip"), max_bytes=256 * 1024))
+
+
+def test_upload_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    loop_thread = threading.get_ident()
+    writer_threads = set()
+
+    class File(io.FileIO):
+        def write(self, data):
+            writer_threads.add(threading.get_ident())
+            return super().write(data)
+
+    monkeypatch.setattr(archive, "open", File, raising=False)
+    asyncio.run(save_upload(Upload(b"x" * 1024), str(tmp_path / "upload.zip")))
+    assert writer_threads and loop_thread not in writer_threads
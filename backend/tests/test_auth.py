@@ -0,0 +1,213 @@
+"""Local verification of Supabase access tokens, the JWKS and remote fallbacks, and the token cache."""
+
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import HTTPException
+from fastapi.security.http import HTTPAuthorizationCredentials
+from jose import JWTError, jwk, jwt
+
+from backend.app import auth
+
+SECRET = "test-jwt-secret"
+
+
+@pytest.fixture(autouse=True)
+def local_auth(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_VERIFICATION", "local")
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "_verified_tokens", type(auth._verified_tokens)())
+    monkeypatch.setattr(auth, "jwks_cache", auth.JWKSCache("https://project.test/jwks", 600))
+
+
+def claims(**overrides) -> dict:
+    now = int(time.time())
+    values = {
+        "sub": "user-1",
+        "email": "student@example.edu",
+        "role": "authenticated",
+        "aud": auth.JWT_AUDIENCE,
+        "iss": auth.JWT_ISSUER,
+        "iat": now,
+        "exp": now + 3600,
+    }
+    values.update(overrides)
+    return values
+
+
+def hs256_token(key: str = SECRET, **overrides) -> str:
+    return jwt.encode(claims(**overrides), key, algorithm="HS256")
+
+
+def authenticate(token: str):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(auth.get_current_user(credentials))
+
+
+def rejected(token: str) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        authenticate(token)
+    assert error.value.status_code == 401
+    return error.value
+
+
+class StubRemoteAuth:
+    """Stands in for the Supabase client's auth.get_user."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.calls = 0
+        self.auth = self
+
+    def get_user(self, token: str):
+        self.calls += 1
+        return SimpleNamespace(user=self.user)
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    stub = StubRemoteAuth(SimpleNamespace(id="remote-user"))
+    monkeypatch.setattr(auth, "supabase", stub)
+    return stub
+
+
+def test_valid_token_is_verified_locally(remote):
+    user = authenticate(hs256_token())
+    assert user.id == "user-1"
+    assert user.email == "student@example.edu"
+    assert remote.calls == 0
+
+
+def test_expired_token_is_rejected():
+    now = int(time.time())
+    rejected(hs256_token(iat=now - 7200, exp=now - 3600))
+
+
+def test_wrong_audience_is_rejected():
+    rejected(hs256_token(aud="service_role"))
+
+
+def test_wrong_issuer_is_rejected():
+    rejected(hs256_token(iss="https://other-project.supabase.co/auth/v1"))
+
+
+def test_forged_signature_is_rejected():
+    rejected(hs256_token(key="not-the-secret"))
+
+
+def test_unsigned_token_is_rejected(remote):
+    # alg "none" with the claims of a valid token and no signature
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "none", "typ": "JWT"}).encode()).rstrip(b"=").decode()
+    payload = hs256_token().split(".")[1]
+    rejected(f"{header}.{payload}.")
+    assert remote.calls == 0
+
+
+def test_unsupported_algorithm_is_rejected(remote):
+    rejected(jwt.encode(claims(), SECRET, algorithm="HS512"))
+    assert remote.calls == 0
+
+
+class SigningKey:
+    """An ES256 key pair with its public JWK."""
+
+    def __init__(self, kid: str):
+        self.kid = kid
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        self.pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                             serialization.NoEncryption())
+        public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                           serialization.PublicFormat.SubjectPublicKeyInfo)
+        self.jwk = dict(jwk.construct(public_pem, "ES256").to_dict(), kid=kid)
+
+    def sign(self, **overrides) -> str:
+        return jwt.encode(claims(**overrides), self.pem, algorithm="ES256", headers={"kid": self.kid})
+
+
+class StubJWKS:
+    """Stands in for requests.get on the JWKS URL."""
+
+    def __init__(self, *keys: SigningKey):
+        self.keys = list(keys)
+        self.calls = 0
+
+    def __call__(self, url, timeout):
+        self.calls += 1
+        keys = [key.jwk for key in self.keys]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"keys": keys})
+
+
+def test_asymmetric_token_is_verified_against_the_jwks(monkeypatch):
+    key = SigningKey("key-1")
+    jwks = StubJWKS(key)
+    monkeypatch.setattr(auth.requests, "get", jwks)
+    assert authenticate(key.sign()).id == "user-1"
+    assert authenticate(key.sign(sub="user-2")).id == "user-2"
+    assert jwks.calls == 1
+
+
+def test_unknown_key_id_refetches_the_jwks(monkeypatch):
+    old_key, new_key = SigningKey("key-1"), SigningKey("key-2")
+    jwks = StubJWKS(old_key)
+    monkeypatch.setattr(auth.requests, "get", jwks)
+    authenticate(old_key.sign())
+
+    # The project rotated its signing key; the refetch is rate limited to once a minute
+    jwks.keys.append(new_key)
+    auth.jwks_cache.fetched_at -= 61
+    assert authenticate(new_key.sign()).id == "user-1"
+    assert jwks.calls == 2
+
+
+def test_unknown_key_id_falls_back_to_remote_verification(monkeypatch, remote):
+    jwks = StubJWKS(SigningKey("key-1"))
+    monkeypatch.setattr(auth.requests, "get", jwks)
+    assert authenticate(SigningKey("key-3").sign()).id == "remote-user"
+    assert remote.calls == 1
+
+
+def test_without_jwt_secret_tokens_are_verified_remotely(monkeypatch, remote):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", None)
+    assert authenticate(hs256_token()).id == "remote-user"
+    assert remote.calls == 1
+
+
+def test_remote_verification_rejects_unknown_sessions(monkeypatch, remote):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", None)
+    remote.user = None
+    rejected(hs256_token())
+
+
+def test_verified_tokens_are_cached(monkeypatch):
+    token = hs256_token()
+    authenticate(token)
+
+    def decode(*args, **kwargs):
+        raise AssertionError("a cached token must not be decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", decode)
+    assert authenticate(token).id == "user-1"
+
+
+def test_cache_never_outlives_the_token(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_CACHE_SECONDS", 60)
+    token = hs256_token(exp=int(time.time()) + 5)
+    authenticate(token)
+    expires_at, _ = auth._verified_tokens[token]
+    assert expires_at - time.monotonic() <= 5
+
+    # Once the entry is stale the token is verified again, and now rejected as expired
+    auth._verified_tokens[token] = (time.monotonic() - 1, auth._verified_tokens[token][1])
+
+    def decode(*args, **kwargs):
+        raise JWTError("Signature has expired.")
+
+    monkeypatch.setattr(auth.jwt, "decode", decode)
+    rejected(token)
+    assert token not in auth._verified_tokens
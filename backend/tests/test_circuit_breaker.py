@@ -0,0 +1,274 @@
+"""Circuit breaker state machine, alone and guarding the LLM provider calls."""
+
+import asyncio
+
+import pytest
+import requests
+
+from backend.app import routes_ai
+from backend.app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_breaker(clock, **kwargs) -> CircuitBreaker:
+    settings = dict(window_seconds=60, min_calls=4, failure_rate_threshold=0.5, slow_call_seconds=10,
+                    slow_call_rate_threshold=0.5, open_seconds=30, half_open_probes=1)
+    settings.update(kwargs)
+    return CircuitBreaker("test", clock=clock, **settings)
+
+
+def call(breaker: CircuitBreaker, failed: bool = False, latency: float = 0.1):
+    breaker.before_call()
+    if failed:
+        breaker.record_failure(latency)
+    else:
+        breaker.record_success(latency)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker(FakeClock())
+    for _ in range(3):
+        call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate():
+    breaker = make_breaker(FakeClock())
+    call(breaker)
+    call(breaker)
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_failure_rate():
+    breaker = make_breaker(FakeClock())
+    for failed in (False, False, False, True, False, True, False):
+        call(breaker, failed=failed)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_slow_call_rate():
+    breaker = make_breaker(FakeClock())
+    call(breaker, latency=1)
+    call(breaker, latency=1)
+    call(breaker, latency=12)
+    assert breaker.state == CLOSED
+    call(breaker, latency=12)
+    assert breaker.state == OPEN
+
+
+def test_calls_outside_window_are_forgotten():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        call(breaker, failed=True)
+    clock.advance(61)
+    for _ in range(3):
+        call(breaker)
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_rejects_until_open_seconds_pass():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(1)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_allows_only_the_probe_calls():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_probe_success_closes():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_probes=2)
+    trip(breaker)
+    clock.advance(30)
+    call(breaker)
+    assert breaker.state == HALF_OPEN
+    call(breaker)
+    assert breaker.state == CLOSED
+    # The failures that opened the circuit are not held against it any more
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("outcome", [{"failed": True}, {"latency": 12}])
+def test_half_open_probe_failure_or_slow_call_reopens(outcome):
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(30)
+    call(breaker, **outcome)
+    assert breaker.state == OPEN
+    # Open for a full open_seconds again, counted from the failed probe
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(1)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_state_changes_are_reported():
+    clock = FakeClock()
+    changes = []
+    breaker = make_breaker(clock, on_state_change=lambda old, new: changes.append((old, new)))
+    trip(breaker)
+    clock.advance(30)
+    call(breaker)
+    assert changes == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+class StubProvider:
+    """Stands in for requests.post: answers with queued status codes or raises queued exceptions."""
+
+    class Response:
+        def __init__(self, status_code: int):
+            self.status_code = status_code
+
+    def __init__(self):
+        self.outcomes = []
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return self.Response(outcome)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    stub = StubProvider()
+    monkeypatch.setattr(routes_ai, "LLM_BREAKER", breaker)
+    monkeypatch.setattr(routes_ai.requests, "post", stub)
+    stub.breaker, stub.clock = breaker, clock
+    return stub
+
+
+def post():
+    return asyncio.run(routes_ai.post_chat_completion({"messages": []}, "key", timeout=1))
+
+
+@pytest.mark.parametrize("failure", [500, 503, 429, requests.exceptions.ConnectionError("refused")])
+def test_provider_failures_open_the_circuit(provider, failure):
+    provider.outcomes = [failure] * 4
+    for _ in range(4):
+        if isinstance(failure, BaseException):
+            with pytest.raises(type(failure)):
+                post()
+        else:
+            assert post().status_code == failure
+    assert provider.breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        post()
+    assert provider.calls == 4
+
+
+def test_client_errors_do_not_open_the_circuit(provider):
+    provider.outcomes = [400, 401, 404, 422, 400]
+    for _ in range(5):
+        post()
+    assert provider.breaker.state == CLOSED
+
+
+def test_provider_probe_success_closes_the_circuit(provider):
+    provider.outcomes = [500] * 4 + [200]
+    for _ in range(4):
+        post()
+    provider.clock.advance(30)
+    assert post().status_code == 200
+    assert provider.breaker.state == CLOSED
+
+
+def test_provider_probe_failure_reopens_the_circuit(provider):
+    provider.outcomes = [500] * 5
+    for _ in range(4):
+        post()
+    provider.clock.advance(30)
+    post()
+    assert provider.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        post()
+    assert provider.calls == 5
+
+
+def test_release_frees_the_half_open_probe():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_cancelled_provider_calls_are_not_failures(provider, monkeypatch):
+    async def cancelled(*args, **kwargs):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(routes_ai.asyncio, "to_thread", cancelled)
+    for _ in range(4):
+        with pytest.raises(asyncio.CancelledError):
+            post()
+    assert provider.breaker.state == CLOSED
+    assert len(provider.breaker._calls) == 0
+
+
+def test_rejected_preflight_skips_the_provider(monkeypatch):
+    from backend.app import routes
+
+    async def llm_evaluate(zip_path):
+        raise AssertionError("the provider must not be called")
+
+    async def score_comment_quality(zip_path):
+        return None
+
+    async def rejected():
+        raise routes.HTTPException(status_code=403, detail="Submissions are closed")
+
+    monkeypatch.setattr(routes, "llm_evaluate", llm_evaluate)
+    monkeypatch.setattr(routes, "score_comment_quality", score_comment_quality)
+
+    async def submit():
+        preflight = asyncio.ensure_future(rejected())
+        await routes.evaluate_submission("project.zip", preflight)
+
+    with pytest.raises(routes.HTTPException):
+        asyncio.run(submit())
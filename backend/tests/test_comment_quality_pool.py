@@ -0,0 +1,67 @@
+"""Scoring comment quality in the worker pool without queueing behind busy workers."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.app import comment_quality_pool
+
+
+@pytest.fixture
+def scoring(monkeypatch):
+    """A one-worker pool (threads stand in for processes) whose scoring waits for release."""
+    release = threading.Event()
+    calls = []
+
+    def score(zip_path):
+        calls.append(zip_path)
+        release.wait(5)
+        return {"score": 0.8}
+
+    def executor(max_workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(comment_quality_pool, "COMMENT_QUALITY_WORKERS", 1)
+    monkeypatch.setattr(comment_quality_pool, "ProcessPoolExecutor", executor)
+    monkeypatch.setattr(comment_quality_pool, "_score", score)
+    monkeypatch.setattr(comment_quality_pool, "_pool", None)
+    yield release, calls
+    release.set()
+    comment_quality_pool.shutdown_pool()
+
+
+def test_busy_workers_are_not_queued_behind(scoring):
+    release, calls = scoring
+
+    async def submit_two():
+        first = asyncio.create_task(comment_quality_pool.score_comment_quality("first.zip", timeout=5))
+        await asyncio.sleep(0.05)
+        # The only worker is scoring the first ZIP: the second returns at once
+        second = await comment_quality_pool.score_comment_quality("second.zip", timeout=5)
+        release.set()
+        return await first, second
+
+    assert asyncio.run(submit_two()) == ({"score": 0.8}, None)
+    assert calls == ["first.zip"]
+
+
+def test_worker_is_busy_until_a_timed_out_task_finishes(scoring):
+    release, calls = scoring
+
+    async def time_out_then_retry():
+        first = await comment_quality_pool.score_comment_quality("first.zip", timeout=0.05)
+        busy = await comment_quality_pool.score_comment_quality("second.zip", timeout=5)
+        release.set()
+        # Wait for the worker to finish the timed-out task and free its slot
+        for _ in range(100):
+            if comment_quality_pool._free_workers.acquire(blocking=False):
+                comment_quality_pool._free_workers.release()
+                break
+            await asyncio.sleep(0.01)
+        third = await comment_quality_pool.score_comment_quality("third.zip", timeout=5)
+        return first, busy, third
+
+    assert asyncio.run(time_out_then_retry()) == (None, None, {"score": 0.8})
+    assert calls == ["first.zip", "third.zip"]
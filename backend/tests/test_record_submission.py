@@ -0,0 +1,57 @@
+"""Storing a submission row: placeholder claims and duplicate submissions, and the upload's working files."""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app import routes
+from backend.loadtest.fake_supabase import FakeSupabase
+
+JOINED_AT = "2020-01-01T00:00:00+00:00"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeSupabase()
+    client.load({"submissions": [{"id": 1, "assessment_id": "assessment-1", "student_id": "student-1",
+                                  "status": routes.NO_SUBMISSION_STATUS, "created_at": JOINED_AT}]})
+    monkeypatch.setattr(routes, "admin_client", client)
+    return client
+
+
+def submission(student_id: str = "student-1") -> dict:
+    return {"id": 2, "assessment_id": "assessment-1", "student_id": student_id, "status": "pending"}
+
+
+def test_claimed_placeholder_is_dated_at_submission(client):
+    row = routes.record_submission(submission(), placeholder_id=1)
+    assert row["id"] == 1
+    assert row["status"] == "pending"
+    created_at = datetime.fromisoformat(row["created_at"])
+    assert datetime.now(timezone.utc) - created_at < timedelta(minutes=1)
+
+
+def test_placeholder_claimed_twice_is_rejected(client):
+    routes.record_submission(submission(), placeholder_id=1)
+    with pytest.raises(HTTPException) as error:
+        routes.record_submission(submission(), placeholder_id=1)
+    assert error.value.status_code == 400
+
+
+def test_cancelled_submission_removes_its_working_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def save_upload(file, zip_path):
+        with open(zip_path, "wb") as out:
+            out.write(b"partial upload")
+        # The client disconnected while the upload was being saved
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(routes, "save_upload", save_upload)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(routes.submit_assessment("assessment-1", file=None, current_user=SimpleNamespace(id="student-1")))
+    assert os.listdir(tmp_path / "backend" / "uploads" / "assessment_assessment-1") == []
@@ -0,0 +1,109 @@
+"""The deferred re-evaluation job, run against the in-memory Supabase stand-in."""
+
+import asyncio
+
+import pytest
+
+from backend.app import routes
+from backend.app.circuit_breaker import CircuitOpenError
+from backend.app.routes_ai import ProviderError
+from backend.loadtest.fake_supabase import FakeSupabase
+
+EVALUATION = {"overall_score": 18, "max_score": 24, "feedback": ["Solid work."]}
+COMMENT_QUALITY = {"score": 0.8, "label": "good"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeSupabase(keep_objects=True)
+    bucket = client.storage.from_("submissions")
+    bucket.upload("blobs/ab/abc.zip", b"PK\x05\x06" + b"\x00" * 18)
+    client.load({"submissions": [{
+        "id": 1,
+        "assessment_id": "assessment-1",
+        "student_id": "student-1",
+        "status": "pending",
+        "zip_path": bucket.get_public_url("blobs/ab/abc.zip"),
+        "ai_feedback": routes.DEFERRED_AI_FEEDBACK,
+        "ai_score": None,
+        "ai_evaluation_data": {"comment_quality": COMMENT_QUALITY},
+        "needs_reevaluation": True,
+    }]})
+    monkeypatch.setattr(routes, "admin_client", client)
+    monkeypatch.setattr(routes, "supabase", client)
+    return client
+
+
+def evaluate_with(monkeypatch, outcome):
+    """Make llm_evaluate return outcome, or raise it if it is an exception."""
+    async def llm_evaluate(zip_path, canned_on_provider_error=True):
+        assert not canned_on_provider_error
+        if isinstance(outcome, Exception):
+            raise outcome
+        return dict(outcome)
+
+    monkeypatch.setattr(routes, "llm_evaluate", llm_evaluate)
+
+
+def reevaluate() -> int:
+    return asyncio.run(routes.reevaluate_deferred_submissions())
+
+
+def submission(client) -> dict:
+    return client.tables["submissions"][0]
+
+
+def test_reevaluation_keeps_the_comment_quality_score(client, monkeypatch):
+    evaluate_with(monkeypatch, EVALUATION)
+    assert reevaluate() == 1
+    row = submission(client)
+    assert row["ai_evaluation_data"]["comment_quality"] == COMMENT_QUALITY
+    assert row["ai_evaluation_data"]["overall_score"] == 18
+    assert row["ai_score"] == 18
+    assert row["needs_reevaluation"] is False
+    assert row["reevaluation_claimed_at"] is None
+
+
+@pytest.mark.parametrize("error", [ProviderError(503), ProviderError(429), CircuitOpenError("open")])
+def test_degraded_provider_keeps_the_row_flagged(client, monkeypatch, error):
+    evaluate_with(monkeypatch, error)
+    assert reevaluate() == 0
+    row = submission(client)
+    assert row["needs_reevaluation"] is True
+    assert row["ai_score"] is None
+    assert row["reevaluation_claimed_at"] is None
+    assert row.get("reevaluation_attempts", 0) == 0
+
+
+def test_failing_row_is_given_up_after_max_attempts(client, monkeypatch):
+    monkeypatch.setattr(routes, "REEVALUATION_MAX_ATTEMPTS", 3)
+    evaluate_with(monkeypatch, ProviderError(400))
+    for attempt in range(1, 3):
+        reevaluate()
+        assert submission(client)["reevaluation_attempts"] == attempt
+        assert submission(client)["needs_reevaluation"] is True
+    reevaluate()
+    row = submission(client)
+    assert row["needs_reevaluation"] is False
+    assert row["ai_feedback"] == routes.REEVALUATION_FAILED_FEEDBACK
+    assert row["ai_score"] is None
+
+
+def test_missing_zip_counts_as_a_failed_attempt(client, monkeypatch):
+    evaluate_with(monkeypatch, EVALUATION)
+    client.objects["submissions"].clear()
+    reevaluate()
+    row = submission(client)
+    assert row["reevaluation_attempts"] == 1
+    assert row["needs_reevaluation"] is True
+
+
+def test_row_resolved_meanwhile_is_not_overwritten(client, monkeypatch):
+    async def llm_evaluate(zip_path, canned_on_provider_error=True):
+        # A professor graded the submission by hand while it was being evaluated
+        submission(client).update(needs_reevaluation=False, ai_score=12)
+        return dict(EVALUATION)
+
+    monkeypatch.setattr(routes, "llm_evaluate", llm_evaluate)
+    reevaluate()
+    assert submission(client)["ai_score"] == 12
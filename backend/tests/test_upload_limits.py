@@ -0,0 +1,70 @@
+"""Early 413 for oversized uploads, before their body is read."""
+
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from backend.app.upload_limits import UploadLimitMiddleware
+
+LIMIT = 100 * 1024
+
+
+def make_app():
+    app = FastAPI()
+    app.state.reads = 0
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.reads += 1
+        return {"size": len(await file.read())}
+
+    app.add_middleware(UploadLimitMiddleware, max_upload_bytes=LIMIT)
+    return app
+
+
+def post(app, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload", **kwargs)
+    return asyncio.run(send())
+
+
+def multipart_body(size: int) -> bytes:
+    return (b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.zip"\r\n\r\n'
+            + b"x" * size + b"\r\n--b--\r\n")
+
+
+def test_upload_within_limit_passes():
+    app = make_app()
+    response = post(app, files={"file": ("a.zip", b"x" * LIMIT)})
+    assert response.status_code == 200
+    assert response.json() == {"size": LIMIT}
+
+
+def test_oversized_content_length_is_rejected_before_the_endpoint():
+    app = make_app()
+    response = post(app, files={"file": ("a.zip", b"x" * (LIMIT * 2))})
+    assert response.status_code == 413
+    assert "limit" in response.json()["detail"]
+    assert app.state.reads == 0
+
+
+def test_oversized_chunked_body_is_rejected():
+    body = multipart_body(LIMIT * 2)
+
+    async def chunks():
+        for start in range(0, len(body), 16 * 1024):
+            yield body[start:start + 16 * 1024]
+
+    app = make_app()
+    response = post(app, content=chunks(), headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert app.state.reads == 0
+
+
+def test_other_requests_are_not_limited():
+    app = make_app()
+    response = post(app, content=b"x" * (LIMIT * 2), headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 422
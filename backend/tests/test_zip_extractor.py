@@ -0,0 +1,48 @@
+"""Reading developer files from a project ZIP for the map-reduce evaluation."""
+
+import zipfile
+
+from backend.app import zip_extractor
+from backend.app.zip_extractor import collect_developer_files
+
+
+def make_zip(tmp_path, members: dict) -> str:
+    zip_path = str(tmp_path / "project.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return zip_path
+
+
+def test_files_are_read_whole_in_priority_order(tmp_path):
+    zip_path = make_zip(tmp_path, {
+        "tests/test_app.py": "def test_app():\n    assert True\n",
+        "src/app.py": "print('hello world')\n",
+        "logo.png": "not source",
+    })
+    files, files_truncated = collect_developer_files(zip_path)
+    assert [name for name, _ in files] == ["src/app.py", "tests/test_app.py"]
+    assert files_truncated == 0
+
+
+def test_oversized_and_padded_source_files_count_as_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_extractor, "MAX_MEMBER_BYTES", 10_000)
+    zip_path = make_zip(tmp_path, {
+        "src/app.py": "print('hello world')\n",
+        # Too large to be hand-written source, and compressed far past the ratio limit
+        "src/generated.py": "x = 1\n" * 5000,
+        "src/padded.js": " " * 9000 + "console.log(1)\n",
+        "src/empty.py": "",
+        "node_modules/big.js": "y = 2\n" * 5000,
+    })
+    files, files_truncated = collect_developer_files(zip_path)
+    assert [name for name, _ in files] == ["src/app.py"]
+    assert files_truncated == 2
+
+
+def test_budget_cuts_the_crossing_file_and_skips_the_rest(tmp_path):
+    zip_path = make_zip(tmp_path, {f"src/module_{i}.py": f"value_{i} = {i}\n" * 20 for i in range(3)})
+    files, files_truncated = collect_developer_files(zip_path, max_total_chars=300)
+    assert len(files) == 2
+    assert files[1][1].endswith("... (truncated)")
+    assert files_truncated == 2